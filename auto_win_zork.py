@@ -1,79 +1,130 @@
 #!/usr/bin/env python3
-"""Automated Zork I completion script using Fic interpreter"""
+"""Replay a command file through the built-in interpreter and check it against a golden transcript
 
+Runs every command of a walkthrough such as win_zork.txt as fast as the
+interpreter goes, keeps each command's output, and compares the result with
+a stored transcript. This is the smoke test for a rebuilt story file: any
+change in what the game prints shows up as the first turn that differs.
+
+    python3 auto_win_zork.py                      # Check against win_zork.golden.jsonl
+    python3 auto_win_zork.py --record             # Write a new golden transcript
+"""
+
+import argparse
+import difflib
+import json
 import sys
 import time
-try:
-    import pexpect
-    import pexpect.popen_spawn as popen_spawn
-except ImportError:
-    print("ERROR: pexpect not installed. Run: pip install pexpect")
-    sys.exit(1)
-
-def run_zork_walkthrough(story_file, commands_file):
-    """Run Zork with automated command sequence"""
-    
-    # Read commands from file
-    with open(commands_file, 'r') as f:
-        commands = [line.strip() for line in f if line.strip()]
-    
-    print("=" * 60)
-    print("AUTOMATED ZORK I COMPLETION")
-    print("=" * 60)
-    print(f"Story file: {story_file}")
-    print(f"Commands to execute: {len(commands)}")
-    print("=" * 60)
-    print()
-    
-    # Start Fic interpreter
-    fic_path = r"D:\github\zork1\Fic\fic.py"
-    
+from typing import List, NamedTuple, Optional
+
+from zork_cli import GameStatus, ZMachine
+
+
+class Turn(NamedTuple):
+    command: Optional[str]  # None for the opening text
+    output: str
+
+
+class ReplayResult(NamedTuple):
+    turns: List[Turn]
+    elapsed: float
+    status: GameStatus
+
+    @property
+    def commands_per_sec(self) -> float:
+        return (len(self.turns) - 1) / self.elapsed if self.elapsed else 0.0
+
+
+def read_commands(commands_file) -> List[str]:
+    with open(commands_file) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def replay(story_file, commands: List[str], seed: int = 0) -> ReplayResult:
+    """Play commands from a fresh game; stops early if the game ends"""
+    zm = ZMachine(story_file, seed=seed, predecode=True)
+    start = time.perf_counter()
+    turns = [Turn(None, zm.start())]
+    for command in commands:
+        if zm.finished:
+            break
+        turns.append(Turn(command, zm.step(command)))
+    elapsed = time.perf_counter() - start
+    return ReplayResult(turns, elapsed, zm.status())
+
+
+def save_golden(path, turns: List[Turn]):
+    with open(path, 'w') as f:
+        for number, turn in enumerate(turns):
+            f.write(json.dumps({'turn': number, 'command': turn.command, 'output': turn.output}) + '\n')
+
+
+def load_golden(path) -> List[Turn]:
+    with open(path) as f:
+        return [Turn(entry['command'], entry['output']) for entry in map(json.loads, f)]
+
+
+def first_divergence(turns: List[Turn], golden: List[Turn]) -> Optional[int]:
+    """Index of the first turn that differs from golden, or None if they match"""
+    for number, (turn, expected) in enumerate(zip(turns, golden)):
+        if turn != expected:
+            return number
+    if len(turns) != len(golden):
+        return min(len(turns), len(golden))
+    return None
+
+
+def print_divergence(number: int, turns: List[Turn], golden: List[Turn]):
+    actual = turns[number] if number < len(turns) else None
+    expected = golden[number] if number < len(golden) else None
+    command = (actual or expected).command
+    print(f"❌ Turn {number} differs" + (f" (command: {command})" if command else " (opening text)"))
+    if actual is None or expected is None:
+        print(f"   The replay has {len(turns)} turns, the golden transcript {len(golden)}")
+        return
+    if actual.command != expected.command:
+        print(f"   Command {actual.command!r}, golden transcript has {expected.command!r}")
+    diff = difflib.unified_diff(expected.output.splitlines(), actual.output.splitlines(),
+                                'golden', 'replay', lineterm='', n=1)
+    for line in list(diff)[:20]:
+        print(f"   {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a walkthrough and verify the game output')
+    parser.add_argument('--story-file', default='zork1.z3', help='Path to Zork story file')
+    parser.add_argument('--commands', default='win_zork.txt', help='Command file, one per line')
+    parser.add_argument('--golden', default='win_zork.golden.jsonl',
+                        help='Golden transcript to compare with (or write, with --record)')
+    parser.add_argument('--record', action='store_true',
+                        help='Write the replay as the new golden transcript instead of checking it')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the game')
+    args = parser.parse_args()
+
     try:
-        # Spawn the process
-        child = popen_spawn.PopenSpawn(f'python "{fic_path}" "{story_file}"', timeout=3, encoding='utf-8')
-        
-        print("Game started! Executing commands...\n")
-        
-        # Wait for initial prompt
-        child.expect('>', timeout=5)
-        
-        # Execute each command
-        for i, cmd in enumerate(commands):
-            if i % 10 == 0:
-                print(f"Progress: {i}/{len(commands)} commands executed...")
-            
-            child.sendline(cmd)
-            try:
-                child.expect('>', timeout=2)
-            except:
-                pass  # Some commands may not have a prompt
-        
-        # Get final output
-        time.sleep(1)
-        try:
-            remaining = child.read()
-            print("\n" + remaining)
-        except:
-            pass
-        
-        child.close()
-        
-        print()
-        print("=" * 60)
-        print("✓ Walkthrough completed!")
-        print("=" * 60)
-        
-    except FileNotFoundError:
-        print(f"ERROR: Could not find Fic interpreter at {fic_path}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
+        result = replay(args.story_file, read_commands(args.commands), args.seed)
+        golden = None if args.record else load_golden(args.golden)
+    except FileNotFoundError as e:
+        print(f"ERROR: Could not find {e.filename}")
+        return 2
+
+    status = result.status
+    print(f"🎮 Replayed {len(result.turns) - 1} commands in {result.elapsed:.3f}s "
+          f"({result.commands_per_sec:,.0f} commands/sec)")
+    print(f"📊 Score: {status.score}/350   Moves: {status.moves}   Room: {status.room_name}")
+
+    if args.record:
+        save_golden(args.golden, result.turns)
+        print(f"📝 Golden transcript written to {args.golden}")
+        return 0
+
+    number = first_divergence(result.turns, golden)
+    if number is not None:
+        print_divergence(number, result.turns, golden)
+        return 1
+    print(f"✅ All {len(golden)} turns match {args.golden}")
+    return 0
+
 
 if __name__ == '__main__':
-    story_file = r'D:\github\zork1\zork1.z3'
-    commands_file = r'D:\github\zork1\win_zork.txt'
-    
-    run_zork_walkthrough(story_file, commands_file)
+    sys.exit(main())
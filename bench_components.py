@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Microbenchmarks for the hot paths of a game turn, with regression checks
+
+Each case is timed after a warmup as a number of samples; every sample
+averages enough calls to take about 20 ms. The cases are run in several
+rounds, interleaved so that a slow spell of the machine hits all of them,
+and the samples of all rounds are pooled. Results give percentiles of the
+samples per item (one game output, one command, one prompt...) and their
+spread, and can be saved as JSON and compared with a saved baseline:
+
+    python3 bench_components.py --output baseline.json
+    ... change the parser ...
+    python3 bench_components.py --compare baseline.json
+
+A case counts as slower only when it changed by more than the threshold
+and by more than a few times the spread (interquartile range) measured in
+either run, so a noisy case needs a bigger change to be flagged.
+
+The corpus is the game output of the walkthrough in win_zork.txt, as used
+by bench_parser.py.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from bench_parser import collect_outputs
+from game_parser import ZorkGameParser
+from prompt_history import PromptHistory
+from prompt_templates import GAME_STATE_TEMPLATE, SYSTEM_PROMPT
+from room_graph import RoomGraph
+from world_state import WorldState
+from zork_cli import StoryImage, ZMachine
+
+# Replies as models actually give them, before _clean_command
+RAW_COMMANDS = [
+    'open mailbox', '"go north."', 'Command: take lamp', "I'll examine the leaflet",
+    'Let me try: west', 'OK, open the trap door!', 'n\nThe path leads north.',
+    'Response: kill troll with sword', '', 'look around carefully ' * 8,
+]
+
+
+class Case(NamedTuple):
+    name: str
+    func: Callable[[], object]
+    items: int  # Items handled per call, so results are per item
+
+
+def measure(func: Callable, warmup: float = 0.1, samples: int = 30,
+            sample_time: float = 0.02) -> List[float]:
+    """Seconds per call for each sample, with the garbage collector off like timeit"""
+    deadline = time.perf_counter() + warmup
+    calls = 0
+    while True:
+        func()
+        calls += 1
+        if time.perf_counter() >= deadline:
+            break
+    number = max(1, int(sample_time * calls / warmup))
+
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(samples):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return times
+
+
+def summarize(times: List[float], items: int) -> Dict:
+    """Percentiles of the samples in µs per item, and their spread relative to the median"""
+    per_item = sorted(t / items * 1e6 for t in times)
+    cuts = statistics.quantiles(per_item, n=100, method='inclusive')
+    median = statistics.median(per_item)
+    return {
+        'items': items,
+        'samples': len(per_item),
+        'min': per_item[0],
+        'p50': median,
+        'p90': cuts[89],
+        'p99': cuts[98],
+        'mean': statistics.fmean(per_item),
+        'stdev': statistics.stdev(per_item) if len(per_item) > 1 else 0.0,
+        'iqr': (cuts[74] - cuts[24]) / median if median else 0.0,
+    }
+
+
+def build_cases(story_file: str, walkthrough: str) -> Tuple[List[Case], Dict[str, str]]:
+    """The benchmark cases, and the ones that can't run here with the reason"""
+    outputs = collect_outputs(story_file, walkthrough)
+    with open(walkthrough) as f:
+        commands = [None] + [line.strip() for line in f if line.strip()]
+    commands += ['look'] * (len(outputs) - len(commands))
+    game_parser = ZorkGameParser()
+    states = [game_parser.summarize_state(text) for text in outputs]
+    turns = list(zip(commands, states, commands[1:] + ['look']))
+    # Strings the walkthrough printed; a real game decodes these, not the spurious ones predecode finds
+    strings = sorted(StoryImage.load(story_file).text_cache)
+    zm = ZMachine(story_file)
+
+    def parse_all():
+        for text in outputs:
+            game_parser.summarize_state(text)
+
+    def build_prompts():
+        # What the agent does each turn: update the world, add the turn, render the request
+        rooms = RoomGraph()
+        world = WorldState(rooms)
+        history = PromptHistory(SYSTEM_PROMPT, max_tokens=600)
+        for command, state, reply in turns:
+            rooms.update(command, state)
+            world.update(command, state)
+            history.add_user(GAME_STATE_TEMPLATE.format(game_output=state['output']), state['output'])
+            messages = history.messages()
+            messages[-1] = {"role": "user", "content": world.render() + "\n\n" + messages[-1]['content']}
+            history.record_request(messages)
+            history.add_assistant(reply)
+
+    def decode_cached():
+        for addr in strings:
+            zm.decode_text(addr)
+
+    def decode_uncached():
+        for addr in strings:
+            zm._decode_zchars(addr, zm.abbreviations)
+
+    def load_cold():
+        StoryImage._images.pop(story_key, None)
+        ZMachine(story_file)
+
+    story_key = next(key for key, image in StoryImage._images.items() if image is zm.image)
+    cases = [
+        Case('parser.summarize_state', parse_all, len(outputs)),
+        Case('prompt.build_turn', build_prompts, len(turns)),
+        Case('zmachine.decode_text', decode_cached, len(strings)),
+        Case('zmachine.decode_text_uncached', decode_uncached, len(strings)),
+        Case('zmachine.load_story', load_cold, 1),
+        Case('zmachine.load_story_shared', lambda: ZMachine(story_file), 1),
+    ]
+    skipped = {}
+    try:
+        from zork_llm_agent import ZorkLLMAgent
+    except ImportError as e:
+        skipped['agent.clean_command'] = f"zork_llm_agent can't be imported ({e})"
+    else:
+        agent = ZorkLLMAgent('http://localhost:8000/v1', 'bench')
+
+        def clean_all():
+            for raw in RAW_COMMANDS:
+                agent._clean_command(raw)
+
+        cases.insert(1, Case('agent.clean_command', clean_all, len(RAW_COMMANDS)))
+    return cases, skipped
+
+
+def run(cases: List[Case], samples: int, warmup: float, rounds: int = 10,
+        only: Optional[List[str]] = None) -> Dict:
+    cases = [case for case in cases if not only or any(name in case.name for name in only)]
+    times = {case.name: [] for case in cases}
+    per_round = max(2, samples // rounds)
+    for _ in range(rounds):
+        for case in cases:
+            times[case.name] += measure(case.func, warmup, per_round)
+    results = {}
+    for case in cases:
+        results[case.name] = r = summarize(times[case.name], case.items)
+        print(f"  {case.name:<32} min {r['min']:>10.3f} µs   p50 {r['p50']:>10.3f}   "
+              f"p90 {r['p90']:>10.3f}   iqr {r['iqr']:>5.1%}   (x{case.items})")
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, metric: str = 'min',
+            noise: float = 3.0) -> List[str]:
+    """
+    Names of cases whose metric got slower than the baseline by more than
+    threshold, and by more than noise times the larger relative spread of
+    the two runs
+    """
+    regressions = []
+    print(f"\n{'case (' + metric + ')':<32} {'baseline':>10} {'now':>10} {'change':>8} {'limit':>7}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32} {'-':>10} {result[metric]:>10.3f}      new")
+            continue
+        change = result[metric] / base[metric] - 1
+        # Baselines saved before the spread was recorded fall back to the threshold
+        limit = max(threshold, noise * max(base.get('iqr', 0.0), result['iqr']))
+        flag = ''
+        if change > limit:
+            regressions.append(name)
+            flag = '  ❌ slower'
+        elif change < -limit:
+            flag = '  ✅ faster'
+        print(f"{name:<32} {base[metric]:>10.3f} {result[metric]:>10.3f} {change:>+8.1%} "
+              f"{limit:>6.0%}{flag}")
+    for name in baseline:
+        if name not in results:
+            print(f"{name:<32} {baseline[name][metric]:>10.3f} {'-':>10}  not run")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the per-turn hot paths')
+    parser.add_argument('--story-file', default='zork1.z3', help='Path to Zork story file')
+    parser.add_argument('--walkthrough', default='win_zork.txt', help='Commands to collect output from')
+    parser.add_argument('--samples', type=int, default=60, help='Timed samples per case, over all rounds')
+    parser.add_argument('--rounds', type=int, default=10, help='Rounds to split the samples over')
+    parser.add_argument('--warmup', type=float, default=0.1, help='Seconds of warmup per case')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='Run only cases whose name contains NAME')
+    parser.add_argument('--output', help='Save the results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare with results saved by --output')
+    parser.add_argument('--threshold', type=float, default=15.0,
+                        help='Least percent slowdown that counts as a regression')
+    parser.add_argument('--noise', type=float, default=3.0,
+                        help='A regression must also exceed this many times the relative spread (IQR)')
+    parser.add_argument('--metric', choices=['min', 'p50', 'p90', 'p99', 'mean'], default='min',
+                        help='Statistic to compare; min is the steadiest on a busy machine')
+    args = parser.parse_args()
+
+    cases, skipped = build_cases(args.story_file, args.walkthrough)
+    print(f"⏱️  Python {platform.python_version()}, {args.samples} samples per case, µs per item")
+    results = run(cases, max(2, args.samples), args.warmup, max(1, args.rounds), args.only)
+    for name, reason in skipped.items():
+        print(f"  {name:<32} skipped: {reason}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'unit': 'us per item',
+                'results': results,
+                'skipped': skipped,
+            }, f, indent=2)
+        print(f"📝 Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold / 100, args.metric,
+                              args.noise)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over the limit: {', '.join(regressions)}")
+            return 1
+        print(f"\n✅ No regressions over the limit (at least {args.threshold:g}%)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Microbenchmark for ZorkGameParser.summarize_state
+
+Plays the walkthrough in win_zork.txt with the built-in Z-machine to collect
+real game output and checks that summarize_state agrees with calling each
+parser method on its own. Then times summarize_state against the methods
+one by one and against BaselineParser, a frozen copy of the parser from
+before summarize_state was optimized.
+"""
+
+import argparse
+import re
+import timeit
+from typing import Dict, List, Optional
+
+from game_parser import ZorkGameParser
+from zork_cli import ZMachine
+
+EXTRA_SAMPLES = [
+    "Your score is 45 (total of 350 points), in 89 moves.\nThis gives you the rank of Amateur Adventurer.",
+    "I don't understand that.\n>",
+    "You are carrying:\n  A brass lantern\n  A sword\n  A leaflet\n",
+    "\x1b[1mWest of House\x1b[0m\nYou are standing in an open field west of a white house.\n\n\n\n>",
+    "It is now pitch black. You are likely to be eaten by a grue.\n\n    *** You have died ***",
+]
+
+
+class BaselineParser:
+    """
+    ZorkGameParser as it was before summarize_state was optimized, frozen
+    as the baseline to time against. Don't fix or speed it up: its death
+    and victory checks are wrong, so its results are only timed, not compared.
+    """
+    
+    def __init__(self):
+        self.score_pattern = re.compile(r'Your score is (\d+) \(total of (\d+) points\)')
+        self.moves_pattern = re.compile(r'in (\d+) moves?')
+        self.death_patterns = [
+            r'\*\*\*\*\* You have died \*\*\*\*\*',
+            r'It is now pitch black',
+            r'You have been eaten by a grue',
+        ]
+        self.location_small_words = {'a', 'an', 'of', 'the', 'to', 'on', 'in'}
+        
+    def extract_score(self, text: str) -> Optional[tuple[int, int]]:
+        """Extract current score and max score from game output"""
+        match = self.score_pattern.search(text)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+        return None
+    
+    def extract_moves(self, text: str) -> Optional[int]:
+        """Extract number of moves from game output"""
+        match = self.moves_pattern.search(text)
+        if match:
+            return int(match.group(1))
+        return None
+    
+    def is_death(self, text: str) -> bool:
+        """Check if the game output indicates player death"""
+        text_lower = text.lower()
+        return any(re.search(pattern, text_lower) for pattern in self.death_patterns)
+    
+    def is_victory(self, text: str) -> bool:
+        """Check if the game output indicates victory"""
+        return 'congratulations' in text.lower() or '350' in text
+    
+    def is_error(self, text: str) -> bool:
+        """Check if the game doesn't understand the command"""
+        error_phrases = [
+            "i don't understand",
+            "i don't know the word",
+            "that doesn't make sense",
+            "you can't see any",
+            "i don't see that here",
+        ]
+        text_lower = text.lower()
+        return any(phrase in text_lower for phrase in error_phrases)
+    
+    def clean_output(self, text: str) -> str:
+        """Clean and normalize game output"""
+        # Remove ANSI escape codes if any
+        text = re.sub(r'\x1b\[[0-9;]*m', '', text)
+        # Remove excessive whitespace
+        text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
+        # Strip leading/trailing whitespace
+        text = text.strip()
+        return text
+    
+    def extract_location(self, text: str) -> Optional[str]:
+        """Try to extract current location from game output
+        
+        Zork starts a room description with the room's name on a line of
+        its own, in title case with no punctuation ("West of House", "Up a
+        Tree", "The Troll Room"). Replies like "Taken." and listings like
+        "A leaflet" never look like that. In a vehicle the heading gains a
+        suffix ("Reservoir, in the magic boat"), which is dropped.
+        """
+        for line in text.split('\n'):
+            name = line.strip()
+            if ', in ' in name or ', on ' in name:
+                name = name.split(', ')[0]
+            if (not name or len(name) > 40 or name.endswith(('.', '!', '?', '"', ':'))
+                    or ':' in name or any(ch.isdigit() for ch in name)):
+                continue
+            words = name.replace('-', ' ').split()
+            if words[0][0].isupper() and all(
+                    word[0].isupper() or word in self.location_small_words for word in words):
+                return name
+        
+        return None
+    
+    def parse_inventory(self, text: str) -> List[str]:
+        """Parse inventory list from game output"""
+        inventory = []
+        if 'you are carrying' in text.lower() or 'you have' in text.lower():
+            # Look for items after "You are carrying:"
+            lines = text.split('\n')
+            in_inventory = False
+            for line in lines:
+                if 'you are carrying' in line.lower() or 'you have' in line.lower():
+                    in_inventory = True
+                    continue
+                if in_inventory and line.strip():
+                    # Items are usually listed with "A" or "An" or as bullet points
+                    line = line.strip()
+                    if line.startswith(('A ', 'An ', 'The ', '- ')):
+                        item = line.lstrip('- ').lstrip('A ').lstrip('An ').lstrip('The ').strip()
+                        inventory.append(item)
+                    elif line and not line[0].isupper():
+                        break  # End of inventory list
+        return inventory
+    
+    def summarize_state(self, text: str) -> Dict:
+        """Create a summary of the current game state"""
+        return {
+            'output': self.clean_output(text),
+            'score': self.extract_score(text),
+            'moves': self.extract_moves(text),
+            'location': self.extract_location(text),
+            'inventory': self.parse_inventory(text),
+            'is_death': self.is_death(text),
+            'is_victory': self.is_victory(text),
+            'is_error': self.is_error(text),
+        }
+
+
+def method_by_method(parser: ZorkGameParser, text: str) -> dict:
+    """What summarize_state must equal: each of the parser's methods on its own"""
+    return {
+        'output': parser.clean_output(text),
+        'score': parser.extract_score(text),
+        'moves': parser.extract_moves(text),
+        'location': parser.extract_location(text),
+        'inventory': parser.parse_inventory(text),
+        'is_death': parser.is_death(text),
+        'is_victory': parser.is_victory(text),
+        'is_error': parser.is_error(text),
+    }
+
+
+def collect_outputs(story_file: str, walkthrough: str) -> list:
+    zm = ZMachine(story_file, seed=0)
+    outputs = [zm.start()]
+    with open(walkthrough) as f:
+        for line in f:
+            if line.strip() and not zm.finished:
+                outputs.append(zm.step(line.strip()))
+    return outputs + EXTRA_SAMPLES
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ZorkGameParser.summarize_state')
+    parser.add_argument('--story-file', default='zork1.z3', help='Path to Zork story file')
+    parser.add_argument('--walkthrough', default='win_zork.txt', help='Commands to collect output from')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs; the best is reported')
+    args = parser.parse_args()
+
+    outputs = collect_outputs(args.story_file, args.walkthrough)
+    game_parser = ZorkGameParser()
+
+    mismatches = [text for text in outputs
+                  if game_parser.summarize_state(text) != method_by_method(game_parser, text)]
+    print(f"Outputs: {len(outputs)}   Mismatches: {len(mismatches)}")
+    for text in mismatches[:5]:
+        print(f"  {text[:70]!r}")
+
+    def run(summarize):
+        return lambda: [summarize(text) for text in outputs]
+
+    baseline = BaselineParser()
+    results = {}
+    for name, summarize in (('baseline', baseline.summarize_state),
+                            ('method by method', lambda t: method_by_method(game_parser, t)),
+                            ('summarize_state', game_parser.summarize_state)):
+        best = min(timeit.repeat(run(summarize), number=20, repeat=args.repeat))
+        results[name] = best / (20 * len(outputs)) * 1e6
+        print(f"{name:>17}: {results[name]:6.2f} µs per output")
+    print(f"Speedup over the baseline: {results['baseline'] / results['summarize_state']:.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
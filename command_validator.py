@@ -0,0 +1,101 @@
+"""Spell-checks LLM commands against the story's vocabulary before they reach the game"""
+
+import difflib
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from zork_cli import ZMachine
+
+# Part-of-speech flags in the first data byte of a version 3 (Infocom) dictionary entry
+NOUN = 0x80
+VERB = 0x40
+ADJECTIVE = 0x20
+DIRECTION = 0x10
+PREPOSITION = 0x08
+BUZZ = 0x04
+
+# Verbs models reach for that Zork doesn't have, and the Zork verb meaning the same
+SUBSTITUTES = {
+    'check': 'examine', 'inspect': 'examine', 'view': 'examine', 'study': 'examine',
+    'collect': 'take', 'acquire': 'take',
+}
+
+# A word as the game splits them: separated by spaces and the dictionary's separators
+WORD = re.compile(r'[^\s.,"]+')
+
+
+class CommandValidator:
+    """
+    Checks each word of a command against the game's dictionary
+
+    Version 3 stories only compare the first six letters of a word, so a
+    word is known when its first six letters are in the dictionary. An
+    unknown word is replaced by the closest dictionary word with the same
+    first letter (a verb or direction when it starts the command), spelled
+    out in full when an object name has the whole word; a few verbs the
+    game lacks are swapped for their Zork equivalent. If nothing is close
+    enough, check() returns the reply the game would give, so the command
+    never has to be sent. A command without a verb is sent as it is: it may
+    answer one of the game's questions ("What do you want to take?").
+    """
+
+    def __init__(self, words: Dict[str, int], names: Iterable[str] = (), cutoff: float = 0.75):
+        self.words = words
+        self.cutoff = cutoff
+        self.by_letter: Dict[str, list] = {}
+        for word in words:
+            if word:
+                self.by_letter.setdefault(word[0], []).append(word)
+        # Dictionary form (first six letters) -> the whole word, where an object name has it
+        self.full_words: Dict[str, str] = {}
+        for name in names:
+            for word in name.lower().split():
+                if len(word) > 6 and word[:6] in words:
+                    self.full_words.setdefault(word[:6], word)
+        self.corrections = 0
+        self.rejections = 0
+
+    @classmethod
+    def from_story(cls, story_file: str) -> 'CommandValidator':
+        """Load the dictionary and object names from a story file"""
+        zm = ZMachine(story_file)
+        names = [zm.object_name(obj) for obj in range(1, zm.object_count() + 1)]
+        return cls(zm.dictionary_words(), names)
+
+    def check(self, command: str) -> Tuple[str, Optional[str]]:
+        """
+        Returns (command, reply)
+
+        The command comes back with misspelt words corrected. reply is None
+        if the command should be sent, otherwise the game's error message.
+        """
+        fixes = {}
+        words = WORD.findall(command.lower())
+        for i, word in enumerate(words):
+            if word.isdigit():
+                continue  # The game reads numbers itself
+            flags = self.words.get(word[:6])
+            if flags is None:
+                # A first word is most likely a verb, but may answer a question
+                fix = (SUBSTITUTES.get(word) or self._closest(word, verb=(i == 0))
+                       or (i == 0 and self._closest(word, verb=False)) or None)
+                if fix is None:
+                    self.rejections += 1
+                    return command, f'I don\'t know the word "{word}".\n\n'
+                fixes[word] = fix
+
+        if fixes:
+            self.corrections += 1
+            command = WORD.sub(lambda m: fixes.get(m.group().lower(), m.group()), command)
+        return command, None
+
+    def _closest(self, word: str, verb: bool) -> Optional[str]:
+        """The dictionary word closest to word, or None if none is close enough"""
+        key = word[:6]
+        candidates = self.by_letter.get(key[0], [])
+        if verb:
+            candidates = [c for c in candidates if self.words[c] & (VERB | DIRECTION)]
+        matches = difflib.get_close_matches(key, candidates, n=1, cutoff=self.cutoff)
+        if not matches:
+            return None
+        return self.full_words.get(matches[0], matches[0])
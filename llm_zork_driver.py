@@ -6,19 +6,45 @@ import sys
 import time
 import json
 import argparse
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import pexpect
 
-from zork_llm_agent import ZorkLLMAgent
+from openai import AsyncOpenAI
+
+from zork_llm_agent import ZorkLLMAgent, AsyncZorkLLMAgent, RequestBatcher
+from response_cache import ResponseCache
 from game_parser import ZorkGameParser
+from zork_cli import ZMachine, ZMachineError
+from room_graph import SHORT_DIRECTIONS
+from speculation import OutcomeMemo
+from command_validator import CommandValidator
+from turn_logger import LogWriter, TurnLogger
+from turn_metrics import TurnMetrics, format_summary, serve as serve_metrics
+
+# Commands the driver walks itself along the room graph instead of sending
+GOTO_PATTERN = re.compile(r'^(?:go to|goto|walk to|return to)\s+(.+)$', re.IGNORECASE)
 
 
 class LLMZorkDriver:
     """Orchestrates LLM-driven Zork gameplay"""
     
+    agent_class = ZorkLLMAgent
+    
     def __init__(self, vllm_url: str, model_name: str, story_file: str,
-                 max_turns: int = 500, log_dir: str = "logs", api_key: str = "EMPTY"):
+                 max_turns: int = 500, log_dir: str = "logs", api_key: str = "EMPTY",
+                 interpreter: str = "builtin", checkpoint_file: str = None,
+                 checkpoint_every: int = 10, resume: bool = False,
+                 seed: int = None, turn_delay: float = 0.5, verbose: bool = True,
+                 history_tokens: int = None, world_state: bool = True,
+                 cache: ResponseCache = None, temperature_zero: bool = False,
+                 speculate: bool = False, validate: bool = True,
+                 log_format: str = "jsonl", log_writer: LogWriter = None,
+                 stream: bool = False):
         """
         Initialize the driver
         
@@ -29,93 +55,254 @@ class LLMZorkDriver:
             max_turns: Maximum number of turns to play
             log_dir: Directory for logs
             api_key: API key for authentication (use "EMPTY" for vLLM)
+            interpreter: "builtin" runs the story in-process with zork_cli.ZMachine,
+                "fic" spawns the Fic interpreter under pexpect
+            checkpoint_file: Quetzal file to save the game to (builtin only)
+            checkpoint_every: Save a checkpoint every N turns
+            resume: Restore checkpoint_file before the first turn if it exists
+            seed: Random seed for the game (builtin only)
+            turn_delay: Seconds to wait between turns
+            verbose: Print the game to the console as it is played
+            history_tokens: Token budget for recent turns in the LLM prompt
+            world_state: Give the LLM a structured summary of the world instead
+                of a long run of raw game output
+            cache: ResponseCache that repeated LLM requests are answered from
+            temperature_zero: Sample at temperature 0 so cached replies stay valid
+            speculate: When a command's reply can be predicted from an earlier
+                turn, request the next command while the game is running
+            validate: Spell-check commands against the story's dictionary,
+                correcting typos and answering unknown words without the game
+            log_format: "jsonl" (llm_queries_*.jsonl), "records" (turns_*.zturns,
+                compact and with full game output) or "both"
+            log_writer: LogWriter to write the logs through, shared between
+                games; by default the driver starts its own
+            stream: Stream LLM replies so the time to first token is measured
         """
-        self.agent = ZorkLLMAgent(vllm_url, model_name, api_key)
+        self.agent = self.agent_class(vllm_url, model_name, api_key, history_tokens, world_state,
+                                      cache=cache, temperature_zero=temperature_zero,
+                                      stream=stream)
         self.parser = ZorkGameParser()
         self.story_file = story_file
+        self.interpreter = interpreter
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+        self.seed = seed
+        self.turn_delay = turn_delay
+        self.verbose = verbose
         self.max_turns = max_turns
+        self.speculative = speculate
+        self.outcomes = OutcomeMemo()
+        self.validator = CommandValidator.from_story(story_file) if validate else None
         self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(exist_ok=True)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
         
         # Game state
         self.game_process = None
+        self.zmachine = None
         self.turn_count = 0
         self.current_score = 0
         self.max_score = 350
+        self.deaths = 0
+        self.start_time = None
+        self.summary = None
+        self.stopping = False
+        self.error = None
+        self.error_count = 0
+        self.route_moves = 0
+        self.max_consecutive_errors = 3
+        self.last_command = None
         
         # Logging
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.transcript_file = self.log_dir / f"transcript_{timestamp}.txt"
-        self.llm_log_file = self.log_dir / f"llm_queries_{timestamp}.jsonl"
+        self.llm_log_file = (self.log_dir / f"llm_queries_{timestamp}.jsonl"
+                             if log_format in ("jsonl", "both") else None)
+        self.records_file = (self.log_dir / f"turns_{timestamp}.zturns"
+                             if log_format in ("records", "both") else None)
         self.summary_file = self.log_dir / f"summary_{timestamp}.json"
+        self.metrics_file = self.log_dir / f"metrics_{timestamp}.txt"
+        self.owns_log_writer = log_writer is None
+        self.log_writer = log_writer or LogWriter()
+        self.logger = TurnLogger(self.log_writer, self.transcript_file, self.llm_log_file,
+                                 self.records_file)
+        
+        # Timing: seconds per phase of the current turn, and histograms over the game
+        self.metrics = TurnMetrics()
+        self.spans = {}
+        self.turn_start = None
+    
+    def say(self, *args, **kwargs):
+        """Print to the console unless the driver is running quietly"""
+        if self.verbose:
+            print(*args, **kwargs)
+    
+    def stop(self):
+        """Ask the game loop to finish after the current turn"""
+        self.stopping = True
         
     def start_game(self):
-        """Start the Zork game process using Fic interpreter"""
-        print("🎮 Starting Zork I with Fic interpreter...")
+        """Start the Zork game with the configured interpreter"""
+        if self.interpreter == "builtin":
+            return self._start_builtin()
         
-        fic_path = Path(__file__).parent / "Fic" / "fic.py"
-        if not fic_path.exists():
-            raise FileNotFoundError(f"Fic interpreter not found at {fic_path}")
-        
-        # Start Fic with pexpect
-        # Use spawn instead of popen_spawn for better terminal handling on Linux
-        cmd = f"python3 {fic_path} {self.story_file}"
-        self.game_process = pexpect.spawn(cmd, encoding='utf-8', timeout=10)
+        self._spawn_fic()
         
         # Wait for initial prompt
         try:
             self.game_process.expect('>', timeout=10)
             initial_output = self.game_process.before
-            print("✅ Game started successfully!\n")
+            self.say("✅ Game started successfully!\n")
             return initial_output
         except pexpect.TIMEOUT:
-            print("⚠️  Timeout waiting for game prompt")
+            self.say("⚠️  Timeout waiting for game prompt")
             return self.game_process.before if self.game_process.before else ""
     
+    def _start_builtin(self):
+        self.say("🎮 Starting Zork I with the built-in Z-machine...")
+        self.zmachine = ZMachine(self.story_file, seed=self.seed,
+                                 save_file=self.checkpoint_file)
+        initial_output = self.zmachine.start()
+        if self.resume and self.checkpoint_file and Path(self.checkpoint_file).exists():
+            restored = self.resume_checkpoint()
+            if restored:
+                initial_output = restored
+        self.say("✅ Game started successfully!\n")
+        return initial_output
+    
+    def _spawn_fic(self):
+        self.say("🎮 Starting Zork I with Fic interpreter...")
+        
+        fic_path = Path(__file__).parent / "Fic" / "fic.py"
+        if not fic_path.exists():
+            raise FileNotFoundError(f"Fic interpreter not found at {fic_path}")
+        
+        # Start Fic with pexpect
+        # Use spawn instead of popen_spawn for better terminal handling on Linux
+        cmd = f"python3 {fic_path} {self.story_file}"
+        self.game_process = pexpect.spawn(cmd, encoding='utf-8', timeout=10)
+    
     def send_command(self, command: str) -> str:
         """Send a command to the game and get the response"""
+        with self._span('game'):
+            if self.zmachine:
+                return self.zmachine.step(command)
+            
+            try:
+                self.game_process.sendline(command)
+                self.game_process.expect('>', timeout=5)
+                output = self.game_process.before
+                return output
+            except pexpect.TIMEOUT:
+                # Sometimes there's no prompt (game over, etc.)
+                output = self.game_process.before if self.game_process.before else ""
+                return output
+            except Exception as e:
+                self.say(f"⚠️  Error sending command: {e}")
+                return ""
+    
+    def run_command(self, command: str) -> str:
+        """Send a command, walking "go to <room>" along the room graph without the LLM"""
+        route = self._plan_route(command)
+        if route is None:
+            return self.send_command(command)
+        
+        target, steps, message = route
+        if not steps:
+            return message
+        taken = []
+        for direction, expected in steps:
+            output = self.send_command(direction)
+            taken.append(direction)
+            if not self._route_step(direction, expected, output):
+                break
+        return self._route_output(target, steps, taken, output)
+    
+    def _plan_route(self, command: str):
+        """
+        Expand a "go to <room>" command into moves along the room graph
+        
+        Returns None for any other command. Otherwise returns (room, steps,
+        message): steps is a list of (direction, room it leads to), or None
+        with a message saying why there is no route.
+        """
+        match = GOTO_PATTERN.match(command.strip())
+        if not match:
+            return None
+        
+        rooms = self.agent.rooms
+        name = match.group(1).strip().strip('"\'')
+        target = rooms.find_room(name)
+        if not target:
+            return name, None, f"[go to: you haven't visited a room called \"{name}\"]"
+        if not rooms.room:
+            return target, None, "[go to: you can't tell where you are right now]"
+        if target == rooms.room:
+            return target, None, f"[go to: you are already in {target}]"
+        steps = rooms.path(rooms.room, target)
+        if not steps:
+            return target, None, f"[go to: no known route from {rooms.room} to {target}]"
+        return target, steps, None
+    
+    def _route_step(self, direction: str, expected: str, output: str) -> bool:
+        """Record one move of a route; False if it didn't arrive where expected"""
+        state = self._parse(output)
+        self.agent.observe(direction, state)
+        self.route_moves += 1
+        return state.get('location') == expected and not state.get('is_death')
+    
+    def _route_output(self, target: str, steps: list, taken: list, output: str) -> str:
+        moves = ' '.join(SHORT_DIRECTIONS[direction] for direction in taken)
+        if len(taken) == len(steps) and self.agent.rooms.room == target:
+            return f"[go to {target}: {moves}]\n{output}"
+        return f"[go to {target}: stopped after {moves}]\n{output}"
+    
+    def save_checkpoint(self):
+        """Write the game to the checkpoint file straight from the interpreter, without playing a command"""
         try:
-            self.game_process.sendline(command)
-            self.game_process.expect('>', timeout=5)
-            output = self.game_process.before
-            return output
-        except pexpect.TIMEOUT:
-            # Sometimes there's no prompt (game over, etc.)
-            output = self.game_process.before if self.game_process.before else ""
-            return output
-        except Exception as e:
-            print(f"⚠️  Error sending command: {e}")
-            return ""
+            data = self.zmachine.checkpoint_bytes()
+            with open(self.checkpoint_file, 'wb') as f:
+                f.write(data)
+        except (OSError, ZMachineError) as e:
+            self.say(f"⚠️  Checkpoint failed: {e}")
+            return
+        with open(f"{self.checkpoint_file}.json", 'w') as f:
+            json.dump({
+                'turn_count': self.turn_count,
+                'current_score': self.current_score,
+                'max_score': self.max_score
+            }, f)
+    
+    def resume_checkpoint(self):
+        """Restore the checkpoint file; returns the game output or None"""
+        try:
+            with open(self.checkpoint_file, 'rb') as f:
+                output = self.zmachine.resume_checkpoint(f.read())
+        except (OSError, ZMachineError) as e:
+            self.say(f"⚠️  Could not resume from {self.checkpoint_file}: {e}")
+            return None
+        
+        counters_file = Path(f"{self.checkpoint_file}.json")
+        if counters_file.exists():
+            with open(counters_file) as f:
+                counters = json.load(f)
+            self.turn_count = counters.get('turn_count', 0)
+            self.current_score = counters.get('current_score', 0)
+            self.max_score = counters.get('max_score', self.max_score)
+        self.say(f"💾 Resumed from {self.checkpoint_file} at turn {self.turn_count}")
+        # A checkpoint taken at the prompt resumes silently; say where the game is
+        return output.strip() or f"[Resumed from a checkpoint]\n{self.zmachine.status().room_name}"
     
     def log_turn(self, turn_num: int, command: str, game_output: str, 
                  state_summary: dict, llm_thinking: str = ""):
-        """Log a single turn of gameplay"""
-        # Write to transcript
-        with open(self.transcript_file, 'a') as f:
-            f.write(f"\n{'='*80}\n")
-            f.write(f"TURN {turn_num}\n")
-            f.write(f"{'='*80}\n")
-            f.write(f"COMMAND: {command}\n")
-            f.write(f"\nGAME OUTPUT:\n{game_output}\n")
-            if state_summary.get('score'):
-                f.write(f"\nSCORE: {state_summary['score'][0]}/{state_summary['score'][1]}\n")
-        
-        # Write to LLM log
-        log_entry = {
-            'turn': turn_num,
-            'timestamp': datetime.now().isoformat(),
-            'command': command,
-            'game_output': game_output[:500],  # Truncate for storage
-            'state': state_summary,
-            'llm_thinking': llm_thinking
-        }
-        with open(self.llm_log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        """Log a single turn of gameplay (written in the background by the LogWriter)"""
+        self.logger.log(turn_num, command, game_output, state_summary, llm_thinking,
+                        timings=self.spans)
     
     def print_status(self, turn_num: int, command: str, state_summary: dict):
         """Print current status to console"""
         # Don't clear screen - use simple separators
-        print(f"\n{'─'*80}")
+        self.say(f"\n{'─'*80}")
         
         # Always show score, even if we have to use last known score
         score_str = ""
@@ -128,120 +315,262 @@ class LLMZorkDriver:
             # Always show last known score if current turn didn't update it
             score_str = f" | 🏆 Score: {self.current_score}/{self.max_score}"
         
-        print(f"🔄 Turn {turn_num}/{self.max_turns}{score_str}")
-        print(f"🤖 Command: {command}")
+        self.say(f"🔄 Turn {turn_num}/{self.max_turns}{score_str}")
+        self.say(f"🤖 Command: {command}")
         
         if state_summary.get('location'):
-            print(f"📍 Location: {state_summary['location']}")
+            self.say(f"📍 Location: {state_summary['location']}")
         
         if state_summary.get('is_error'):
-            print("⚠️  Command not understood by game")
+            self.say("⚠️  Command not understood by game")
         
         if state_summary.get('is_death'):
-            print("💀 Player died!")
+            self.say("💀 Player died!")
         
         if state_summary.get('is_victory'):
-            print("🎉 VICTORY! Game completed!")
+            self.say("🎉 VICTORY! Game completed!")
         
-        print(f"\n📜 Response:")
-        print(state_summary['output'][:500])  # Show first 500 chars
+        self.say(f"\n📜 Response:")
+        self.say(state_summary['output'][:500])  # Show first 500 chars
         if len(state_summary['output']) > 500:
-            print("... (truncated)")
+            self.say("... (truncated)")
     
     def game_loop(self):
         """Main game loop"""
-        print("\n" + "="*80)
-        print("🎮 LLM-DRIVEN ZORK I GAMEPLAY")
-        print("="*80)
-        print(f"Model: {self.agent.model}")
-        print(f"Max Turns: {self.max_turns}")
-        print(f"Logs: {self.log_dir}")
-        print("="*80 + "\n")
-        
-        # Start the game
-        initial_output = self.start_game()
-        state = self.parser.summarize_state(initial_output)
-        
-        print(f"📜 Initial Game State:")
-        print(state['output'])
-        print("\n🚀 Beginning LLM gameplay...\n")
-        
-        error_count = 0
-        max_consecutive_errors = 3
-        last_command = None
-        
         try:
-            while self.turn_count < self.max_turns:
+            self._begin()
+            state = self._initial_state(self.start_game())
+            
+            while self._keep_playing(state):
                 self.turn_count += 1
-                
-                # Check for game over conditions
-                if state.get('is_victory'):
-                    print("\n🎉 GAME WON! Congratulations!")
-                    break
-                
-                if state.get('is_death'):
-                    print("\n💀 Game Over - Player died")
-                    break
+                self._start_turn()
                 
                 # Get next command from LLM
-                error_mode = state.get('is_error', False) and error_count < max_consecutive_errors
-                command = self.agent.get_next_command(
-                    state['output'], 
-                    error_mode=error_mode,
-                    last_command=last_command
-                )
-                
-                # Send command to game
-                game_output = self.send_command(command)
+                command = self.agent.get_next_command(*self._command_args(state))
+                self._record_llm()
                 
-                # Parse the response
-                state = self.parser.summarize_state(game_output)
+                # Send command to game and parse the response
+                command, reply = self._validate(command)
+                room, status = self.agent.rooms.room, self._status()
+                self._speculate(command, room, status)
+                game_output = reply or self.run_command(command)
+                state = self._parse(game_output)
+                self.outcomes.record(room, command, game_output, status, state.get('status'))
                 
                 # Periodically request score if not in output (every 5 turns)
-                if not state.get('score') and self.turn_count % 5 == 0:
-                    score_output = self.send_command('score')
-                    score_state = self.parser.summarize_state(score_output)
-                    if score_state.get('score'):
-                        state['score'] = score_state['score']
-                        # Add score info to the output
-                        game_output += f"\n[Score check: {score_state['score'][0]}/{score_state['score'][1]}]"
+                if self._wants_score(state):
+                    game_output = self._add_score(state, game_output, self.send_command('score'))
                 
-                # Track errors
-                if state.get('is_error'):
-                    error_count += 1
-                else:
-                    error_count = 0
-                
-                last_command = command
-                
-                # Log the turn
-                self.log_turn(self.turn_count, command, game_output, state)
-                
-                # Print status
-                self.print_status(self.turn_count, command, state)
+                self._finish_turn(command, game_output, state)
                 
                 # Small delay to avoid overwhelming the API
-                time.sleep(0.5)
-                
-                # Break if too many consecutive errors
-                if error_count >= max_consecutive_errors:
-                    print(f"\n⚠️  Too many consecutive errors ({max_consecutive_errors}). Stopping.")
-                    break
+                if self.turn_delay:
+                    time.sleep(self.turn_delay)
                     
         except KeyboardInterrupt:
-            print("\n\n⚠️  Interrupted by user")
+            self.say("\n\n⚠️  Interrupted by user")
         except Exception as e:
-            print(f"\n\n❌ Error during gameplay: {e}")
-            import traceback
-            traceback.print_exc()
+            self._report_error(e)
         finally:
             self.cleanup()
+        
+        return self.summary
+    
+    def _begin(self):
+        """Print the banner and start the clock"""
+        self.say("\n" + "="*80)
+        self.say("🎮 LLM-DRIVEN ZORK I GAMEPLAY")
+        self.say("="*80)
+        self.say(f"Model: {self.agent.model}")
+        self.say(f"Max Turns: {self.max_turns}")
+        self.say(f"Logs: {self.log_dir}")
+        self.say("="*80 + "\n")
+        
+        self.start_time = time.time()
+    
+    def _initial_state(self, initial_output: str) -> dict:
+        state = self._parse(initial_output)
+        self.agent.observe(None, state)
+        self.say(f"📜 Initial Game State:")
+        self.say(state['output'])
+        self.say("\n🚀 Beginning LLM gameplay...\n")
+        return state
+    
+    def _keep_playing(self, state: dict) -> bool:
+        """Whether to play another turn, announcing why not"""
+        if self.turn_count >= self.max_turns or self.stopping:
+            return False
+        
+        # Check for game over conditions
+        if state.get('is_victory'):
+            self.say("\n🎉 GAME WON! Congratulations!")
+            return False
+        
+        if state.get('is_death'):
+            self.say("\n💀 Game Over - Player died")
+            return False
+        
+        if self.zmachine and self.zmachine.finished:
+            self.say("\n🏁 The game has ended")
+            return False
+        
+        # Stop if too many consecutive errors
+        if self.error_count >= self.max_consecutive_errors:
+            self.say(f"\n⚠️  Too many consecutive errors ({self.max_consecutive_errors}). Stopping.")
+            return False
+        
+        return True
+    
+    def _start_turn(self):
+        self.turn_start = time.perf_counter()
+        self.spans = {}
+    
+    @contextmanager
+    def _span(self, phase: str):
+        """Add the time spent in the with block to phase for this turn"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[phase] = self.spans.get(phase, 0.0) + time.perf_counter() - start
+    
+    def _record_llm(self):
+        """Take the agent's timings and token usage for the command it just gave"""
+        self.spans.update(self.agent.timings)
+        if self.agent.last_usage:
+            self.metrics.observe_tokens(*self.agent.last_usage)
+    
+    def _command_args(self, state: dict) -> tuple:
+        """Arguments for agent.get_next_command"""
+        error_mode = state.get('is_error', False) and self.error_count < self.max_consecutive_errors
+        return state['output'], error_mode, self.last_command
+    
+    def _validate(self, command: str):
+        """
+        Spell-check a command against the story's dictionary
+        
+        Returns the command with misspelt words corrected, and the reply to
+        use instead of sending it when it can't be fixed: the game's own
+        error message, so the game is never asked and the model tries again
+        as it would after the real one.
+        """
+        if self.validator is None or GOTO_PATTERN.match(command.strip()):
+            return command, None
+        checked, reply = self.validator.check(command)
+        if checked != command:
+            self.say(f"✏️  Corrected \"{command}\" to \"{checked}\"")
+            self.agent.amend_command(checked)
+        return checked, reply
+    
+    def _speculate(self, command: str, room, status):
+        """
+        Start the next LLM request now if this command's reply can be predicted
+        
+        The guess is the reply the command got last time in this room. The
+        next turn's request is built from it and sent while the game runs,
+        so a correct guess hides the game's latency (and the turn delay)
+        behind the model's.
+        """
+        if not self.speculative:
+            return
+        prediction = self.outcomes.predict(room, command, status)
+        if prediction is None:
+            return
+        
+        state = self._parse(*prediction)
+        error_count = self.error_count + 1 if state.get('is_error') else 0
+        # No next turn to prepare for, or one whose prompt a score probe will change
+        if (self.turn_count >= self.max_turns or self.stopping or state.get('is_death')
+                or state.get('is_victory') or error_count >= self.max_consecutive_errors
+                or self._wants_score(state)):
+            return
+        self.agent.speculate(command, state, state.get('is_error', False))
+    
+    def _status(self):
+        """GameStatus read from the built-in interpreter's memory, or None"""
+        return self.zmachine.status() if self.zmachine else None
+    
+    def _parse(self, output: str, status=None) -> dict:
+        """
+        ZorkGameParser.summarize_state, corrected from the game's memory
+        
+        With the built-in interpreter the room, score, moves and inventory
+        come from the GameStatus (also kept under 'status') rather than from
+        the text, so they are exact on every turn. Pass status to use a
+        predicted one instead of reading it.
+        """
+        with self._span('parse'):
+            state = self.parser.summarize_state(output)
+        if status is None:
+            status = self._status()
+        if status is not None:
+            state['status'] = status
+            state['location'] = status.room_name or None
+            state['score'] = (status.score, self.max_score)
+            state['moves'] = status.moves
+            state['inventory'] = list(status.inventory)
+        return state
+    
+    def _wants_score(self, state: dict) -> bool:
+        """Whether to send a score probe; never needed when the score is read from memory"""
+        return not state.get('score') and self.turn_count % 5 == 0
+    
+    def _add_score(self, state: dict, game_output: str, score_output: str) -> str:
+        """Fold the reply to a score probe into the turn's state and output"""
+        score_state = self.parser.summarize_state(score_output)
+        if score_state.get('score'):
+            state['score'] = score_state['score']
+            # Add score info to the output
+            game_output += f"\n[Score check: {score_state['score'][0]}/{score_state['score'][1]}]"
+        return game_output
+    
+    def _finish_turn(self, command: str, game_output: str, state: dict):
+        """Bookkeeping after a command: counters, logs, status and checkpoints"""
+        if state.get('is_death'):
+            self.deaths += 1
+        self.agent.observe(command, state)
+        
+        # Track errors
+        if state.get('is_error'):
+            self.error_count += 1
+        else:
+            self.error_count = 0
+        
+        self.last_command = command
+        
+        # Log the turn
+        with self._span('log_write'):
+            self.log_turn(self.turn_count, command, game_output, state)
+        
+        # Print status
+        self.print_status(self.turn_count, command, state)
+        
+        if (self.zmachine and self.checkpoint_file and not self.zmachine.finished
+                and self.turn_count % self.checkpoint_every == 0):
+            self.save_checkpoint()
+        
+        if self.turn_start is not None:
+            self.metrics.observe_turn(time.perf_counter() - self.turn_start, self.spans)
+    
+    def _report_error(self, e: Exception):
+        self.say(f"\n\n❌ Error during gameplay: {e}")
+        self.error = str(e)
+        if self.verbose:
+            import traceback
+            traceback.print_exc()
     
     def cleanup(self):
         """Clean up resources and save summary"""
-        print("\n" + "="*80)
-        print("🏁 GAME SESSION ENDED")
-        print("="*80)
+        self.say("\n" + "="*80)
+        self.say("🏁 GAME SESSION ENDED")
+        self.say("="*80)
+        
+        self.agent.close()
+        self.logger.close()
+        if self.owns_log_writer:
+            self.log_writer.close()
+        if self.log_writer.error:
+            self.say(f"⚠️  Error writing logs: {self.log_writer.error}")
         
         # Close game process
         if self.game_process:
@@ -250,6 +579,13 @@ class LLMZorkDriver:
             except:
                 pass
         
+        # Checkpoint where we stopped so the run can be resumed
+        if self.zmachine and self.checkpoint_file and not self.zmachine.finished:
+            try:
+                self.save_checkpoint()
+            except Exception as e:
+                self.say(f"⚠️  Could not save checkpoint: {e}")
+        
         # Save summary
         summary = {
             'timestamp': datetime.now().isoformat(),
@@ -257,63 +593,528 @@ class LLMZorkDriver:
             'final_score': self.current_score,
             'max_score': self.max_score,
             'completion_percentage': (self.current_score / self.max_score * 100),
+            'deaths': self.deaths,
+            'prompt_tokens': self.agent.prompt_tokens,
+            'completion_tokens': self.agent.completion_tokens,
+            'wall_time': time.time() - self.start_time if self.start_time else 0.0,
+            'seed': self.seed,
+            'error': self.error,
+            'prompt_cache': self.agent.history.stats(),
+            'rooms_visited': len(self.agent.rooms.exits),
+            'route_moves': self.route_moves,
+            'cache_hits': self.agent.cache_hits,
+            'validation': {
+                'corrections': self.validator.corrections if self.validator else 0,
+                'rejections': self.validator.rejections if self.validator else 0
+            },
+            'speculation': {
+                'requests': self.agent.speculations,
+                'hits': self.agent.speculation_hits
+            },
+            'metrics': self.metrics.summary(),
             'model': self.agent.model,
             'transcript': str(self.transcript_file),
-            'llm_log': str(self.llm_log_file)
+            'llm_log': str(self.llm_log_file) if self.llm_log_file else None,
+            'turn_records': str(self.records_file) if self.records_file else None,
+            'metrics_file': str(self.metrics_file)
         }
         
         with open(self.summary_file, 'w') as f:
             json.dump(summary, f, indent=2)
+        self.metrics.write(self.metrics_file)
+        self.summary = summary
         
-        print(f"\n📊 Final Statistics:")
-        print(f"   Turns Played: {self.turn_count}")
-        print(f"   Final Score: {self.current_score}/{self.max_score}")
-        print(f"   Completion: {summary['completion_percentage']:.1f}%")
-        print(f"\n📁 Logs saved to: {self.log_dir}")
-        print(f"   - Transcript: {self.transcript_file.name}")
-        print(f"   - LLM Log: {self.llm_log_file.name}")
-        print(f"   - Summary: {self.summary_file.name}")
-        print("="*80 + "\n")
+        self.say(f"\n📊 Final Statistics:")
+        self.say(f"   Turns Played: {self.turn_count}")
+        self.say(f"   Final Score: {self.current_score}/{self.max_score}")
+        self.say(f"   Completion: {summary['completion_percentage']:.1f}%")
+        cache = summary['prompt_cache']
+        server = (f", server cached {cache['server_hit_rate']:.0%}"
+                  if cache['server_hit_rate'] is not None else "")
+        if self.agent.cache is not None:
+            self.say(f"   LLM Cache Hits: {self.agent.cache_hits}")
+        if self.validator:
+            self.say(f"   Commands Corrected: {self.validator.corrections}, "
+                     f"Answered Locally: {self.validator.rejections}")
+        if self.speculative:
+            self.say(f"   Speculative Requests Used: {self.agent.speculation_hits}"
+                     f"/{self.agent.speculations}")
+        self.say(f"   Prompt Prefix Reuse: {cache['prefix_hit_rate']:.0%}{server} "
+                 f"({cache['compactions']} compactions)")
+        if self.turn_count:
+            for line in format_summary(summary['metrics']):
+                self.say(f"   {line}")
+        self.say(f"\n📁 Logs saved to: {self.log_dir}")
+        self.say(f"   - Transcript: {self.transcript_file.name}")
+        if self.llm_log_file:
+            self.say(f"   - LLM Log: {self.llm_log_file.name}")
+        if self.records_file:
+            self.say(f"   - Turn Records: {self.records_file.name}")
+        self.say(f"   - Summary: {self.summary_file.name}")
+        self.say(f"   - Metrics: {self.metrics_file.name}")
+        self.say("="*80 + "\n")
+
+
+
+class AsyncLLMZorkDriver(LLMZorkDriver):
+    """
+    LLMZorkDriver for an asyncio event loop
+    
+    LLM requests go through AsyncOpenAI and Fic output is read with pexpect's
+    async expect, so one process can interleave many games while each waits
+    on the server. The built-in Z-machine answers a command in a few
+    milliseconds without blocking on I/O, so it is stepped directly.
+    """
+    
+    agent_class = AsyncZorkLLMAgent
+    
+    def __init__(self, *args, batcher: RequestBatcher = None, **kwargs):
+        """Takes the LLMZorkDriver arguments, plus an optional RequestBatcher shared between games"""
+        super().__init__(*args, **kwargs)
+        self.agent.batcher = batcher
+    
+    async def start_game(self):
+        """Start the Zork game with the configured interpreter"""
+        if self.interpreter == "builtin":
+            return self._start_builtin()
+        
+        self._spawn_fic()
+        try:
+            await self.game_process.expect('>', timeout=10, async_=True)
+            self.say("✅ Game started successfully!\n")
+        except pexpect.TIMEOUT:
+            self.say("⚠️  Timeout waiting for game prompt")
+        return self.game_process.before or ""
+    
+    async def send_command(self, command: str) -> str:
+        """Send a command to the game and get the response"""
+        with self._span('game'):
+            if self.zmachine:
+                return self.zmachine.step(command)
+            
+            try:
+                self.game_process.sendline(command)
+                await self.game_process.expect('>', timeout=5, async_=True)
+                return self.game_process.before
+            except pexpect.TIMEOUT:
+                # Sometimes there's no prompt (game over, etc.)
+                return self.game_process.before or ""
+            except Exception as e:
+                self.say(f"⚠️  Error sending command: {e}")
+                return ""
+    
+    async def run_command(self, command: str) -> str:
+        """Send a command, walking "go to <room>" along the room graph without the LLM"""
+        route = self._plan_route(command)
+        if route is None:
+            return await self.send_command(command)
+        
+        target, steps, message = route
+        if not steps:
+            return message
+        taken = []
+        for direction, expected in steps:
+            output = await self.send_command(direction)
+            taken.append(direction)
+            if not self._route_step(direction, expected, output):
+                break
+        return self._route_output(target, steps, taken, output)
+    
+    async def game_loop(self):
+        """Main game loop"""
+        try:
+            self._begin()
+            state = self._initial_state(await self.start_game())
+            
+            while self._keep_playing(state):
+                self.turn_count += 1
+                self._start_turn()
+                
+                command = await self.agent.get_next_command(*self._command_args(state))
+                self._record_llm()
+                
+                command, reply = self._validate(command)
+                room, status = self.agent.rooms.room, self._status()
+                self._speculate(command, room, status)
+                game_output = reply or await self.run_command(command)
+                state = self._parse(game_output)
+                self.outcomes.record(room, command, game_output, status, state.get('status'))
+                
+                if self._wants_score(state):
+                    game_output = self._add_score(state, game_output,
+                                                  await self.send_command('score'))
+                
+                self._finish_turn(command, game_output, state)
+                
+                if self.turn_delay:
+                    await asyncio.sleep(self.turn_delay)
+                    
+        except asyncio.CancelledError:
+            self.say("\n\n⚠️  Cancelled")
+        except Exception as e:
+            self._report_error(e)
+        finally:
+            self.cleanup()
+        
+        return self.summary
+
+
+def run_batch(games: int, concurrency: int, base_seed: int, log_dir: str,
+              use_async: bool = False, batch_window: float = 0.0, max_batch: int = 32,
+              batch_mode: str = "chat", metrics_port: int = None,
+              metrics_host: str = "127.0.0.1", **driver_args):
+    """
+    Play several independent games at once against the same endpoint
+    
+    Game i is seeded with base_seed + i and logs to its own directory under
+    log_dir/batch_<timestamp>. Games run on a thread pool, or with use_async
+    as tasks on one event loop. A batch_window (seconds) also makes the
+    games share a RequestBatcher that sends their LLM requests in batches
+    of up to max_batch. All games write their logs through one LogWriter.
+    With metrics_port, the games' combined metrics are served at /metrics
+    on metrics_host while they play. Returns the batch directory, the summaries in game
+    order and the aggregate totals.
+    """
+    batch_dir = Path(log_dir) / f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    batcher = None
+    if batch_window > 0:
+        use_async = True
+        batcher = RequestBatcher(AsyncOpenAI(base_url=driver_args['vllm_url'],
+                                             api_key=driver_args['api_key']),
+                                 window=batch_window, max_batch=max_batch, mode=batch_mode)
+        driver_args['batcher'] = batcher
+    driver_args['log_writer'] = log_writer = LogWriter()
+    driver_class = AsyncLLMZorkDriver if use_async else LLMZorkDriver
+    drivers = [
+        driver_class(log_dir=str(batch_dir / f"game_{i:03d}"), seed=base_seed + i,
+                     verbose=False, **driver_args)
+        for i in range(games)
+    ]
+    summaries = [None] * games
+    
+    def combined_metrics():
+        return TurnMetrics.combine(driver.metrics for driver in drivers)
+    
+    if metrics_port:
+        serve_metrics(lambda: combined_metrics().openmetrics(), metrics_port, metrics_host)
+        print(f"📈 Metrics at http://{metrics_host}:{metrics_port}/metrics")
+    print(f"🎮 Playing {games} games, {concurrency} at a time"
+          f"{' on one event loop' if use_async else ''}")
+    print(f"📁 Logs: {batch_dir}\n")
+    
+    start = time.time()
+    try:
+        if use_async:
+            asyncio.run(_play_async(drivers, concurrency, summaries))
+        else:
+            _play_threaded(drivers, concurrency, summaries)
+    except KeyboardInterrupt:
+        print("\n⚠️  Interrupted - keeping the games that finished")
+    finally:
+        log_writer.close()
+    
+    summaries = [summary for summary in summaries if summary]
+    totals = batch_totals(summaries)
+    totals['elapsed'] = time.time() - start
+    if batcher:
+        totals['llm_batches'] = batcher.batches
+        totals['mean_batch_size'] = batcher.mean_batch_size
+    metrics = combined_metrics()
+    metrics.write(batch_dir / "metrics.txt")
+    with open(batch_dir / "batch_summary.json", 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'model': driver_args.get('model_name'),
+            'games': summaries,
+            'totals': totals,
+            'metrics': metrics.summary()
+        }, f, indent=2)
+    return batch_dir, summaries, totals
+
+
+def _play_threaded(drivers: list, concurrency: int, summaries: list):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(driver.game_loop): i for i, driver in enumerate(drivers)}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    summaries[i] = future.result()
+                except Exception as e:
+                    _report_game(done, drivers, i, error=e)
+                else:
+                    _report_game(done, drivers, i, summaries[i])
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            for driver in drivers:
+                driver.stop()
+            raise
+
+
+async def _play_async(drivers: list, concurrency: int, summaries: list):
+    limit = asyncio.Semaphore(concurrency)
+    
+    async def play(i, driver):
+        async with limit:
+            try:
+                return i, await driver.game_loop(), None
+            except Exception as e:
+                return i, None, e
+    
+    tasks = [play(i, driver) for i, driver in enumerate(drivers)]
+    for done, next_game in enumerate(asyncio.as_completed(tasks), 1):
+        i, summary, error = await next_game
+        summaries[i] = summary
+        _report_game(done, drivers, i, summary, error)
+
+
+def _report_game(done: int, drivers: list, i: int, summary: dict = None, error=None):
+    progress = f"[{done}/{len(drivers)}] game {i} (seed {drivers[i].seed})"
+    if error:
+        print(f"❌ {progress} failed: {error}")
+    else:
+        print(f"✅ {progress}: score {summary['final_score']}, "
+              f"{summary['total_turns']} turns, {summary['wall_time']:.1f}s")
+
+
+def batch_totals(summaries: list) -> dict:
+    """Aggregate statistics over a list of game summaries"""
+    count = len(summaries) or 1
+    scores = [s['final_score'] for s in summaries]
+    return {
+        'games': len(summaries),
+        'mean_score': sum(scores) / count,
+        'best_score': max(scores, default=0),
+        'mean_turns': sum(s['total_turns'] for s in summaries) / count,
+        'deaths': sum(s['deaths'] for s in summaries),
+        'tokens': sum(s['prompt_tokens'] + s['completion_tokens'] for s in summaries),
+        'mean_wall_time': sum(s['wall_time'] for s in summaries) / count,
+        'errors': sum(1 for s in summaries if s['error']),
+        'cache_hits': sum(s['cache_hits'] for s in summaries),
+        'corrections': sum(s['validation']['corrections'] for s in summaries),
+        'rejections': sum(s['validation']['rejections'] for s in summaries),
+        'speculations': sum(s['speculation']['requests'] for s in summaries),
+        'speculation_hits': sum(s['speculation']['hits'] for s in summaries),
+        'mean_prefix_hit_rate': sum(s['prompt_cache']['prefix_hit_rate'] for s in summaries) / count
+    }
+
+
+def print_batch_results(summaries: list, totals: dict):
+    """Print one row per game plus the means and totals"""
+    header = f"{'game':>5} {'seed':>6} {'score':>6} {'turns':>6} {'deaths':>7} {'tokens':>9} {'time':>8}"
+    print("\n" + "="*len(header))
+    print(header)
+    print("-"*len(header))
+    for i, s in enumerate(summaries):
+        tokens = s['prompt_tokens'] + s['completion_tokens']
+        seed = '-' if s['seed'] is None else s['seed']
+        error = "  ❌ " + s['error'] if s['error'] else ""
+        print(f"{i:>5} {seed:>6} {s['final_score']:>6} {s['total_turns']:>6} "
+              f"{s['deaths']:>7} {tokens:>9} {s['wall_time']:>7.1f}s{error}")
+    count = totals['games'] or 1
+    print("-"*len(header))
+    print(f"{'mean':>5} {'':>6} {totals['mean_score']:>6.1f} {totals['mean_turns']:>6.1f} "
+          f"{totals['deaths'] / count:>7.2f} {totals['tokens'] / count:>9.0f} "
+          f"{totals['mean_wall_time']:>7.1f}s")
+    print(f"Best score: {totals['best_score']}   Deaths: {totals['deaths']}   "
+          f"Tokens: {totals['tokens']}   Errors: {totals['errors']}   "
+          f"Elapsed: {totals['elapsed']:.1f}s")
+    print(f"Prompt prefix reuse: {totals['mean_prefix_hit_rate']:.0%}   "
+          f"LLM cache hits: {totals['cache_hits']}   "
+          f"Corrected: {totals['corrections']}   Answered locally: {totals['rejections']}")
+    if totals['speculations']:
+        print(f"Speculative requests used: {totals['speculation_hits']}/{totals['speculations']}")
+    if 'llm_batches' in totals:
+        print(f"LLM batches: {totals['llm_batches']}   "
+              f"Mean batch size: {totals['mean_batch_size']:.1f}")
+    print("="*len(header) + "\n")
 
 
 def main():
     parser = argparse.ArgumentParser(description='LLM-powered Zork I player')
-    parser.add_argument('--vllm-url', 
-                       default=os.getenv('VLLM_API_URL', 'http://localhost:8000/v1'),
-                       help='LLM API base URL (vLLM, OpenAI, Azure, etc.)')
-    parser.add_argument('--model', 
-                       default=os.getenv('VLLM_MODEL_NAME', 'meta-llama/Llama-3.1-8B-Instruct'),
-                       help='Model name')
-    parser.add_argument('--api-key',
-                       default=os.getenv('OPENAI_API_KEY', 'EMPTY'),
-                       help='API key (for OpenAI/Azure, use "EMPTY" for vLLM)')
-    parser.add_argument('--story-file', 
-                       default='zork1.z3',
-                       help='Path to Zork story file')
-    parser.add_argument('--max-turns', 
+    subparsers = parser.add_subparsers(dest='mode')
+    play = subparsers.add_parser('play', help='Play one game with console output (default)')
+    batch = subparsers.add_parser('batch', help='Play many games concurrently and tabulate results')
+    
+    for sub in (play, batch):
+        sub.add_argument('--vllm-url', 
+                         default=os.getenv('VLLM_API_URL', 'http://localhost:8000/v1'),
+                         help='LLM API base URL (vLLM, OpenAI, Azure, etc.)')
+        sub.add_argument('--model', 
+                         default=os.getenv('VLLM_MODEL_NAME', 'meta-llama/Llama-3.1-8B-Instruct'),
+                         help='Model name')
+        sub.add_argument('--api-key',
+                         default=os.getenv('OPENAI_API_KEY', 'EMPTY'),
+                         help='API key (for OpenAI/Azure, use "EMPTY" for vLLM)')
+        sub.add_argument('--story-file', 
+                         default='zork1.z3',
+                         help='Path to Zork story file')
+        sub.add_argument('--max-turns', 
+                         type=int,
+                         default=int(os.getenv('MAX_TURNS', '500')),
+                         help='Maximum number of turns')
+        sub.add_argument('--log-dir',
+                         default='logs',
+                         help='Directory for logs')
+        sub.add_argument('--history-tokens',
+                         type=int,
+                         default=None,
+                         help='Token budget for recent turns before older ones are summarized '
+                              '(default: 600 with the world state, 2000 without)')
+        sub.add_argument('--no-world-state',
+                         dest='world_state',
+                         action='store_false',
+                         help="Don't keep a structured world state; send more raw history instead")
+        sub.add_argument('--cache',
+                         default=os.getenv('ZORK_LLM_CACHE'),
+                         help='SQLite file caching LLM replies by request, shared across runs')
+        sub.add_argument('--cache-size',
+                         type=int,
+                         default=100000,
+                         help='Most replies to keep in the cache (least recently used go first)')
+        sub.add_argument('--temperature-zero',
+                         action='store_true',
+                         help='Sample at temperature 0 so cached replies are valid')
+        sub.add_argument('--no-validate',
+                         dest='validate',
+                         action='store_false',
+                         help="Send commands as the model wrote them, without checking "
+                              "them against the story's dictionary")
+        sub.add_argument('--speculate',
+                         action='store_true',
+                         help='Request the next command while the game runs when its reply '
+                              'can be predicted from an earlier turn')
+        sub.add_argument('--log-format',
+                         choices=['jsonl', 'records', 'both'],
+                         default='jsonl',
+                         help='Per-turn log: llm_queries_*.jsonl, compact turns_*.zturns records '
+                              'with the full game output, or both')
+        sub.add_argument('--stream',
+                         action='store_true',
+                         help='Stream LLM replies so the time to first token is measured')
+        sub.add_argument('--metrics-port',
+                         type=int,
+                         default=None,
+                         help='Serve per-turn latency and token metrics in the OpenMetrics '
+                              'format at http://HOST:PORT/metrics')
+        sub.add_argument('--metrics-host',
+                         default='127.0.0.1',
+                         help='Address to serve metrics on (default: 127.0.0.1; '
+                              '0.0.0.0 for every interface)')
+        sub.add_argument('--interpreter',
+                         choices=['builtin', 'fic'],
+                         default=os.getenv('ZORK_INTERPRETER', 'builtin'),
+                         help='Run the story in-process (builtin) or via Fic under pexpect')
+    
+    play.add_argument('--checkpoint',
+                      default=os.getenv('ZORK_CHECKPOINT'),
+                      help='Quetzal file to checkpoint the game to (builtin interpreter only)')
+    play.add_argument('--checkpoint-every',
+                      type=int,
+                      default=10,
+                      help='Save a checkpoint every N turns')
+    play.add_argument('--resume',
+                      action='store_true',
+                      help='Resume from the checkpoint file if it exists')
+    play.add_argument('--seed',
+                      type=int,
+                      default=None,
+                      help='Random seed for the game (builtin interpreter only)')
+    
+    batch.add_argument('--games',
                        type=int,
-                       default=int(os.getenv('MAX_TURNS', '500')),
-                       help='Maximum number of turns')
-    parser.add_argument('--log-dir',
-                       default='logs',
-                       help='Directory for logs')
+                       default=10,
+                       help='Number of games to play')
+    batch.add_argument('--concurrency',
+                       type=int,
+                       default=4,
+                       help='Number of games to play at the same time')
+    batch.add_argument('--seed',
+                       type=int,
+                       default=0,
+                       help='Seed of the first game; game i uses seed + i')
+    batch.add_argument('--async',
+                       dest='use_async',
+                       action='store_true',
+                       help='Run all games as tasks on one event loop (AsyncOpenAI)')
+    batch.add_argument('--batch-window',
+                       type=float,
+                       default=0.0,
+                       help='Collect LLM requests for this many milliseconds and send them '
+                            'as one batch (implies --async; 0 disables)')
+    batch.add_argument('--max-batch',
+                       type=int,
+                       default=32,
+                       help='Send a batch as soon as this many requests are waiting')
+    batch.add_argument('--batch-mode',
+                       choices=['chat', 'completions'],
+                       default='chat',
+                       help='Send a batch as simultaneous chat requests, or as one '
+                            'multi-prompt /v1/completions request (vLLM)')
+    batch.add_argument('--turn-delay',
+                       type=float,
+                       default=0.0,
+                       help='Seconds each game waits between turns')
     
-    args = parser.parse_args()
+    # Without a subcommand, play a single game as before
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in ('play', 'batch', '-h', '--help'):
+        argv = ['play'] + argv
+    args = parser.parse_args(argv)
     
     # Validate story file exists
     if not Path(args.story_file).exists():
         print(f"❌ Error: Story file not found: {args.story_file}")
         sys.exit(1)
     
-    # Create and run driver
-    driver = LLMZorkDriver(
+    driver_args = dict(
         vllm_url=args.vllm_url,
         model_name=args.model,
         story_file=args.story_file,
         max_turns=args.max_turns,
+        api_key=args.api_key,
+        interpreter=args.interpreter,
+        history_tokens=args.history_tokens,
+        world_state=args.world_state,
+        temperature_zero=args.temperature_zero,
+        speculate=args.speculate,
+        validate=args.validate,
+        log_format=args.log_format,
+        stream=args.stream
+    )
+    if args.cache:
+        driver_args['cache'] = ResponseCache(args.cache, args.cache_size)
+        if not args.temperature_zero:
+            print("⚠️  Caching replies sampled at temperature 1; add --temperature-zero "
+                  "for replays that match what the model would say")
+    
+    if args.mode == 'batch':
+        batch_dir, summaries, totals = run_batch(args.games, max(1, args.concurrency), args.seed,
+                                         args.log_dir, use_async=args.use_async,
+                                         batch_window=args.batch_window / 1000,
+                                         max_batch=args.max_batch,
+                                         batch_mode=args.batch_mode,
+                                         metrics_port=args.metrics_port,
+                                         metrics_host=args.metrics_host,
+                                         turn_delay=args.turn_delay,
+                                         **driver_args)
+        print_batch_results(summaries, totals)
+        print(f"📁 Batch summary: {batch_dir / 'batch_summary.json'}")
+        return
+    
+    # Create and run driver
+    driver = LLMZorkDriver(
         log_dir=args.log_dir,
-        api_key=args.api_key
+        checkpoint_file=args.checkpoint,
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        seed=args.seed,
+        **driver_args
     )
+    if args.metrics_port:
+        serve_metrics(driver.metrics.openmetrics, args.metrics_port, args.metrics_host)
+        print(f"📈 Metrics at http://{args.metrics_host}:{args.metrics_port}/metrics")
     
     driver.game_loop()
 
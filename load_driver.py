@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Load test the driver against the mock LLM server
+
+Starts mock_llm_server.py in its own process (or uses --url), plays many
+LLMZorkDriver games against it on a thread pool, and reports turns/sec,
+turn latency percentiles and where a turn's time goes:
+
+  llm     waiting for get_next_command; the part the server spent
+          sleeping is shown as "server latency", the rest is the
+          client, HTTP and prompt building
+  game    the interpreter running commands
+  other   parsing, validation, world state, logging and status
+
+    python3 load_driver.py --sessions 32 --concurrency 16 --latency lognormal:0.2:0.4
+"""
+
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from llm_zork_driver import LLMZorkDriver
+from turn_logger import LogWriter
+from zork_llm_agent import ZorkLLMAgent
+
+
+class TimedAgent(ZorkLLMAgent):
+    """ZorkLLMAgent that adds up the time spent getting commands"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.llm_time = 0.0
+
+    def get_next_command(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().get_next_command(*args, **kwargs)
+        finally:
+            self.llm_time += time.perf_counter() - start
+
+
+class TimedDriver(LLMZorkDriver):
+    """LLMZorkDriver that records each turn's duration, split into LLM and game time"""
+
+    agent_class = TimedAgent
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.game_time = 0.0
+        self.turns = []  # (seconds, llm seconds, game seconds) per turn
+        self._mark = (0.0, 0.0, 0.0)
+
+    def send_command(self, command: str) -> str:
+        start = time.perf_counter()
+        try:
+            return super().send_command(command)
+        finally:
+            self.game_time += time.perf_counter() - start
+
+    def _initial_state(self, initial_output: str) -> dict:
+        state = super()._initial_state(initial_output)
+        self._mark = (time.perf_counter(), self.agent.llm_time, self.game_time)
+        return state
+
+    def _finish_turn(self, command: str, game_output: str, state: dict):
+        super()._finish_turn(command, game_output, state)
+        mark = (time.perf_counter(), self.agent.llm_time, self.game_time)
+        self.turns.append(tuple(now - then for now, then in zip(mark, self._mark)))
+        self._mark = mark
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(server_args: List[str]):
+    """Run mock_llm_server.py in a subprocess; returns the process and its base URL"""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, str(Path(__file__).with_name('mock_llm_server.py')),
+                                '--port', str(port)] + server_args,
+                               stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/v1"
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Mock server exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(f"{url}/models", timeout=1).close()
+            return process, url
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("Mock server did not start")
+
+
+def server_stats(url: str) -> Dict:
+    """The mock server's counters, or {} if the server isn't the mock"""
+    try:
+        with urllib.request.urlopen(url.rsplit('/v1', 1)[0] + '/stats', timeout=5) as response:
+            return json.load(response)
+    except (OSError, ValueError):
+        return {}
+
+
+def percentile(values: List[float], p: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[int(p) - 1]
+
+
+def run_load(url: str, sessions: int, concurrency: int, log_dir: Path, **driver_args) -> Dict:
+    log_writer = LogWriter()
+    drivers = [
+        TimedDriver(url, 'mock', log_dir=str(log_dir / f"game_{i:03d}"), api_key=f"load-{i}",
+                    seed=i, verbose=False, turn_delay=0.0, log_writer=log_writer, **driver_args)
+        for i in range(sessions)
+    ]
+    before = server_stats(url)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            summaries = list(pool.map(lambda driver: driver.game_loop(), drivers))
+    finally:
+        log_writer.close()
+    elapsed = time.perf_counter() - start
+    after = server_stats(url)
+
+    turns = [turn for driver in drivers for turn in driver.turns]
+    latencies = sorted(turn[0] * 1000 for turn in turns)
+    total, llm, game = (sum(turn[i] for turn in turns) for i in range(3))
+    server_latency = after.get('latency', 0.0) - before.get('latency', 0.0)
+    count = len(turns) or 1
+    return {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'turns': len(turns),
+        'elapsed': elapsed,
+        'turns_per_sec': len(turns) / elapsed if elapsed else 0.0,
+        'turn_ms': {'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90),
+                    'p99': percentile(latencies, 99), 'max': latencies[-1] if latencies else 0.0},
+        'per_turn_ms': {
+            'llm': llm / count * 1000,
+            'server_latency': server_latency / count * 1000,
+            'game': game / count * 1000,
+            'other': (total - llm - game) / count * 1000,
+        },
+        'game_errors': sum(1 for s in summaries if s and s['error']),
+        'server': {key: after.get(key, 0) - before.get(key, 0)
+                   for key in ('requests', 'errors', 'rate_limited')} if after else {},
+    }
+
+
+def print_results(results: Dict):
+    per_turn = results['per_turn_ms']
+    total = sum(per_turn[key] for key in ('llm', 'game', 'other')) or 1
+    print("\n" + "=" * 60)
+    print(f"🎮 {results['sessions']} games, {results['concurrency']} at a time: "
+          f"{results['turns']} turns in {results['elapsed']:.1f}s")
+    print(f"⚡ {results['turns_per_sec']:.1f} turns/sec")
+    turn_ms = results['turn_ms']
+    print(f"⏱️  Turn latency: p50 {turn_ms['p50']:.1f} ms   p90 {turn_ms['p90']:.1f} ms   "
+          f"p99 {turn_ms['p99']:.1f} ms   max {turn_ms['max']:.1f} ms")
+    print("\nWhere a turn's time goes (mean per turn):")
+    print(f"  llm     {per_turn['llm']:>8.2f} ms  {per_turn['llm'] / total:>6.1%}"
+          f"   (server latency {per_turn['server_latency']:.2f} ms)")
+    print(f"  game    {per_turn['game']:>8.2f} ms  {per_turn['game'] / total:>6.1%}")
+    print(f"  other   {per_turn['other']:>8.2f} ms  {per_turn['other'] / total:>6.1%}")
+    server = results['server']
+    if server:
+        print(f"\nServer: {server['requests']} requests, {server['errors']} errors injected, "
+              f"{server['rate_limited']} rate limited")
+    if results['game_errors']:
+        print(f"❌ {results['game_errors']} games ended with an error")
+    print("=" * 60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Zork driver against a mock LLM server')
+    parser.add_argument('--url', help='Use this server instead of starting mock_llm_server.py')
+    parser.add_argument('--sessions', type=int, default=16, help='Number of games to play')
+    parser.add_argument('--concurrency', type=int, default=8, help='Games playing at the same time')
+    parser.add_argument('--max-turns', type=int, default=50, help='Turns per game')
+    parser.add_argument('--story-file', default='zork1.z3', help='Path to Zork story file')
+    parser.add_argument('--log-dir', default='logs', help='Games log to a load_<timestamp> directory here')
+    parser.add_argument('--log-format', choices=['jsonl', 'records', 'both'], default='jsonl',
+                        help='Per-turn log format, as for llm_zork_driver.py')
+    parser.add_argument('--output', help='Save the results as JSON')
+    server = parser.add_argument_group('mock server (ignored with --url)')
+    server.add_argument('--policy', choices=['rules', 'walkthrough'], default='rules',
+                        help='Where the mock server gets commands')
+    server.add_argument('--latency', default='fixed:0.2', help='Mock server latency distribution')
+    server.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 500 replies')
+    server.add_argument('--rate-limit', type=float, default=0.0, help='Fraction of 429 replies')
+    server.add_argument('--seed', type=int, default=0, help='Seed for latencies and faults')
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_server(['--policy', args.policy, '--latency', args.latency,
+                                     '--error-rate', str(args.error_rate),
+                                     '--rate-limit', str(args.rate_limit), '--seed', str(args.seed)])
+        print(f"🤖 Mock LLM server at {url} ({args.policy} policy, latency {args.latency})")
+    log_dir = Path(args.log_dir) / f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        results = run_load(url, args.sessions, args.concurrency, log_dir, story_file=args.story_file,
+                           max_turns=args.max_turns, log_format=args.log_format)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""A local stand-in for an OpenAI-compatible LLM server, for load tests
+
+Answers POST /v1/chat/completions, streamed or not (and the multi-prompt
+/v1/completions call RequestBatcher uses) after a latency drawn from a configurable
+distribution, and can inject server errors and 429 rate limits. Commands
+come from a policy instead of a model:
+
+  rules        simple keyword rules on the latest game output, then
+               wandering in the compass directions
+  walkthrough  the commands of a file such as win_zork.txt, in order. Each
+               API key is its own session, so give every game its own key
+
+GET /stats returns request counts as JSON.
+
+    python3 mock_llm_server.py --port 8000 --latency lognormal:0.3:0.5 --rate-limit 0.02
+    python3 llm_zork_driver.py --vllm-url http://localhost:8000/v1 --model mock
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+from prompt_history import estimate_tokens
+
+# (words that must all appear in the game output, command), first match wins
+RULES = [
+    (("mailbox",), "open mailbox"),
+    (("leaflet",), "take leaflet"),
+    (("window", "slightly ajar"), "open window"),
+    (("window", "open"), "enter window"),
+    (("lantern",), "take lantern"),
+    (("sword",), "take sword"),
+    (("dark",), "turn on lantern"),
+    (("rug",), "move rug"),
+    (("trap door",), "open trap door"),
+]
+DIRECTIONS = ["north", "east", "south", "west", "up", "down", "northeast", "southwest"]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    A sampler for a latency spec, in seconds:
+    fixed:S, uniform:LOW:HIGH, normal:MEAN:STDEV or lognormal:MEDIAN:SIGMA
+    """
+    kind, *args = spec.split(':')
+    try:
+        args = [float(arg) for arg in args]
+        if kind == 'fixed' and len(args) == 1:
+            return lambda rng: args[0]
+        if kind == 'uniform' and len(args) == 2:
+            return lambda rng: rng.uniform(args[0], args[1])
+        if kind == 'normal' and len(args) == 2:
+            return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+        if kind == 'lognormal' and len(args) == 2:
+            mu = math.log(args[0])
+            return lambda rng: rng.lognormvariate(mu, args[1])
+    except ValueError:
+        pass
+    raise ValueError(f"Bad latency spec {spec!r}: use fixed:S, uniform:LOW:HIGH, "
+                     f"normal:MEAN:STDEV or lognormal:MEDIAN:SIGMA")
+
+
+def rules_command(messages: List[Dict]) -> str:
+    """The first rule matching the latest game output, or the next direction to try"""
+    output = messages[-1]['content'].lower() if messages else ''
+    earlier = {m['content'] for m in messages if m['role'] == 'assistant'}
+    for words, command in RULES:
+        if command not in earlier and all(word in output for word in words):
+            return command
+    turns = sum(1 for m in messages if m['role'] == 'assistant') + len(output)
+    return DIRECTIONS[turns % len(DIRECTIONS)]
+
+
+class MockLLM:
+    """Policy, latency and fault injection, shared by all request handler threads"""
+
+    def __init__(self, policy: str = 'rules', walkthrough: str = 'win_zork.txt',
+                 latency: str = 'fixed:0.2', error_rate: float = 0.0,
+                 rate_limit: float = 0.0, retry_after: float = 0.05, seed: int = None):
+        self.policy = policy
+        self.commands = []
+        if policy == 'walkthrough':
+            with open(walkthrough) as f:
+                self.commands = [line.strip() for line in f if line.strip()]
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.positions: Dict[str, int] = {}
+        self.stats = {'requests': 0, 'completions': 0, 'errors': 0, 'rate_limited': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0, 'latency': 0.0}
+
+    def draw(self):
+        """Decide a request's fate: (delay, status); status is None to answer normally"""
+        with self.lock:
+            self.stats['requests'] += 1
+            roll = self.rng.random()
+            if roll < self.rate_limit:
+                self.stats['rate_limited'] += 1
+                return 0.0, 429
+            delay = self.latency(self.rng)
+            self.stats['latency'] += delay
+            if roll < self.rate_limit + self.error_rate:
+                self.stats['errors'] += 1
+                return delay, 500
+            return delay, None
+
+    def command(self, session: str, messages: List[Dict]) -> str:
+        if self.policy != 'walkthrough':
+            return rules_command(messages)
+        with self.lock:
+            position = self.positions.get(session, 0)
+            self.positions[session] = position + 1
+        return self.commands[position % len(self.commands)]
+
+    def count(self, prompts: List[str], replies: List[str]) -> Dict:
+        usage = {'prompt_tokens': sum(estimate_tokens(p) for p in prompts),
+                 'completion_tokens': sum(estimate_tokens(r) for r in replies)}
+        with self.lock:
+            self.stats['completions'] += len(replies)
+            self.stats['prompt_tokens'] += usage['prompt_tokens']
+            self.stats['completion_tokens'] += usage['completion_tokens']
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        usage['prompt_tokens_details'] = {'cached_tokens': 0}
+        return usage
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    mock: MockLLM = None
+
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the load test
+
+    def _send_json(self, status: int, body: Dict, headers: Dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model: str, reply: str, usage: Dict = None):
+        """Server-sent events as the API streams them: role, text, finish, usage, [DONE]"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        chunk = {'id': f'chatcmpl-mock-{self.mock.stats["requests"]}', 'object': 'chat.completion.chunk',
+                 'created': int(time.time()), 'model': model}
+        deltas = [({'role': 'assistant', 'content': ''}, None), ({'content': reply}, None), ({}, 'stop')]
+        events = [dict(chunk, choices=[{'index': 0, 'delta': delta, 'finish_reason': finish}])
+                  for delta, finish in deltas]
+        if usage:
+            events.append(dict(chunk, choices=[], usage=usage))
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/v1/models':
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model'}]})
+        elif self.path.rstrip('/') == '/stats':
+            with self.mock.lock:
+                self._send_json(200, dict(self.mock.stats))
+        else:
+            self._send_json(404, {'error': {'message': f'No route {self.path}'}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        path = self.path.rstrip('/')
+        if path not in ('/v1/chat/completions', '/v1/completions'):
+            self._send_json(404, {'error': {'message': f'No route {self.path}'}})
+            return
+
+        delay, status = self.mock.draw()
+        time.sleep(delay)
+        if status == 429:
+            self._send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit'}},
+                            {'retry-after-ms': str(int(self.mock.retry_after * 1000))})
+            return
+        if status:
+            self._send_json(status, {'error': {'message': 'Injected server error', 'type': 'server_error'}})
+            return
+
+        session = self.headers.get('Authorization', '')
+        model = body.get('model', 'mock')
+        if path == '/v1/chat/completions':
+            messages = body.get('messages', [])
+            reply = self.mock.command(session, messages)
+            usage = self.mock.count([m['content'] for m in messages], [reply])
+            if body.get('stream'):
+                include_usage = (body.get('stream_options') or {}).get('include_usage')
+                self._send_stream(model, reply, usage if include_usage else None)
+                return
+            self._send_json(200, {
+                'id': f'chatcmpl-mock-{self.mock.stats["requests"]}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': reply}}],
+                'usage': usage,
+            })
+        else:
+            prompts = body.get('prompt', [])
+            prompts = [prompts] if isinstance(prompts, str) else prompts
+            replies = [self.mock.command(f'{session}#{i}', [{'role': 'user', 'content': p}])
+                       for i, p in enumerate(prompts)]
+            usage = self.mock.count(prompts, replies)
+            self._send_json(200, {
+                'id': f'cmpl-mock-{self.mock.stats["requests"]}',
+                'object': 'text_completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': i, 'text': reply, 'finish_reason': 'stop'}
+                            for i, reply in enumerate(replies)],
+                'usage': usage,
+            })
+
+
+def make_server(mock: MockLLM, host: str = '127.0.0.1', port: int = 8000) -> ThreadingHTTPServer:
+    handler = type('MockHandler', (Handler,), {'mock': mock})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock OpenAI-compatible server for load tests')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--policy', choices=['rules', 'walkthrough'], default='rules',
+                        help='Where commands come from')
+    parser.add_argument('--walkthrough', default='win_zork.txt',
+                        help='Command file for the walkthrough policy')
+    parser.add_argument('--latency', default='fixed:0.2',
+                        help='Response latency in seconds: fixed:S, uniform:LOW:HIGH, '
+                             'normal:MEAN:STDEV or lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with a 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='Fraction of requests answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=0.05,
+                        help='Seconds a 429 tells the client to wait')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for latencies and faults')
+    args = parser.parse_args()
+
+    try:
+        mock = MockLLM(args.policy, args.walkthrough, args.latency, args.error_rate,
+                       args.rate_limit, args.retry_after, args.seed)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    server = make_server(mock, args.host, args.port)
+    print(f"🤖 Mock LLM server on http://{args.host}:{server.server_port}/v1 "
+          f"({args.policy} policy, latency {args.latency})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {json.dumps(mock.stats)}")
+
+
+if __name__ == '__main__':
+    main()
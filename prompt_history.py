@@ -0,0 +1,168 @@
+"""Prefix-stable conversation history for the Zork LLM agent"""
+
+from typing import List, Dict, Optional
+
+from prompt_templates import HISTORY_SUMMARY_TEMPLATE
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+class PromptHistory:
+    """
+    Conversation history laid out so the prompt prefix rarely changes
+
+    Every prompt is the system prompt, then a summary of older turns, then
+    the recent turns verbatim. New turns are only ever appended. When the
+    recent turns go over `max_tokens`, the oldest of them are folded into
+    the summary in one go, leaving `keep_fraction` of the budget. The prefix
+    only changes at those compactions, so between them the server's prefix
+    cache covers everything but the newest turn.
+    """
+
+    def __init__(self, system_prompt: str, max_tokens: int = 2000,
+                 summary_tokens: int = 400, keep_fraction: float = 0.5):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.keep_fraction = keep_fraction
+        self.reset()
+
+    def reset(self):
+        """Forget all turns and statistics"""
+        self.turns: List[Dict] = []
+        self.recent_tokens = 0
+        self.summary_lines: List[str] = []
+        self.system_message = {"role": "system", "content": self.system_prompt}
+        self.compactions = 0
+        self.last_request: List[Dict] = []
+        self.requests = 0
+        self.estimated_tokens = 0
+        self.reused_tokens = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def add_user(self, content: str, game_output: str = ""):
+        """Append a user turn; game_output is what the summary line is made from"""
+        if self.turns and self.turns[-1]['assistant'] is None:
+            # The last request got no reply; replace it so roles keep alternating
+            self.recent_tokens -= self.turns.pop()['tokens']
+        turn = {
+            'user': {"role": "user", "content": content},
+            'assistant': None,
+            'game_output': game_output,
+            'tokens': estimate_tokens(content)
+        }
+        self.turns.append(turn)
+        self.recent_tokens += turn['tokens']
+        if self.recent_tokens > self.max_tokens:
+            self._compact()
+
+    def add_assistant(self, command: str):
+        """Record the reply to the latest user turn"""
+        turn = self.turns[-1]
+        turn['assistant'] = {"role": "assistant", "content": command}
+        tokens = estimate_tokens(command)
+        turn['tokens'] += tokens
+        self.recent_tokens += tokens
+
+    def replace_assistant(self, command: str):
+        """Change the reply to the latest user turn, e.g. to the command actually sent"""
+        turn = self.turns[-1]
+        if turn['assistant']:
+            tokens = estimate_tokens(turn['assistant']['content'])
+            turn['tokens'] -= tokens
+            self.recent_tokens -= tokens
+        turn['assistant'] = None
+        self.add_assistant(command)
+    
+    def messages(self) -> List[Dict]:
+        """The full message list for the next request"""
+        messages = [self.system_message]
+        for turn in self.turns:
+            messages.append(turn['user'])
+            if turn['assistant']:
+                messages.append(turn['assistant'])
+        return messages
+
+    def recent_messages(self) -> List[Dict]:
+        """The turns kept verbatim, without the system prompt and summary"""
+        return self.messages()[1:]
+
+    def _compact(self):
+        """Fold the oldest turns into the summary until the budget is met"""
+        target = self.max_tokens * self.keep_fraction
+        while len(self.turns) > 1 and self.recent_tokens > target:
+            turn = self.turns.pop(0)
+            self.recent_tokens -= turn['tokens']
+            self.summary_lines.append(self._summarize(turn))
+
+        while (len(self.summary_lines) > 1
+               and estimate_tokens("\n".join(self.summary_lines)) > self.summary_tokens):
+            self.summary_lines.pop(0)
+
+        self.system_message = {
+            "role": "system",
+            "content": self.system_prompt + "\n\n" + HISTORY_SUMMARY_TEMPLATE.format(
+                summary="\n".join(self.summary_lines))
+        }
+        self.compactions += 1
+
+    @staticmethod
+    def _summarize(turn: Dict) -> str:
+        """One line for a turn: the command and the first line of the reply"""
+        command = turn['assistant']['content'] if turn['assistant'] else '?'
+        reply = next((line.strip() for line in turn['game_output'].splitlines()
+                      if line.strip() and line.strip() != '>'), '')
+        if len(reply) > 80:
+            reply = reply[:77] + '...'
+        return f"> {command}: {reply}"
+
+    def record_request(self, messages: List[Dict]):
+        """Count how much of this request repeats the start of the previous one"""
+        total = 0
+        reused = 0
+        matching = True
+        for i, message in enumerate(messages):
+            tokens = estimate_tokens(message['content'])
+            total += tokens
+            if matching and i < len(self.last_request) and self.last_request[i] == message:
+                reused += tokens
+            else:
+                matching = False
+        self.last_request = list(messages)
+        self.requests += 1
+        self.estimated_tokens += total
+        self.reused_tokens += reused
+
+    def record_usage(self, usage):
+        """Add the server's prompt and cached-token counts, when it reports them"""
+        if not usage:
+            return
+        self.prompt_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+        details = getattr(usage, 'prompt_tokens_details', None)
+        if details:
+            self.cached_tokens += getattr(details, 'cached_tokens', 0) or 0
+
+    @property
+    def prefix_hit_rate(self) -> float:
+        """Share of prompt tokens that repeat the previous request's prefix"""
+        return self.reused_tokens / self.estimated_tokens if self.estimated_tokens else 0.0
+
+    @property
+    def server_hit_rate(self) -> Optional[float]:
+        """Share of prompt tokens the server served from cache, if it says"""
+        if not self.cached_tokens or not self.prompt_tokens:
+            return None
+        return self.cached_tokens / self.prompt_tokens
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'compactions': self.compactions,
+            'prefix_hit_rate': self.prefix_hit_rate,
+            'server_cached_tokens': self.cached_tokens,
+            'server_hit_rate': self.server_hit_rate
+        }
@@ -10,6 +10,7 @@ GAME RULES:
 - Interaction commands: take [item], drop [item], open [item], close [item], read [item], examine [item], inventory/i, look/l
 - Combat: attack [enemy] with [weapon] or kill [enemy] with [weapon]
 - Utility: save, restore, score, quit
+- Travel: "go to [room]" walks to a room you have already visited by the shortest route you have used (e.g., "go to living room")
 
 IMPORTANT INSTRUCTIONS:
 1. Output ONLY a single game command - no explanations, no thinking out loud
@@ -35,6 +36,20 @@ GAME_STATE_TEMPLATE = """=== CURRENT GAME STATE ===
 === YOUR NEXT COMMAND ===
 Respond with only the command:"""
 
+HISTORY_SUMMARY_TEMPLATE = """=== EARLIER IN THIS GAME ===
+Older commands and the first line of each response, oldest first:
+{summary}"""
+
+WORLD_STATE_TEMPLATE = """=== WHAT YOU KNOW SO FAR ===
+Location: {location}
+Score: {score}
+Inventory: {inventory}
+Rooms visited (most recent last) and exits found:
+{rooms}
+Items seen: {items}
+Obstacles:
+{obstacles}"""
+
 FEW_SHOT_EXAMPLES = """
 Example 1:
 Game: "West of House. You are standing in an open field west of a white house."
@@ -96,6 +96,18 @@ echo "📋 Step 10: Container will run this command:"
 echo "   $(docker inspect zork-llm-player:latest -f '{{.Config.Cmd}}')"
 echo ""
 
+# Step 11: Replay the walkthrough against the golden transcript
+echo "🧪 Step 11: Replaying walkthrough against golden transcript..."
+docker run --rm zork-llm-player:latest python3 auto_win_zork.py 2>&1 | sed 's/^/   /'
+REPLAY_EXIT_CODE=${PIPESTATUS[0]}
+if [ $REPLAY_EXIT_CODE -eq 0 ]; then
+    echo "✅ Walkthrough replay matches"
+else
+    echo "❌ Walkthrough replay differs from win_zork.golden.jsonl"
+    exit 1
+fi
+echo ""
+
 echo "╔══════════════════════════════════════════════════════════════════════╗"
 echo "║                         BUILD COMPLETE!                              ║"
 echo "╚══════════════════════════════════════════════════════════════════════╝"
@@ -0,0 +1,87 @@
+"""On-disk cache of LLM responses, keyed by everything that shapes them"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """
+    LRU cache of model replies stored in a SQLite file
+
+    The key is a hash of the full request: model, messages (system prompt
+    included) and sampling parameters. A repeated request is only
+    guaranteed the same reply at temperature 0, which is what the agent's
+    temperature_zero mode is for. One cache can be shared by every game of
+    a batch, across threads and runs.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses "
+                        "(key TEXT PRIMARY KEY, content TEXT, used INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        self.db.commit()
+        self.clock, self.count = self.db.execute(
+            "SELECT COALESCE(MAX(used), 0), COUNT(*) FROM responses").fetchone()
+
+    @staticmethod
+    def key(request: Dict) -> str:
+        """Hash of a chat.completions.create request"""
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def get(self, request: Dict) -> Optional[str]:
+        """The cached reply to request, or None"""
+        key = self.key(request)
+        with self.lock:
+            row = self.db.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.clock += 1
+            self.db.execute("UPDATE responses SET used = ? WHERE key = ?", (self.clock, key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, request: Dict, content: str):
+        """Store the reply to request, evicting the least recently used beyond max_entries"""
+        key = self.key(request)
+        with self.lock:
+            self.clock += 1
+            exists = self.db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                            (key, content, self.clock))
+            if not exists:
+                self.count += 1
+            if self.count > self.max_entries:
+                self.db.execute("DELETE FROM responses WHERE key IN "
+                                "(SELECT key FROM responses ORDER BY used LIMIT ?)",
+                                (self.count - self.max_entries,))
+                self.count = self.max_entries
+            self.db.commit()
+
+    def __contains__(self, request: Dict) -> bool:
+        """Whether request has a cached reply, without counting a hit or miss"""
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM responses WHERE key = ?",
+                                   (self.key(request),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,147 @@
+"""Map of the rooms visited and the exits discovered between them"""
+
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Movement commands and the direction each one names
+DIRECTIONS = {
+    'n': 'north', 's': 'south', 'e': 'east', 'w': 'west',
+    'ne': 'northeast', 'nw': 'northwest', 'se': 'southeast', 'sw': 'southwest',
+    'u': 'up', 'd': 'down',
+    'north': 'north', 'south': 'south', 'east': 'east', 'west': 'west',
+    'northeast': 'northeast', 'northwest': 'northwest',
+    'southeast': 'southeast', 'southwest': 'southwest',
+    'up': 'up', 'down': 'down', 'in': 'in', 'out': 'out',
+    'enter': 'in', 'exit': 'out', 'climb up': 'up', 'climb down': 'down',
+}
+
+SHORT_DIRECTIONS = {
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'northeast': 'ne', 'northwest': 'nw', 'southeast': 'se', 'southwest': 'sw',
+    'up': 'u', 'down': 'd', 'in': 'in', 'out': 'out',
+}
+
+OPPOSITES = {
+    'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east',
+    'northeast': 'southwest', 'southwest': 'northeast',
+    'northwest': 'southeast', 'southeast': 'northwest',
+    'up': 'down', 'down': 'up', 'in': 'out', 'out': 'in',
+}
+
+
+def direction_of(command: str) -> Optional[str]:
+    """The direction a movement command names, or None"""
+    command = command.strip().lower()
+    if command.startswith('go '):
+        command = command[3:].strip()
+    return DIRECTIONS.get(command)
+
+
+class RoomGraph:
+    """
+    Rooms and the exits between them, learned from moves as they happen
+
+    Each turn, update() takes the command and the location the parser found
+    in the reply. A movement command that lands in a different room records
+    an edge; one that leaves us where we were marks that direction blocked.
+    Every edge also suggests the way back (most Zork exits are two-way);
+    those guesses are only used when no route of known edges exists. Rooms
+    with the same name (Zork has several "Forest" and "Maze" rooms) are one
+    node. Either way a route can be wrong, so it is checked as it is walked.
+    A state read from the interpreter's memory (a 'status' entry) has the
+    room object too, which tells a failed move from one between two rooms
+    with the same name.
+    """
+
+    def __init__(self):
+        self.room: Optional[str] = None
+        self.room_object: Optional[int] = None
+        self.exits: Dict[str, Dict[str, str]] = {}    # room -> direction -> room
+        self.guesses: Dict[str, Dict[str, str]] = {}  # reverse edges not yet walked
+        self.blocked: Dict[str, set] = {}             # room -> directions that failed
+
+    def update(self, command: Optional[str], state: Dict):
+        """Record a turn from its command and ZorkGameParser.summarize_state output"""
+        previous = self.room
+        location = state.get('location')
+        status = state.get('status')
+        stayed = status is not None and status.room == self.room_object
+        self.room_object = status.room if status is not None else None
+        if 'pitch black' in state.get('output', ''):
+            # Can't see where we are; don't guess at exits from here
+            self.room = previous = None
+
+        if location:
+            self.room = location
+            self.exits.setdefault(location, {})
+            # Keep the most recently visited rooms last
+            self.exits[location] = self.exits.pop(location)
+
+        direction = direction_of(command or '')
+        if direction and previous:
+            if location and location != previous:
+                self.add_edge(previous, direction, location)
+            elif not location or stayed:
+                self.blocked.setdefault(previous, set()).add(direction)
+                self.guesses.get(previous, {}).pop(direction, None)
+
+    def add_edge(self, room: str, direction: str, destination: str):
+        self.exits.setdefault(room, {})[direction] = destination
+        self.exits.setdefault(destination, {})
+        self.blocked.get(room, set()).discard(direction)
+        self.guesses.get(room, {}).pop(direction, None)
+        back = OPPOSITES[direction]
+        if back not in self.exits[destination] and back not in self.blocked.get(destination, ()):
+            self.guesses.setdefault(destination, {})[back] = room
+
+    def find_room(self, name: str) -> Optional[str]:
+        """The known room best matching name: exact, then prefix, then substring"""
+        name = name.strip().lower()
+        if name.startswith('the '):
+            name = name[4:]
+        rooms = list(self.exits)
+        for matches in (lambda r: r.lower() in (name, 'the ' + name),
+                        lambda r: r.lower().startswith(name),
+                        lambda r: name in r.lower()):
+            found = [room for room in rooms if matches(room)]
+            if found:
+                return found[-1]
+        return None
+
+    def path(self, start: str, goal: str) -> Optional[List[Tuple[str, str]]]:
+        """Shortest route as [(direction, room reached), ...], or None
+
+        Walked edges are preferred; guessed reverse edges are only tried
+        when the walked ones don't connect the two rooms.
+        """
+        if start == goal:
+            return []
+        return self._search(start, goal, False) or self._search(start, goal, True)
+
+    def _search(self, start: str, goal: str, guess: bool) -> Optional[List[Tuple[str, str]]]:
+        came_from = {start: None}
+        queue = deque([start])
+        while queue:
+            room = queue.popleft()
+            exits = self.exits.get(room, {})
+            if guess:
+                exits = {**self.guesses.get(room, {}), **exits}
+            for direction, destination in exits.items():
+                if destination in came_from:
+                    continue
+                came_from[destination] = (room, direction)
+                if destination == goal:
+                    steps = []
+                    while came_from[destination]:
+                        room, direction = came_from[destination]
+                        steps.append((direction, destination))
+                        destination = room
+                    return steps[::-1]
+                queue.append(destination)
+        return None
+
+    def describe(self, room: str) -> str:
+        """Known exits of a room, e.g. "n->Kitchen, w blocked" """
+        known = [f"{SHORT_DIRECTIONS[d]}->{dest}" for d, dest in self.exits.get(room, {}).items()]
+        known += [f"{SHORT_DIRECTIONS[d]} blocked" for d in sorted(self.blocked.get(room, ()))]
+        return ', '.join(known) if known else 'no exits found yet'
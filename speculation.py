@@ -0,0 +1,69 @@
+"""Guesses at what the game will reply, for requesting the next command early"""
+
+from typing import Dict, Optional, Tuple
+
+from zork_cli import GameStatus
+
+# Replies that depend only on the words of the command, not on where it is typed
+VOCABULARY_ERRORS = ("i don't know the word", "i don't understand", "that sentence isn't one")
+
+
+class OutcomeMemo:
+    """
+    The last reply seen to each command in each room
+
+    Zork is mostly deterministic: walking back into a visited room, bumping
+    into the same wall or repeating an unknown word gets the same text as
+    before. predict() returns that text so the driver can ask the LLM for
+    the following command while the game is still running this one. With
+    the built-in interpreter it also predicts the GameStatus, applying the
+    change the command made last time. A guess is never trusted; the agent
+    only keeps the speculative reply when the real reply produces exactly
+    the same request.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self.outputs: Dict[Tuple[Optional[str], str], tuple] = {}
+
+    def record(self, room: Optional[str], command: str, output: str,
+               before: Optional[GameStatus] = None, after: Optional[GameStatus] = None):
+        """Remember output as the reply to command typed in room, and the status around it"""
+        command = command.strip().lower()
+        keys = []
+        if room:
+            keys.append((room, command))
+        if any(error in output.lower() for error in VOCABULARY_ERRORS):
+            keys.append((None, command))
+        for key in keys:
+            self.outputs.pop(key, None)
+            self.outputs[key] = (output, before, after)
+        while len(self.outputs) > self.max_entries:
+            del self.outputs[next(iter(self.outputs))]
+
+    def predict(self, room: Optional[str], command: str,
+                status: Optional[GameStatus] = None) -> Optional[Tuple[str, Optional[GameStatus]]]:
+        """
+        The reply command got last time in room (or anywhere, for vocabulary
+        errors), and the status it should leave, or None
+
+        Given the current status, the guess is only made from the same room
+        object holding the same inventory, and assumes the command changes
+        score and moves by as much as it did then.
+        """
+        command = command.strip().lower()
+        key = (room, command)
+        if not room or key not in self.outputs:
+            key = (None, command)
+        entry = self.outputs.get(key)
+        if entry is None:
+            return None
+        output, before, after = entry
+        if key[0] is None:
+            return output, status  # The game didn't understand; nothing changes
+        if status is None or before is None or after is None:
+            return output, None
+        if status.room != before.room or status.inventory != before.inventory:
+            return None
+        return output, after._replace(score=status.score + after.score - before.score,
+                                      moves=status.moves + after.moves - before.moves)
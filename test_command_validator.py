@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for the command validator against the zork1.z3 dictionary.
+"""
+
+import pytest
+
+from command_validator import CommandValidator
+
+
+@pytest.fixture(scope='module')
+def validator():
+    return CommandValidator.from_story('zork1.z3')
+
+
+def test_known_commands_pass(validator):
+    for command in ('open mailbox', 'north', 'take 5 coins', 'again'):
+        assert validator.check(command) == (command, None)
+
+
+def test_corrects_misspellings(validator):
+    assert validator.check('opne mailbx') == ('open mailbox', None)
+    assert validator.check('go nrth') == ('go north', None)
+    # Spelled out in full where an object name has the whole word
+    assert validator.check('take lantren') == ('take lantern', None)
+
+
+def test_substitutes_missing_verbs(validator):
+    assert validator.check('inspect leaflet') == ('examine leaflet', None)
+
+
+def test_rejects_with_the_game_reply(validator):
+    command, reply = validator.check('take qqqqqq')
+    assert reply == 'I don\'t know the word "qqqqqq".\n\n'
+
+
+def test_sends_answers_without_a_verb(validator):
+    """A bare noun may answer "What do you want to take?", so the game decides"""
+    for command in ('lamp', 'lantern', 'brass lantern'):
+        assert validator.check(command) == (command, None)
+    assert validator.check('lantren') == ('lantern', None)
+
+
+def test_counts():
+    validator = CommandValidator.from_story('zork1.z3')
+    validator.check('opne mailbox')
+    validator.check('take qqqqqq')
+    validator.check('mailbox')
+    validator.check('north')
+    assert (validator.corrections, validator.rejections) == (1, 1)
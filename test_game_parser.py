@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for death and victory detection in ZorkGameParser, on text the
+game actually prints.
+"""
+
+from auto_win_zork import load_golden
+from game_parser import ZorkGameParser
+
+DEATH_OUTPUT = """Oh, no! You have walked into the slavering fangs of a lurking grue!
+
+   ****  You have died  ****
+
+Now, let's take a look here...
+"""
+SCORE_OUTPUT = """Your score is 25 (total of 350 points), in 14 moves.
+This gives you the rank of Beginner.
+"""
+VICTORY_OUTPUT = """Inside the Barrow
+As you enter the barrow, the door closes inexorably behind you. Around you it is dark, but ahead is an enormous cavern, brightly lit. Through its center runs a wide stream. Spanning the stream is a small wooden footbridge, and beyond a path leads into a dark tunnel. Above the bridge, floating in the air, is a large sign. It reads:  All ye who stand before this bridge have completed a great and perilous adventure which has tested your wit and courage. You have mastered the first part of the ZORK trilogy.
+"""
+
+
+def test_death_banner():
+    parser = ZorkGameParser()
+    assert parser.summarize_state(DEATH_OUTPUT)['is_death']
+    assert parser.is_death(DEATH_OUTPUT)
+    # Darkness is only a warning
+    dark = "It is pitch black. You are likely to be eaten by a grue."
+    assert not parser.summarize_state(dark)['is_death']
+    assert not parser.is_death(dark)
+
+
+def test_death_in_walkthrough():
+    """The walkthrough's grue death is the only turn flagged"""
+    parser = ZorkGameParser()
+    deaths = [number for number, turn in enumerate(load_golden('win_zork.golden.jsonl'))
+              if parser.summarize_state(turn.output)['is_death']]
+    assert len(deaths) == 1
+
+
+def test_score_is_not_victory():
+    parser = ZorkGameParser()
+    state = parser.summarize_state(SCORE_OUTPUT)
+    assert state['score'] == (25, 350)
+    assert not state['is_victory']
+    assert not parser.is_victory(SCORE_OUTPUT)
+    assert not parser.summarize_state("Congratulations! Unlike the other vandals...")['is_victory']
+
+
+def test_victory():
+    parser = ZorkGameParser()
+    assert parser.summarize_state(VICTORY_OUTPUT)['is_victory']
+    assert parser.is_victory(VICTORY_OUTPUT)
+
+
+def test_location_skips_lines_of_hyphens():
+    parser = ZorkGameParser()
+    assert parser.summarize_state('-')['location'] is None
+    assert parser.summarize_state('--\nKitchen')['location'] == 'Kitchen'
+    assert parser.extract_location('- - -\nWest of House') == 'West of House'
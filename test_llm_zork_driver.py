@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+End-to-end checks of the driver against mock_llm_server.py, replaying the
+walkthrough in win_zork.txt (which dies to a grue on its 13th command).
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('openai')
+
+from llm_zork_driver import LLMZorkDriver, run_batch  # noqa: E402
+from mock_llm_server import MockLLM, make_server  # noqa: E402
+from room_graph import RoomGraph  # noqa: E402
+
+
+@pytest.fixture
+def mock_url():
+    server = make_server(MockLLM(policy='walkthrough', latency='fixed:0'), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_batch_counts_deaths(mock_url, tmp_path):
+    _, summaries, totals = run_batch(1, 1, 0, str(tmp_path), vllm_url=mock_url,
+                                     model_name='mock', api_key='walkthrough',
+                                     story_file='zork1.z3', max_turns=30, turn_delay=0)
+    assert summaries[0]['error'] is None
+    assert summaries[0]['deaths'] >= 1
+    assert totals['deaths'] >= 1
+    # The driver stops at the death instead of playing on to max_turns
+    assert summaries[0]['total_turns'] < 30
+
+
+def test_stats_agree_with_driver(mock_url, tmp_path):
+    """zork_stats counts the same deaths as the driver's own summary"""
+    from zork_stats import collect
+
+    for log_format in ('jsonl', 'records'):
+        log_dir = tmp_path / log_format
+        _, summaries, totals = run_batch(1, 1, 0, str(log_dir), vllm_url=mock_url,
+                                         model_name='mock', api_key=log_format,
+                                         story_file='zork1.z3', max_turns=30, turn_delay=0,
+                                         log_format=log_format)
+        report = collect([str(log_dir)])['mock'].report()
+        assert report['deaths'] == totals['deaths'] >= 1
+
+
+def test_plan_route():
+    rooms = RoomGraph()
+    for command, location in [(None, 'West of House'), ('north', 'North of House'),
+                              ('east', 'Behind House'), ('west', 'Kitchen')]:
+        rooms.update(command, {'location': location, 'output': location})
+    rooms.exits.setdefault('Living Room', {})
+    driver = SimpleNamespace(agent=SimpleNamespace(rooms=rooms))
+
+    def plan(command):
+        return LLMZorkDriver._plan_route(driver, command)
+
+    assert plan('open window') is None
+    assert plan('go to behind house') == ('Behind House', [('east', 'Behind House')], None)
+    target, steps, message = plan('go to kitchen')
+    assert steps is None and 'already in Kitchen' in message
+    target, steps, message = plan('go to living room')
+    assert steps is None and 'no known route' in message
+    target, steps, message = plan('go to the troll room')
+    assert steps is None and "haven't visited" in message
+
+
+def test_agent_close_stops_request_thread(mock_url):
+    from zork_llm_agent import ZorkLLMAgent
+
+    agent = ZorkLLMAgent(mock_url, 'mock', api_key='close')
+    request = agent._request_args([{'role': 'user', 'content': 'West of House'}])
+    assert agent._start(request).result().choices
+    executor = agent.executor
+    agent.close()
+    assert agent.executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
+    agent.close()  # Closing twice is harmless
+
+
+def test_batcher_modes_keep_separate_cache_entries(mock_url, tmp_path):
+    import asyncio
+
+    from openai import AsyncOpenAI
+    from response_cache import ResponseCache
+    from zork_llm_agent import AsyncZorkLLMAgent, RequestBatcher
+
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+
+    async def play(mode):
+        client = AsyncOpenAI(base_url=mock_url, api_key=mode)
+        batcher = RequestBatcher(client, window=0.001, mode=mode)
+        agent = AsyncZorkLLMAgent(mock_url, 'mock', api_key=mode, cache=cache,
+                                  temperature_zero=True, batcher=batcher)
+        agent.client = client
+        await agent.get_next_command('West of House\nYou are standing in an open field.')
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert not batcher.tasks  # Finished batches are let go
+        return agent.cache_hits
+
+    assert asyncio.run(play('chat')) == 0
+    # The same conversation sent as a completions prompt is not a chat hit
+    assert asyncio.run(play('completions')) == 0
+    assert asyncio.run(play('completions')) == 1
+    assert len(cache) == 2
+    cache.close()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests that PromptHistory keeps the prompt prefix byte-identical between
+compactions and holds the recent turns and summary to their token budgets,
+playing the walkthrough in win_zork.golden.jsonl.
+"""
+
+import json
+
+import pytest
+
+from auto_win_zork import load_golden
+from prompt_history import PromptHistory, estimate_tokens
+from prompt_templates import GAME_STATE_TEMPLATE
+
+GOLDEN = load_golden('win_zork.golden.jsonl')
+
+
+def encode(messages):
+    return json.dumps(messages, sort_keys=True).encode('utf-8')
+
+
+def play(history):
+    """Yield (messages, compacted) for each turn, as the agent asks for them"""
+    for turn, reply in zip(GOLDEN, GOLDEN[1:]):
+        compactions = history.compactions
+        history.add_user(GAME_STATE_TEMPLATE.format(game_output=turn.output), turn.output)
+        messages = history.messages()
+        history.record_request(messages)
+        yield messages, history.compactions != compactions
+        history.add_assistant(reply.command)
+
+
+def test_prefix_is_byte_identical_between_compactions():
+    history = PromptHistory("You are playing Zork.", max_tokens=800, summary_tokens=100)
+    previous = None
+    steady = 0
+    for messages, compacted in play(history):
+        if previous is not None and not compacted:
+            # Everything sent last time is sent again unchanged, reply appended
+            assert encode(messages[:len(previous)]) == encode(previous)
+            assert [m['role'] for m in messages[len(previous):]] == ['assistant', 'user']
+            steady += 1
+        previous = messages
+    assert history.compactions >= 3
+    assert steady > 3 * history.compactions
+    assert history.stats()['prefix_hit_rate'] > 0.5
+
+
+def test_compaction_respects_budget():
+    max_tokens, summary_tokens, keep_fraction = 600, 80, 0.5
+    history = PromptHistory("You are playing Zork.", max_tokens=max_tokens,
+                            summary_tokens=summary_tokens, keep_fraction=keep_fraction)
+    for messages, compacted in play(history):
+        # The running count is the real size of the turns kept verbatim
+        recent = history.recent_messages()
+        assert history.recent_tokens == sum(estimate_tokens(m['content']) for m in recent)
+        assert history.recent_tokens <= max_tokens or len(history.turns) == 1
+        if compacted:
+            assert history.recent_tokens <= max_tokens * keep_fraction or len(history.turns) == 1
+            summary = "\n".join(history.summary_lines)
+            assert estimate_tokens(summary) <= summary_tokens or len(history.summary_lines) == 1
+            assert history.summary_lines[-1] in messages[0]['content']
+        # Roles still alternate after the system prompt
+        assert [m['role'] for m in messages[1:]] == ['user', 'assistant'] * (len(messages) // 2 - 1) + ['user']
+    assert history.compactions >= 3
+
+
+def test_unanswered_turn_is_replaced():
+    history = PromptHistory("sys", max_tokens=10000)
+    history.add_user("first", "West of House")
+    history.add_user("second", "North of House")
+    assert [m['content'] for m in history.messages()] == ["sys", "second"]
+    assert history.recent_tokens == estimate_tokens("second")
+
+
+def test_agent_world_state_keeps_prefix():
+    """The world state rides on the newest message only, so it never breaks the prefix"""
+    pytest.importorskip('openai')
+    from game_parser import ZorkGameParser
+    from zork_llm_agent import ZorkLLMAgent
+
+    agent = ZorkLLMAgent('http://127.0.0.1:9/v1', 'mock', history_tokens=800)
+    parser = ZorkGameParser()
+    previous = None
+    for turn, reply in zip(GOLDEN[:40], GOLDEN[1:]):
+        agent.observe(turn.command, parser.summarize_state(turn.output))
+        compactions = agent.history.compactions
+        messages = agent._build_messages(turn.output, False, turn.command)
+        if previous is not None and agent.history.compactions == compactions:
+            assert encode(messages[:len(previous) - 1]) == encode(previous[:-1])
+        previous = messages
+        agent.history.add_assistant(reply.command)
+    assert agent.history.compactions >= 1
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk LLM response cache: hits, misses and LRU eviction.
+"""
+
+from response_cache import ResponseCache
+
+
+def request(text, temperature=0.0):
+    return {'model': 'test', 'temperature': temperature,
+            'messages': [{'role': 'user', 'content': text}]}
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    assert cache.get(request('west of house')) is None
+    cache.put(request('west of house'), 'open mailbox')
+    assert cache.get(request('west of house')) == 'open mailbox'
+    # Any difference in the request is a different key
+    assert cache.get(request('west of house', temperature=0.7)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert request('west of house') in cache
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_entries=2)
+    cache.put(request('a'), 'north')
+    cache.put(request('b'), 'south')
+    cache.get(request('a'))  # Now b is the least recently used
+    cache.put(request('c'), 'east')
+    assert len(cache) == 2
+    assert request('a') in cache
+    assert request('b') not in cache
+    assert request('c') in cache
+    # Replacing a reply doesn't add an entry
+    cache.put(request('c'), 'west')
+    assert len(cache) == 2
+    assert cache.get(request('c')) == 'west'
+    cache.close()
+
+
+def test_persists_between_runs(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(path)
+    cache.put(request('kitchen'), 'take sack')
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert len(cache) == 1
+    assert cache.get(request('kitchen')) == 'take sack'
+    cache.close()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the room graph behind the "go to <room>" travel macro.
+"""
+
+from room_graph import RoomGraph
+
+
+def walk(graph, moves):
+    """Feed (command, location) turns to the graph as the parser would report them"""
+    for command, location in moves:
+        graph.update(command, {'location': location, 'output': location or ''})
+
+
+def make_graph():
+    graph = RoomGraph()
+    walk(graph, [(None, 'West of House'), ('north', 'North of House'),
+                 ('east', 'Behind House'), ('west', 'Kitchen'), ('up', 'Attic')])
+    return graph
+
+
+def test_path_to_reachable_room():
+    graph = make_graph()
+    assert graph.path('West of House', 'Kitchen') == [
+        ('north', 'North of House'), ('east', 'Behind House'), ('west', 'Kitchen')]
+    assert graph.path('Kitchen', 'Kitchen') == []
+
+
+def test_path_back_uses_guessed_reverse_edges():
+    graph = make_graph()
+    assert graph.path('Attic', 'Behind House') == [('down', 'Kitchen'), ('east', 'Behind House')]
+    # Behind House's west exit was walked to the Kitchen, so there's no guess back north
+    assert graph.path('Attic', 'West of House') is None
+
+
+def test_blocked_direction_is_not_guessed():
+    graph = make_graph()
+    walk(graph, [('down', 'Kitchen')])
+    graph.update('east', {'location': None, 'output': 'The window is closed.'})
+    assert graph.path('Kitchen', 'Behind House') is None
+    assert 'e blocked' in graph.describe('Kitchen')
+
+
+def test_unreachable_and_unknown_rooms():
+    graph = make_graph()
+    walk(graph, [('down', 'Kitchen')])
+    graph.exits.setdefault('Living Room', {})  # Seen, but no known way in
+    assert graph.path('Kitchen', 'Living Room') is None
+    assert graph.path('Kitchen', 'Troll Room') is None
+    assert graph.find_room('troll room') is None
+    assert graph.find_room('the kitchen') == 'Kitchen'
+    assert graph.find_room('behind') == 'Behind House'
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Round trip of the compact .zturns turn record format through LogWriter
+and TurnLogger, and reading back a file whose last record was cut short.
+"""
+
+import pytest
+
+from turn_logger import MAGIC, LogWriter, TurnLogger, pack_record, read_records
+
+TURNS = [
+    (1, 'open mailbox', 'Opening the small mailbox reveals a leaflet.',
+     {'location': 'West of House', 'score': (0, 350), 'moves': 1}),
+    (2, 'take lamp', 'Taken.\n\nYour lamp is now on. Ünïcode ✓',
+     {'location': None, 'score': None, 'moves': None, 'is_error': True}),
+    (3, 'north', 'Oh, no! You have walked into the slavering fangs of a lurking grue!\n\n'
+     '   ****  You have died  ****\n',
+     {'location': 'Forest', 'score': (10, 350), 'moves': 12, 'is_death': True}),
+    (4, '', 'x' * 70000,
+     {'location': 'Inside the Barrow', 'score': (350, 350), 'moves': 300, 'is_victory': True}),
+]
+
+
+def expected(turn, command, output, state):
+    return {
+        'turn': turn,
+        'command': command,
+        'location': state.get('location'),
+        'game_output': output,
+        'score': state.get('score'),
+        'moves': state.get('moves'),
+        'is_death': state.get('is_death', False),
+        'is_victory': state.get('is_victory', False),
+        'is_error': state.get('is_error', False),
+    }
+
+
+def write_game(tmp_path):
+    path = tmp_path / 'turns.zturns'
+    writer = LogWriter()
+    logger = TurnLogger(writer, tmp_path / 'transcript.txt', records_file=path)
+    for turn, command, output, state in TURNS:
+        logger.log(turn, command, output, state)
+    logger.close()
+    writer.close()
+    assert writer.error is None
+    return path
+
+
+def test_round_trip(tmp_path):
+    records = list(read_records(write_game(tmp_path)))
+    assert len(records) == len(TURNS)
+    for record, turn in zip(records, TURNS):
+        assert record.pop('timestamp') > 0
+        assert record == expected(*turn)
+
+
+def test_truncated_final_record(tmp_path):
+    data = write_game(tmp_path).read_bytes()
+    last = pack_record(4, 0.0, *TURNS[3][1:])
+    # Cut inside the last record's body, and inside its length prefix
+    for cut in (len(last) // 2, 2):
+        path = tmp_path / f'cut_{cut}.zturns'
+        path.write_bytes(data[:len(data) - len(last) + cut])
+        records = list(read_records(path))
+        assert [r['turn'] for r in records] == [1, 2, 3]
+        assert records[-1]['game_output'] == TURNS[2][2]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'turns.jsonl'
+    path.write_bytes(b'{"turn": 1}\n')
+    with pytest.raises(ValueError):
+        list(read_records(path))
+    (tmp_path / 'empty.zturns').write_bytes(MAGIC)
+    assert list(read_records(tmp_path / 'empty.zturns')) == []
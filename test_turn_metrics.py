@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-turn histograms: bucketing, quantile estimates, merging
+and the OpenMetrics text they are exported in.
+"""
+
+import re
+import urllib.request
+
+import pytest
+
+from turn_metrics import SECONDS_BUCKETS, Histogram, TurnMetrics, serve
+
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{(.*)\})? (\S+)$')
+
+
+def parse_openmetrics(text):
+    """{(name, labels): value} for every sample line, checking the framing on the way"""
+    lines = text.split('\n')
+    assert lines[-2:] == ['# EOF', '']
+    samples = {}
+    for line in lines[:-2]:
+        if line.startswith('#'):
+            assert re.match(r'# (TYPE|UNIT|HELP) [a-z_]+ ', line), line
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        key = (name, tuple(sorted(re.findall(r'(\w+)="([^"]*)"', labels or ''))))
+        assert key not in samples, line
+        samples[key] = float(value)
+    return samples
+
+
+def test_buckets_are_cumulative():
+    histogram = Histogram((1, 5, 10))
+    for value in (0.5, 1, 3, 7, 10, 50):
+        histogram.observe(value)
+    # A value on a bound falls in that bucket (le is "less than or equal")
+    assert histogram.counts == [2, 1, 2, 1]
+    assert histogram.samples('x') == [
+        'x_bucket{le="1.0"} 2',
+        'x_bucket{le="5.0"} 3',
+        'x_bucket{le="10.0"} 5',
+        'x_bucket{le="+Inf"} 6',
+        'x_count 6',
+        'x_sum 71.5',
+    ]
+
+
+def test_quantiles_interpolate_inside_buckets():
+    histogram = Histogram((10, 20, 40))
+    assert histogram.quantile(0.5) == 0.0
+    for value in (5, 15, 15, 30):
+        histogram.observe(value)
+    assert histogram.quantile(0.25) == pytest.approx(10.0)
+    assert histogram.quantile(0.5) == pytest.approx(15.0)
+    assert histogram.quantile(0.75) == pytest.approx(20.0)
+    assert histogram.quantile(1.0) == pytest.approx(40.0)
+    # Values past the last bound can only be placed at it
+    histogram.observe(1000)
+    assert histogram.quantile(0.99) == 40
+    summary = histogram.summary()
+    assert (summary['count'], summary['sum'], summary['mean']) == (5, 1065, 213)
+
+
+def test_combine_adds_games_together():
+    games = [TurnMetrics() for _ in range(3)]
+    for i, metrics in enumerate(games):
+        metrics.observe_turn(0.1 * (i + 1), {'game': 0.01, 'llm_request': 0.05})
+        metrics.observe_tokens(100, 5, 64)
+    games[0].observe_turn(0.2, {'replay': 0.001})
+    total = TurnMetrics.combine(games)
+    assert total.turns.count == 4
+    assert total.turns.sum == pytest.approx(0.8)
+    assert total.phases['game'].count == 3
+    assert total.phases['replay'].count == 1
+    assert total.tokens['cached'].sum == 192
+    # The games' own histograms are untouched
+    assert games[1].turns.count == 1
+
+
+def test_openmetrics_output():
+    metrics = TurnMetrics()
+    for seconds in (0.0004, 0.003, 0.003, 0.7, 45.0):
+        metrics.observe_turn(seconds, {'game': seconds / 2})
+    metrics.observe_tokens(1200, 4, 1024)
+    metrics.observe_tokens(1300, 6, 1024)
+    samples = parse_openmetrics(metrics.openmetrics())
+
+    def buckets(name, **labels):
+        found = {}
+        for (sample, sample_labels), value in samples.items():
+            sample_labels = dict(sample_labels)
+            le = sample_labels.pop('le', None)
+            if sample == name + '_bucket' and sample_labels == labels:
+                found[le] = value
+        return found
+
+    turn = buckets('zork_turn_seconds')
+    assert len(turn) == len(SECONDS_BUCKETS) + 1
+    assert turn['0.00025'] == 0
+    assert turn['0.0005'] == 1
+    assert turn['0.0025'] == 1
+    assert turn['0.005'] == 3
+    assert turn['1.0'] == 4
+    assert turn['30.0'] == 4
+    assert turn['+Inf'] == 5
+    assert list(turn.values()) == sorted(turn.values())
+    assert samples[('zork_turn_seconds_count', ())] == 5
+    assert samples[('zork_turn_seconds_sum', ())] == pytest.approx(45.7064)
+
+    game = buckets('zork_turn_phase_seconds', phase='game')
+    assert game['+Inf'] == 5
+    assert game['0.0025'] == 3
+    # Phases that never ran are still exported, empty
+    assert buckets('zork_turn_phase_seconds', phase='llm_first_token')['+Inf'] == 0
+
+    prompt = buckets('zork_llm_call_tokens', kind='prompt')
+    assert (prompt['1000.0'], prompt['2500.0']) == (0, 2)
+    assert samples[('zork_llm_tokens_total', (('kind', 'cached'),))] == 2048
+    assert samples[('zork_llm_tokens_total', (('kind', 'completion'),))] == 10
+
+
+def test_serve_defaults_to_loopback():
+    metrics = TurnMetrics()
+    metrics.observe_turn(0.5, {})
+    server = serve(metrics.openmetrics, 0)
+    try:
+        host, port = server.server_address
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            assert response.headers['Content-Type'].startswith('application/openmetrics-text')
+            samples = parse_openmetrics(response.read().decode())
+        assert samples[('zork_turn_seconds_count', ())] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
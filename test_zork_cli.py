@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the built-in Z-machine interpreter's stateful
+operations, run against the bundled zork1.z3.
+"""
+
+from zork_cli import ZMachine
+
+STORY_FILE = 'zork1.z3'
+
+
+def frame_state(zm):
+    return [(frame.return_pc, list(frame.locals), list(frame.stack)) for frame in zm.frames]
+
+
+def new_game(seed=0):
+    zm = ZMachine(STORY_FILE, seed=seed)
+    zm.start()
+    return zm
+
+
+def restart(zm):
+    """Play the game's RESTART verb through its confirmation; returns the new opening text"""
+    zm.step('restart')
+    return zm.step('y')
+
+
+def test_restart_keeps_flags2():
+    """RESTART keeps the transcript and fixed-pitch bits of Flags 2 and leaves Flags 1 alone"""
+    zm = new_game()
+    zm.memory[0x11] |= 0x03
+    flags1 = zm.memory[0x10]
+    assert 'West of House' in restart(zm)
+    assert zm.memory[0x11] & 0x03 == 0x03
+    assert zm.memory[0x10] == flags1
+
+
+def test_snapshot_restore_is_exact():
+    """Restoring a snapshot brings back the same memory, stack and future"""
+    zm = new_game()
+    zm.step('open mailbox')
+    snap = zm.snapshot()
+    memory, frames = bytes(zm.memory), frame_state(zm)
+    later = [zm.step(command) for command in ('take leaflet', 'north', 'east')]
+
+    zm.restore(snap)
+    assert bytes(zm.memory) == memory
+    assert frame_state(zm) == frames
+    assert zm.status().inventory == ()
+    assert [zm.step(command) for command in ('take leaflet', 'north', 'east')] == later
+
+
+def test_fork_is_independent():
+    """A fork plays on exactly like its parent without changing it"""
+    zm = new_game()
+    zm.step('open mailbox')
+    memory = bytes(zm.memory)
+    child = zm.fork()
+    assert bytes(child.memory) == memory
+
+    output = child.step('take leaflet')
+    assert 'leaflet' in child.status().inventory
+    assert bytes(zm.memory) == memory
+    assert zm.status().inventory == ()
+    assert zm.step('take leaflet') == output
+    assert bytes(zm.memory) == bytes(child.memory)
+
+
+def test_quetzal_save_restore_round_trip(tmp_path):
+    """The game's SAVE and RESTORE verbs give back identical memory and stack"""
+    save_file = tmp_path / 'game.qzl'
+    zm = ZMachine(STORY_FILE, seed=0, save_file=str(save_file))
+    zm.start()
+    zm.step('open mailbox')
+    zm.step('take leaflet')
+    assert zm.step('save').strip().startswith('Ok.')
+    memory, frames = bytes(zm.memory), frame_state(zm)
+    later = zm.step('north')
+
+    zm.step('drop leaflet')
+    assert zm.step('restore').strip().startswith('Ok.')
+    assert bytes(zm.memory) == memory
+    assert frame_state(zm) == frames
+    assert zm.step('north') == later
+
+    # A fresh machine restores the same file to the same state
+    other = ZMachine(STORY_FILE, seed=0, save_file=str(save_file))
+    other.start()
+    assert other.step('restore').strip().startswith('Ok.')
+    assert bytes(other.memory) == memory
+
+
+def test_checkpoint_round_trip():
+    """checkpoint_bytes() runs no command and resumes at the same prompt"""
+    zm = new_game()
+    zm.step('open mailbox')
+    memory, frames = bytes(zm.memory), frame_state(zm)
+    data = zm.checkpoint_bytes()
+    assert bytes(zm.memory) == memory
+
+    # AGAIN still repeats the player's command, not a save
+    assert 'already open' in zm.step('again')
+
+    other = new_game()
+    other.step('north')
+    assert other.resume_checkpoint(data) == ''
+    assert bytes(other.memory) == memory
+    assert frame_state(other) == frames
+    assert other.status().room_name == 'West of House'
+    assert 'already open' in other.step('again')
+
+
+def test_inventory_after_restart():
+    """status() still finds the player's inventory after the game restarts"""
+    zm = new_game()
+    zm.step('open mailbox')
+    zm.step('take leaflet')
+    assert zm.status().inventory == ('leaflet',)
+    restart(zm)
+    assert zm.status().inventory == ()
+    zm.step('open mailbox')
+    zm.step('take leaflet')
+    assert zm.status().inventory == ('leaflet',)
+
+
+def test_inventory_after_resume():
+    """A machine that resumes a checkpoint before starting still finds the player"""
+    zm = new_game()
+    zm.step('open mailbox')
+    zm.step('take leaflet')
+    data = zm.checkpoint_bytes()
+    other = ZMachine(STORY_FILE, seed=0)
+    other.resume_checkpoint(data)
+    assert other.status().inventory == ('leaflet',)
@@ -0,0 +1,190 @@
+"""Buffered turn logs, written on a background thread"""
+
+import json
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+# Turn record file: MAGIC, then one record per turn. A record is its length
+# (uint32) followed by the fixed fields and three length-prefixed UTF-8
+# strings: command, location and the full game output.
+MAGIC = b'ZTURNS1\n'
+RECORD_FIELDS = struct.Struct('<IdiiiB')  # turn, timestamp, score, max score, moves, flags
+LENGTH = struct.Struct('<I')
+DEATH, VICTORY, ERROR = 1, 2, 4
+
+
+def pack_record(turn: int, timestamp: float, command: str, game_output: str, state: Dict) -> bytes:
+    """One turn as a length-prefixed record; unknown numbers are stored as -1"""
+    score = state.get('score') or (-1, -1)
+    moves = state.get('moves')
+    flags = ((DEATH if state.get('is_death') else 0) | (VICTORY if state.get('is_victory') else 0)
+             | (ERROR if state.get('is_error') else 0))
+    body = [RECORD_FIELDS.pack(turn, timestamp, score[0], score[1],
+                               -1 if moves is None else moves, flags)]
+    for text in (command, state.get('location') or '', game_output):
+        data = text.encode('utf-8')
+        body.append(LENGTH.pack(len(data)))
+        body.append(data)
+    body = b''.join(body)
+    return LENGTH.pack(len(body)) + body
+
+
+def read_records(path) -> Iterator[Dict]:
+    """
+    Yield the turns of a record file one at a time
+
+    A record cut short (a game that died mid-write) ends the file.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a turn record file")
+        while True:
+            header = f.read(LENGTH.size)
+            if len(header) < LENGTH.size:
+                return
+            length = LENGTH.unpack(header)[0]
+            body = f.read(length)
+            if len(body) < length:
+                return
+            turn, timestamp, score, max_score, moves, flags = RECORD_FIELDS.unpack_from(body)
+            offset = RECORD_FIELDS.size
+            texts = []
+            for _ in range(3):
+                length = LENGTH.unpack_from(body, offset)[0]
+                offset += LENGTH.size
+                texts.append(body[offset:offset + length].decode('utf-8'))
+                offset += length
+            yield {
+                'turn': turn,
+                'timestamp': timestamp,
+                'command': texts[0],
+                'location': texts[1] or None,
+                'game_output': texts[2],
+                'score': (score, max_score) if score >= 0 else None,
+                'moves': moves if moves >= 0 else None,
+                'is_death': bool(flags & DEATH),
+                'is_victory': bool(flags & VICTORY),
+                'is_error': bool(flags & ERROR),
+            }
+
+
+class LogWriter:
+    """
+    Appends to log files from one background thread
+
+    write() queues the data and returns at once. The queue is bounded, so
+    a slow disk slows the games down instead of filling memory. Files stay
+    open until close_file(), and whatever has been written is flushed every
+    `flush_interval` seconds. One writer can serve every game of a batch.
+    """
+
+    def __init__(self, max_queue: int = 10000, flush_interval: float = 1.0):
+        self.queue = queue.Queue(max_queue)
+        self.flush_interval = flush_interval
+        self.files = {}
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, path, data: bytes):
+        self.queue.put((str(path), data))
+
+    def close_file(self, path):
+        """Flush and close path once everything queued for it is written"""
+        self.queue.put((str(path), None))
+
+    def close(self):
+        """Write everything queued, close all files and stop the thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        dirty = set()
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                try:
+                    self._handle(*item, dirty)
+                except OSError as e:
+                    self.error = str(e)
+            if dirty and time.monotonic() - last_flush >= self.flush_interval:
+                for path in dirty:
+                    self.files[path].flush()
+                dirty.clear()
+                last_flush = time.monotonic()
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+    def _handle(self, path: str, data: Optional[bytes], dirty: set):
+        if data is None:
+            f = self.files.pop(path, None)
+            if f:
+                f.close()
+            dirty.discard(path)
+            return
+        f = self.files.get(path)
+        if f is None:
+            f = self.files[path] = open(path, 'ab')
+        f.write(data)
+        dirty.add(path)
+
+
+class TurnLogger:
+    """
+    A game's transcript plus its JSONL and/or turn record log, through a LogWriter
+
+    The JSONL log keeps its old format, output truncated to 500 characters,
+    plus the turn's phase timings when given.
+    The record file (see pack_record) keeps the full output and is the
+    cheaper of the two to write and to read back.
+    """
+
+    def __init__(self, writer: LogWriter, transcript_file, llm_log_file=None, records_file=None):
+        self.writer = writer
+        self.transcript_file = transcript_file
+        self.llm_log_file = llm_log_file
+        self.records_file = records_file
+        if records_file:
+            writer.write(records_file, MAGIC)
+
+    def log(self, turn_num: int, command: str, game_output: str, state_summary: dict,
+            llm_thinking: str = "", timings: Optional[Dict[str, float]] = None):
+        lines = [f"\n{'='*80}\n", f"TURN {turn_num}\n", f"{'='*80}\n",
+                 f"COMMAND: {command}\n", f"\nGAME OUTPUT:\n{game_output}\n"]
+        if state_summary.get('score'):
+            lines.append(f"\nSCORE: {state_summary['score'][0]}/{state_summary['score'][1]}\n")
+        self.writer.write(self.transcript_file, ''.join(lines).encode('utf-8'))
+
+        now = datetime.now()
+        if self.llm_log_file:
+            log_entry = {
+                'turn': turn_num,
+                'timestamp': now.isoformat(),
+                'command': command,
+                'game_output': game_output[:500],  # Truncate for storage
+                'state': state_summary,
+                'llm_thinking': llm_thinking
+            }
+            if timings:
+                log_entry['timings_ms'] = {phase: round(seconds * 1000, 3)
+                                           for phase, seconds in timings.items()}
+            self.writer.write(self.llm_log_file, (json.dumps(log_entry) + '\n').encode('utf-8'))
+        if self.records_file:
+            self.writer.write(self.records_file,
+                              pack_record(turn_num, now.timestamp(), command, game_output, state_summary))
+
+    def close(self):
+        for path in (self.transcript_file, self.llm_log_file, self.records_file):
+            if path:
+                self.writer.close_file(path)
@@ -0,0 +1,202 @@
+"""Per-turn latency and token histograms, exported in the OpenMetrics text format"""
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List
+
+# Phases of a turn, in order. llm_first_token is only seen when streaming.
+PHASES = ('prompt_build', 'llm_request', 'llm_first_token', 'game', 'parse', 'log_write')
+TOKEN_KINDS = ('prompt', 'completion', 'cached')
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket histogram, like a Prometheus one"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: 'Histogram'):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        """Estimated by interpolating inside the bucket, as Prometheus' histogram_quantile does"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+    def samples(self, name: str, labels: str = '') -> List[str]:
+        prefix = labels + ',' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            le = bound if bound == '+Inf' else repr(float(bound))
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+        braces = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_count{braces} {self.count}')
+        lines.append(f'{name}_sum{braces} {self.sum}')
+        return lines
+
+
+class TurnMetrics:
+    """
+    Turn and phase durations plus per-call token counts for one game
+
+    The driver calls observe_turn() with the phase spans of each turn and
+    observe_tokens() for each LLM reply that reported usage. Several games'
+    metrics can be added together with combine() for a batch.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turns = Histogram(SECONDS_BUCKETS)
+        self.phases = {phase: Histogram(SECONDS_BUCKETS) for phase in PHASES}
+        self.tokens = {kind: Histogram(TOKEN_BUCKETS) for kind in TOKEN_KINDS}
+
+    def observe_turn(self, seconds: float, spans: Dict[str, float]):
+        with self.lock:
+            self.turns.observe(seconds)
+            for phase, duration in spans.items():
+                if phase not in self.phases:
+                    self.phases[phase] = Histogram(SECONDS_BUCKETS)
+                self.phases[phase].observe(duration)
+
+    def observe_tokens(self, prompt: int, completion: int, cached: int):
+        with self.lock:
+            for kind, value in zip(TOKEN_KINDS, (prompt, completion, cached)):
+                self.tokens[kind].observe(value)
+
+    @classmethod
+    def combine(cls, metrics: Iterable['TurnMetrics']) -> 'TurnMetrics':
+        total = cls()
+        for m in metrics:
+            with m.lock:
+                total.turns.merge(m.turns)
+                for phase, histogram in m.phases.items():
+                    total.phases.setdefault(phase, Histogram(SECONDS_BUCKETS)).merge(histogram)
+                for kind, histogram in m.tokens.items():
+                    total.tokens[kind].merge(histogram)
+        return total
+
+    def summary(self) -> Dict:
+        """Seconds per turn and per phase, and tokens per LLM call, for summary_*.json"""
+        with self.lock:
+            return {
+                'turn_seconds': self.turns.summary(),
+                'phase_seconds': {phase: h.summary() for phase, h in self.phases.items() if h.count},
+                'tokens_per_call': {kind: h.summary() for kind, h in self.tokens.items()},
+            }
+
+    def openmetrics(self) -> str:
+        """Everything in the OpenMetrics text exposition format"""
+        with self.lock:
+            lines = [
+                '# TYPE zork_turn_seconds histogram',
+                '# UNIT zork_turn_seconds seconds',
+                '# HELP zork_turn_seconds Time from asking for a command to finishing the turn.',
+            ]
+            lines += self.turns.samples('zork_turn_seconds')
+            lines += [
+                '# TYPE zork_turn_phase_seconds histogram',
+                '# UNIT zork_turn_phase_seconds seconds',
+                '# HELP zork_turn_phase_seconds Time spent in each phase of a turn.',
+            ]
+            for phase, histogram in self.phases.items():
+                lines += histogram.samples('zork_turn_phase_seconds', f'phase="{phase}"')
+            lines += [
+                '# TYPE zork_llm_call_tokens histogram',
+                '# UNIT zork_llm_call_tokens tokens',
+                '# HELP zork_llm_call_tokens Tokens per LLM call, as reported by the server.',
+            ]
+            for kind, histogram in self.tokens.items():
+                lines += histogram.samples('zork_llm_call_tokens', f'kind="{kind}"')
+            lines += [
+                '# TYPE zork_llm_tokens counter',
+                '# UNIT zork_llm_tokens tokens',
+                '# HELP zork_llm_tokens Tokens used over all LLM calls.',
+            ]
+            for kind, histogram in self.tokens.items():
+                lines.append(f'zork_llm_tokens_total{{kind="{kind}"}} {int(histogram.sum)}')
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            f.write(self.openmetrics())
+
+
+def serve(render: Callable[[], str], port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Serve render() at /metrics from a background thread until the process exits
+
+    Only this machine can connect unless host says otherwise ('0.0.0.0' for
+    every interface).
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0].rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            data = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+
+def format_summary(metrics: Dict) -> List[str]:
+    """Console lines for a TurnMetrics.summary(), slowest phase first"""
+    phase_seconds = metrics['phase_seconds']
+    names = sorted(phase_seconds, key=lambda p: -phase_seconds[p]['mean'])
+    turn = metrics['turn_seconds']
+    lines = [f"Turn: mean {turn['mean'] * 1000:.1f} ms, p50 {turn['p50'] * 1000:.1f} ms, "
+             f"p99 {turn['p99'] * 1000:.1f} ms"]
+    for phase in names:
+        s = phase_seconds[phase]
+        lines.append(f"  {phase:<16} mean {s['mean'] * 1000:>8.2f} ms   p99 {s['p99'] * 1000:>8.2f} ms")
+    return lines
@@ -0,0 +1,127 @@
+"""Structured memory of the game world, built up turn by turn"""
+
+import re
+from typing import Dict, List, Optional
+
+from prompt_templates import WORLD_STATE_TEMPLATE
+from room_graph import RoomGraph
+
+ARTICLE = re.compile(r'^(?:the|an?|some)\s+', re.IGNORECASE)
+ITEM_HERE = re.compile(r'^(?:There (?:is|are) )?(?:an? |the |some )?(.+?) (?:(?:is|are) )?here\.$',
+                       re.IGNORECASE)
+MULTI_RESULT = re.compile(r'^(.+?): (Taken|Dropped)\.$')
+OBSTACLE = re.compile(r"\b(?:is|are) (?:locked|closed)\b|\bblocks?\b|\btoo (?:dark|narrow)\b"
+                      r"|\bwon't budge\b|\bnot strong enough\b", re.IGNORECASE)
+
+
+class WorldState:
+    """
+    What the agent has learned about the world so far
+
+    Updated after each turn from the command and ZorkGameParser.summarize_state
+    output (with the driver's GameStatus under 'status' when the game runs
+    in-process): where items were last seen, inventory, score and obstacles that
+    may be puzzles. Rooms and exits come from a RoomGraph, which whoever owns
+    it keeps up to date. render() turns it all into a prompt section whose
+    size is capped no matter how long the game runs.
+    """
+
+    def __init__(self, graph: Optional[RoomGraph] = None, max_rooms: int = 8,
+                 max_items: int = 10, max_obstacles: int = 4):
+        self.graph = graph if graph is not None else RoomGraph()
+        self.max_rooms = max_rooms
+        self.max_items = max_items
+        self.max_obstacles = max_obstacles
+        self.item_rooms: Dict[str, str] = {}          # item -> room it was last seen in
+        self.inventory: List[str] = []
+        self.score = None
+        self.moves = None
+        self.obstacles: List[tuple] = []              # (room, message)
+        self.deaths = 0
+
+    def update(self, command: Optional[str], state: Dict):
+        """Fold one turn (command and its parsed output) into the state"""
+        output = state.get('output', '')
+        lines = [line.strip() for line in output.splitlines() if line.strip()]
+        command = (command or '').strip().lower()
+        room = self.graph.room
+
+        self._update_items(command, lines)
+        self._update_inventory(state)
+
+        if state.get('score'):
+            self.score = state['score']
+        if state.get('moves') is not None:
+            self.moves = state['moves']
+        if state.get('is_death'):
+            self.deaths += 1
+
+        for line in lines:
+            # Short replies only; long lines are room descriptions
+            if len(line) < 80 and OBSTACLE.search(line) and (room, line) not in self.obstacles:
+                self.obstacles.append((room, line))
+                del self.obstacles[:-self.max_obstacles]
+
+    def _update_items(self, command: str, lines: List[str]):
+        words = command.split(None, 1)
+        verb = words[0] if words else ''
+        noun = ARTICLE.sub('', words[1]) if len(words) > 1 else ''
+
+        for line in lines:
+            multi = MULTI_RESULT.match(line)
+            if multi:
+                self._move_item(multi.group(1), multi.group(2) == 'Taken')
+            elif line == 'Taken.' and verb in ('take', 'get') and noun:
+                self._move_item(noun, True)
+            elif line == 'Dropped.' and verb in ('drop', 'put') and noun:
+                self._move_item(noun, False)
+            elif line == 'You are empty-handed.':
+                self.inventory = []
+            elif self.graph.room:
+                match = ITEM_HERE.match(line)
+                if match and not line.startswith('You ') and not match.group(1).startswith('no '):
+                    self.item_rooms[match.group(1)] = self.graph.room
+
+        if lines and lines[0] == 'You are carrying:':
+            self.inventory = [ARTICLE.sub('', line) for line in lines[1:]
+                              if not line.endswith(':')]
+
+    def _update_inventory(self, state: Dict):
+        """Take the inventory from the interpreter's memory when the state has it"""
+        status = state.get('status')
+        if status is not None:
+            self.inventory = list(status.inventory)
+
+    def _move_item(self, item: str, taken: bool):
+        if taken:
+            self.item_rooms.pop(item, None)
+            if item not in self.inventory:
+                self.inventory.append(item)
+        else:
+            if item in self.inventory:
+                self.inventory.remove(item)
+            if self.graph.room:
+                self.item_rooms[item] = self.graph.room
+
+    def render(self) -> str:
+        """The state as a compact prompt section"""
+        score = (f"{self.score[0]}/{self.score[1]}" if self.score else "unknown")
+        if self.moves is not None:
+            score += f" in {self.moves} moves"
+
+        visited = list(self.graph.exits)
+        rooms = [f"- {room}: {self.graph.describe(room)}" for room in visited[-self.max_rooms:]]
+        if len(visited) > self.max_rooms:
+            rooms.append(f"- ({len(visited) - self.max_rooms} more rooms visited earlier)")
+
+        items = [f"{item} ({room})" for item, room in list(self.item_rooms.items())[-self.max_items:]]
+        obstacles = [f"- {message} ({room or 'somewhere dark'})" for room, message in self.obstacles]
+
+        return WORLD_STATE_TEMPLATE.format(
+            location=self.graph.room or "unknown",
+            score=score,
+            inventory=", ".join(self.inventory) or "nothing",
+            rooms="\n".join(rooms) or "- none yet",
+            items=", ".join(items) or "none",
+            obstacles="\n".join(obstacles) or "- none"
+        )
@@ -1,141 +1,1652 @@
 #!/usr/bin/env python3
 """Simple Z-machine interpreter for playing Zork in the terminal"""
 
-import struct
+import argparse
+import copy
+import mmap
+import os
+import random
+import re
 import sys
+import threading
+import time
+from typing import NamedTuple, Tuple
+
+# Version 3 alphabet table. Index 0 of A2 is the ZSCII escape (z-char 6).
+ALPHABETS = [
+    'abcdefghijklmnopqrstuvwxyz',
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ',
+    ' \n0123456789.,!?_#\'"/\\-:()'
+]
+
+# The alphabets indexed directly by z-character (6-31)
+ZCHARS = [[None] * 6 + list(alphabet) for alphabet in ALPHABETS]
+
+# Z-characters that encode each lowercase ZSCII code in a dictionary word:
+# A0 letters directly, A2 punctuation after a shift, anything else as a
+# 10-bit ZSCII escape
+ZSCII_TO_ZCHARS = []
+for _code in range(256):
+    _ch = chr(_code)
+    if _ch in ALPHABETS[0]:
+        ZSCII_TO_ZCHARS.append((ALPHABETS[0].index(_ch) + 6,))
+    elif _ch in ALPHABETS[2][1:]:
+        ZSCII_TO_ZCHARS.append((5, ALPHABETS[2].index(_ch, 1) + 6))
+    else:
+        ZSCII_TO_ZCHARS.append((5, 6, _code >> 5, _code & 0x1F))
+
+# Dynamic memory is snapshotted in pages of this many bytes
+PAGE_SIZE = 256
+
+# Opcode metadata for version 3: number -> (name, stores, branches, inline text)
+OPCODES = {
+    '0OP': {
+        0x0: ('rtrue', False, False, False),
+        0x1: ('rfalse', False, False, False),
+        0x2: ('print', False, False, True),
+        0x3: ('print_ret', False, False, True),
+        0x4: ('nop', False, False, False),
+        0x5: ('save', False, True, False),
+        0x6: ('restore', False, True, False),
+        0x7: ('restart', False, False, False),
+        0x8: ('ret_popped', False, False, False),
+        0x9: ('pop', False, False, False),
+        0xA: ('quit', False, False, False),
+        0xB: ('new_line', False, False, False),
+        0xC: ('show_status', False, False, False),
+        0xD: ('verify', False, True, False),
+    },
+    '1OP': {
+        0x0: ('jz', False, True, False),
+        0x1: ('get_sibling', True, True, False),
+        0x2: ('get_child', True, True, False),
+        0x3: ('get_parent', True, False, False),
+        0x4: ('get_prop_len', True, False, False),
+        0x5: ('inc', False, False, False),
+        0x6: ('dec', False, False, False),
+        0x7: ('print_addr', False, False, False),
+        0x9: ('remove_obj', False, False, False),
+        0xA: ('print_obj', False, False, False),
+        0xB: ('ret', False, False, False),
+        0xC: ('jump', False, False, False),
+        0xD: ('print_paddr', False, False, False),
+        0xE: ('load', True, False, False),
+        0xF: ('not', True, False, False),
+    },
+    '2OP': {
+        0x01: ('je', False, True, False),
+        0x02: ('jl', False, True, False),
+        0x03: ('jg', False, True, False),
+        0x04: ('dec_chk', False, True, False),
+        0x05: ('inc_chk', False, True, False),
+        0x06: ('jin', False, True, False),
+        0x07: ('test', False, True, False),
+        0x08: ('or', True, False, False),
+        0x09: ('and', True, False, False),
+        0x0A: ('test_attr', False, True, False),
+        0x0B: ('set_attr', False, False, False),
+        0x0C: ('clear_attr', False, False, False),
+        0x0D: ('store', False, False, False),
+        0x0E: ('insert_obj', False, False, False),
+        0x0F: ('loadw', True, False, False),
+        0x10: ('loadb', True, False, False),
+        0x11: ('get_prop', True, False, False),
+        0x12: ('get_prop_addr', True, False, False),
+        0x13: ('get_next_prop', True, False, False),
+        0x14: ('add', True, False, False),
+        0x15: ('sub', True, False, False),
+        0x16: ('mul', True, False, False),
+        0x17: ('div', True, False, False),
+        0x18: ('mod', True, False, False),
+    },
+    'VAR': {
+        0x00: ('call', True, False, False),
+        0x01: ('storew', False, False, False),
+        0x02: ('storeb', False, False, False),
+        0x03: ('put_prop', False, False, False),
+        0x04: ('sread', False, False, False),
+        0x05: ('print_char', False, False, False),
+        0x06: ('print_num', False, False, False),
+        0x07: ('random', True, False, False),
+        0x08: ('push', False, False, False),
+        0x09: ('pull', False, False, False),
+        0x0A: ('split_window', False, False, False),
+        0x0B: ('set_window', False, False, False),
+        0x13: ('output_stream', False, False, False),
+        0x14: ('input_stream', False, False, False),
+        0x15: ('sound_effect', False, False, False),
+    },
+}
+
+# Operand types for every possible variable-form type byte, stopping at
+# the first "omitted" (3)
+OPERAND_TYPES = []
+for _byte in range(256):
+    _types = []
+    for _shift in (6, 4, 2, 0):
+        if (_byte >> _shift) & 0x03 == 3:
+            break
+        _types.append((_byte >> _shift) & 0x03)
+    OPERAND_TYPES.append(tuple(_types))
+
+
+class ZMachineError(Exception):
+    """Raised when the story file does something the interpreter can't run"""
+
+
+class Frame:
+    """A single routine call on the Z-machine call stack"""
+
+    __slots__ = ('return_pc', 'locals', 'stack', 'store_var', 'arg_count')
+
+    def __init__(self, return_pc, local_vars, store_var, arg_count):
+        self.return_pc = return_pc
+        self.locals = local_vars
+        self.stack = []
+        self.store_var = store_var  # None means discard the result
+        self.arg_count = arg_count
+
+    def copy(self):
+        frame = Frame(self.return_pc, list(self.locals), self.store_var, self.arg_count)
+        frame.stack = list(self.stack)
+        return frame
+
+
+class Snapshot:
+    """Saved machine state: dynamic memory pages, call stack, PC and RNG
+
+    Pages are immutable bytes objects. Consecutive snapshots of the same
+    machine share every page that wasn't written in between, so keeping
+    many snapshots costs roughly the pages that actually changed.
+    """
+
+    __slots__ = ('pages', 'pc', 'frames', 'rng_state', 'waiting_for_input',
+                 'pending_read', 'finished', 'started')
+
+    def __init__(self, pages, pc, frames, rng_state, waiting_for_input,
+                 pending_read, finished, started):
+        self.pages = pages
+        self.pc = pc
+        self.frames = frames
+        self.rng_state = rng_state
+        self.waiting_for_input = waiting_for_input
+        self.pending_read = pending_read
+        self.finished = finished
+        self.started = started
+
+
+class GameStatus(NamedTuple):
+    """The status line and the player's inventory, read from memory
+
+    In a time game (header flag 1 bit 1) score and moves hold the hours and
+    minutes instead.
+    """
+    room: int
+    room_name: str
+    score: int
+    moves: int
+    inventory: Tuple[str, ...]
+
+
+class ObjectTable:
+    """Object tree and property lists of a version 3 story
+
+    Entry addresses are computed once and every property list is scanned
+    once into a {number: (data address, size)} map, so property opcodes
+    never walk a list. Parent, sibling and child links are mirrored in
+    lists; memory is still written through so saves and snapshots see the
+    real tree. put_prop only changes property values, never the layout,
+    so nothing has to be rebuilt for it.
+    """
+
+    def __init__(self, zm):
+        self.zm = zm
+        self.defaults = zm.obj_table
+        self.base = zm.obj_table + 62
+        self.count = (zm.read_word(self.base + 7) - self.base) // 9
+        self.entries = [0] + [self.base + 9 * i for i in range(self.count)]
+        self.entries_end = self.base + 9 * self.count
+        self.rebuild()
+
+    def rebuild(self):
+        """Re-read links and property layouts after memory changed wholesale"""
+        memory = self.memory = self.zm.memory
+        self.parents = [0] * (self.count + 1)
+        self.siblings = [0] * (self.count + 1)
+        self.children = [0] * (self.count + 1)
+        self.name_addrs = [0] * (self.count + 1)
+        self.props = [{}] * (self.count + 1)
+        self.next_props = [{0: 0}] * (self.count + 1)
+        # Bytes whose value decides where properties live: the property
+        # table pointers, name lengths, size bytes and terminators
+        layout = []
+
+        for obj in range(1, self.count + 1):
+            self._read_links(obj)
+            entry = self.entries[obj]
+            layout.extend((entry + 7, entry + 8))
+            addr = (memory[entry + 7] << 8) | memory[entry + 8]
+            self.name_addrs[obj] = addr + 1 if memory[addr] else 0
+
+            props = {}
+            order = []
+            layout.append(addr)
+            addr += 1 + 2 * memory[addr]
+            while memory[addr]:
+                layout.append(addr)
+                size = (memory[addr] >> 5) + 1
+                number = memory[addr] & 0x1F
+                props[number] = (addr + 1, size)
+                order.append(number)
+                addr += 1 + size
+            layout.append(addr)
+            self.props[obj] = props
+            self.next_props[obj] = dict(zip([0] + order, order + [0]))
+        self.layout_bytes = {addr: memory[addr] for addr in layout}
+        self.props_end = max(layout) + 1
+
+    def _read_links(self, obj):
+        entry = self.entries[obj]
+        self.parents[obj] = self.memory[entry + 4]
+        self.siblings[obj] = self.memory[entry + 5]
+        self.children[obj] = self.memory[entry + 6]
+
+    def note_write(self, start, end):
+        """Keep the mirrors in step after the story wrote memory[start:end]"""
+        if start < self.entries_end and end > self.base:
+            first = max(1, (start - self.base) // 9 + 1)
+            last = min(self.count, (end - 1 - self.base) // 9 + 1)
+            for obj in range(first, last + 1):
+                self._read_links(obj)
+        layout = self.layout_bytes
+        for addr in range(start, min(end, self.props_end)):
+            if addr in layout and self.memory[addr] != layout[addr]:
+                self.rebuild()
+                return
+
+    def copy(self, zm):
+        """A view of zm's memory sharing this table's property layout"""
+        table = copy.copy(self)
+        table.zm = zm
+        table.memory = zm.memory
+        table.parents = list(self.parents)
+        table.siblings = list(self.siblings)
+        table.children = list(self.children)
+        return table
+
+    def _set_link(self, obj, offset, value, links):
+        self.memory[self.entries[obj] + offset] = value
+        links[obj] = value
+
+    def remove(self, obj):
+        """Unlink obj from its parent's child list"""
+        parent = self.parents[obj]
+        if not parent:
+            return
+        sibling = self.siblings[obj]
+        if self.children[parent] == obj:
+            self._set_link(parent, 6, sibling, self.children)
+        else:
+            node = self.children[parent]
+            while node:
+                if self.siblings[node] == obj:
+                    self._set_link(node, 5, sibling, self.siblings)
+                    break
+                node = self.siblings[node]
+        self._set_link(obj, 4, 0, self.parents)
+        self._set_link(obj, 5, 0, self.siblings)
+
+    def insert(self, obj, dest):
+        """Make obj the first child of dest"""
+        self.remove(obj)
+        self._set_link(obj, 4, dest, self.parents)
+        self._set_link(obj, 5, self.children[dest], self.siblings)
+        self._set_link(dest, 6, obj, self.children)
+
+    def contents(self, obj):
+        """Children of obj in tree order"""
+        items = []
+        child = self.children[obj]
+        while child:
+            items.append(child)
+            child = self.siblings[child]
+        return items
+
+    def has_attr(self, obj, attr):
+        return bool(self.memory[self.entries[obj] + (attr >> 3)] & (0x80 >> (attr & 7)))
+
+    def set_attr(self, obj, attr, on=True):
+        addr = self.entries[obj] + (attr >> 3)
+        if on:
+            self.memory[addr] |= 0x80 >> (attr & 7)
+        else:
+            self.memory[addr] &= ~(0x80 >> (attr & 7)) & 0xFF
+
+    def prop_addr(self, obj, prop):
+        """Data address of a property, or 0 if obj doesn't have it"""
+        return self.props[obj].get(prop, (0, 0))[0]
+
+    def get_prop(self, obj, prop):
+        """Property value, falling back to the default table"""
+        found = self.props[obj].get(prop)
+        if found is None:
+            addr = self.defaults + 2 * (prop - 1)
+        elif found[1] == 1:
+            return self.memory[found[0]]
+        else:
+            addr = found[0]
+        return (self.memory[addr] << 8) | self.memory[addr + 1]
+
+    def put_prop(self, obj, prop, value):
+        found = self.props[obj].get(prop)
+        if found is None:
+            raise ZMachineError(f"put_prop on missing property {prop} of object {obj}")
+        addr, size = found
+        if size == 1:
+            self.memory[addr] = value & 0xFF
+        else:
+            self.memory[addr] = (value >> 8) & 0xFF
+            self.memory[addr + 1] = value & 0xFF
+
+    def next_prop(self, obj, prop):
+        """Property number after prop (the first one for 0), or 0 at the end"""
+        number = self.next_props[obj].get(prop)
+        if number is None:
+            raise ZMachineError(f"get_next_prop on missing property {prop} of object {obj}")
+        return number
+
+
+class StoryImage:
+    """A story file mapped read-only, plus everything derived from it
+
+    One image is shared by every game of the same story in the process
+    (and, being a read-only mapping, by worker processes forked from it).
+    Games keep their own copy of dynamic memory only; instruction decoding,
+    static strings, the dictionary index and the initial object layout are
+    worked out once here.
+    """
+
+    _images = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.decode_cache = {}
+        self.text_cache = {}
+        self.shared = None
+
+    @classmethod
+    def load(cls, path):
+        """The shared image for path, mapping the file on first use"""
+        key = os.path.realpath(path)
+        with cls._lock:
+            image = cls._images.get(key)
+            if image is None:
+                image = cls._images[key] = cls(path)
+            return image
+
 
 class ZMachine:
-    def __init__(self, story_file):
-        with open(story_file, 'rb') as f:
-            self.memory = bytearray(f.read())
-        
+    # Per-story state worked out by the first game and reused by the rest
+    SHARED = ('abbreviations', 'separators', 'dict_entry_length', 'dict_count',
+              'dict_start', 'dictionary_index', 'opcodes')
+
+    def __init__(self, story_file, seed=None, predecode=False, save_file=None):
+        self.image = StoryImage.load(story_file)
+        self.story = self.image.data
+        self.static_mem = (self.story[0x0E] << 8) | self.story[0x0F]
+        self.memory = bytearray(self.story[:self.static_mem])
+
         self.version = self.memory[0]
-        self.pc = self.read_word(0x06)
+        if self.version != 3:
+            raise ZMachineError(f"Only version 3 story files are supported (got {self.version})")
+
+        self.high_mem = self.read_word(0x04)
+        self.dictionary = self.read_word(0x08)
+        self.obj_table = self.read_word(0x0A)
+        self.globals = self.read_word(0x0C)
+        self.abbrev_table = self.read_word(0x18)
+
+        self.rng = random.Random(seed)
+        self.save_file = save_file
         self.output_buffer = []
-        
+        self.status_line = ''
+        self.instruction_count = 0
+        self.decode_cache = self.image.decode_cache
+        self.text_cache = self.image.text_cache
+        self.dynamic_text_cache = {}
+        self._text_owners = {}
+
+        shared = self.image.shared
+        if shared is None:
+            self._load_abbreviations()
+            self._parse_dictionary()
+            self._build_dispatch()
+            self.objects = ObjectTable(self)
+            self.image.shared = dict((name, getattr(self, name)) for name in self.SHARED)
+            self.image.shared['objects'] = self.objects.copy(self)
+        else:
+            for name in self.SHARED:
+                setattr(self, name, shared[name])
+            self.objects = shared['objects'].copy(self)
+        self.player_var = 0  # The global holding the player object, found by start()
+        self._reset_registers()
+        if predecode:
+            self.predecode_strings()
+
+    def reset(self):
+        """Put the machine back in its power-on state"""
+        self.memory[:self.static_mem] = self.story[:self.static_mem]
+        self._forget_text(0, self.static_mem)
+        self.objects.rebuild()
+        self._reset_registers()
+
+    def _reset_registers(self):
+        self._pages = None
+        self.pc = self.read_word(0x06)
+        self.frames = [Frame(0, [], None, 0)]
+        self.memory_streams = []
+        self.screen_output = True
+        self.waiting_for_input = False
+        self.finished = False
+        self._pending_read = None
+        self._started = False
+
+    # ------------------------------------------------------------------
+    # Memory access
+    # ------------------------------------------------------------------
+
     def read_byte(self, addr):
-        return self.memory[addr]
-    
+        memory = self.memory if addr < self.static_mem else self.story
+        return memory[addr]
+
     def read_word(self, addr):
-        return (self.memory[addr] << 8) | self.memory[addr + 1]
-    
+        memory = self.memory if addr < self.static_mem else self.story
+        return (memory[addr] << 8) | memory[addr + 1]
+
     def write_byte(self, addr, value):
         self.memory[addr] = value & 0xFF
-    
+
     def write_word(self, addr, value):
         self.memory[addr] = (value >> 8) & 0xFF
         self.memory[addr + 1] = value & 0xFF
-    
+
+    def read_var(self, var):
+        """Read a variable, popping the stack for variable 0"""
+        frame = self.frames[-1]
+        if var == 0:
+            if not frame.stack:
+                raise ZMachineError(f"Stack underflow at {self.pc:#06x}")
+            return frame.stack.pop()
+        if var < 16:
+            return frame.locals[var - 1]
+        return self.read_word(self.globals + 2 * (var - 16))
+
+    def write_var(self, var, value):
+        """Write a variable, pushing onto the stack for variable 0"""
+        value &= 0xFFFF
+        frame = self.frames[-1]
+        if var == 0:
+            frame.stack.append(value)
+        elif var < 16:
+            frame.locals[var - 1] = value
+        else:
+            self.write_word(self.globals + 2 * (var - 16), value)
+
+    def _read_var_indirect(self, var):
+        """Read a variable by reference; the stack top is peeked, not popped"""
+        if var == 0:
+            stack = self.frames[-1].stack
+            if not stack:
+                raise ZMachineError(f"Stack underflow at {self.pc:#06x}")
+            return stack[-1]
+        return self.read_var(var)
+
+    def _write_var_indirect(self, var, value):
+        """Write a variable by reference; the stack top is replaced, not pushed"""
+        if var == 0:
+            stack = self.frames[-1].stack
+            if not stack:
+                raise ZMachineError(f"Stack underflow at {self.pc:#06x}")
+            stack[-1] = value & 0xFFFF
+        else:
+            self.write_var(var, value)
+
+    # ------------------------------------------------------------------
+    # Text
+    # ------------------------------------------------------------------
+
     def decode_text(self, addr, length=None):
         """Decode Z-machine text"""
+        return self._decode_zstring(addr)[0]
+
+    def _decode_zstring(self, addr):
+        """Decode the Z-string at addr, returning (text, address after it)
+
+        Results are cached by address. Strings in static and high memory
+        never change, so their cache is shared with forks; strings in
+        dynamic memory stay cached until one of their bytes is written
+        (see _forget_text).
+        """
+        cache = self.text_cache if addr >= self.static_mem else self.dynamic_text_cache
+        cached = cache.get(addr)
+        if cached is not None:
+            return cached
+
+        result = self._decode_zchars(addr, self.abbreviations)
+        cache[addr] = result
+        if addr < self.static_mem:
+            owners = self._text_owners
+            for byte_addr in range(addr, result[1]):
+                owners[byte_addr] = addr
+        return result
+
+    def _decode_zchars(self, addr, abbreviations):
+        """Decode z-characters at addr without consulting the cache
+
+        abbreviations is the list of 96 expanded abbreviation strings, or
+        None while the abbreviations themselves are being decoded.
+        """
+        memory = self.memory if addr < self.static_mem else self.story
         text = []
-        alphabet = [
-            'abcdefghijklmnopqrstuvwxyz',
-            'ABCDEFGHIJKLMNOPQRSTUVWXYZ',
-            ' \n0123456789.,!?_#\'"/\\-:()'
-        ]
-        
-        shift = 0
+        append = text.append
+        chars = ZCHARS[0]
+        abbrev = 0
+        escape = -1
+        escape_hi = 0
+
         while True:
-            word = self.read_word(addr)
+            word = (memory[addr] << 8) | memory[addr + 1]
             addr += 2
-            
-            for i in range(3):
-                zchar = (word >> (10 - i * 5)) & 0x1F
-                
-                if zchar == 0:
-                    text.append(' ')
-                elif zchar <= 3:
-                    shift = zchar
+
+            for zchar in ((word >> 10) & 0x1F, (word >> 5) & 0x1F, word & 0x1F):
+                if abbrev:
+                    append(abbreviations[32 * (abbrev - 1) + zchar])
+                    abbrev = 0
+                elif escape >= 0:
+                    if escape == 0:
+                        escape_hi = zchar
+                        escape = 1
+                    else:
+                        append(self._zscii_to_text((escape_hi << 5) | zchar))
+                        escape = -1
+                elif zchar > 5:
+                    if zchar == 6 and chars is ZCHARS[2]:
+                        escape = 0
+                    else:
+                        append(chars[zchar])
+                    chars = ZCHARS[0]
+                elif zchar == 0:
+                    append(' ')
+                    chars = ZCHARS[0]
                 elif zchar == 4:
-                    shift = 1
+                    chars = ZCHARS[1]
                 elif zchar == 5:
-                    shift = 2
+                    chars = ZCHARS[2]
+                elif abbreviations is None:
+                    raise ZMachineError(f"Nested abbreviation at {addr - 2:#06x}")
                 else:
-                    char_idx = zchar - 6
-                    if shift < 3 and char_idx < len(alphabet[shift]):
-                        text.append(alphabet[shift][char_idx])
-                    shift = 0
-            
+                    abbrev = zchar
+                    chars = ZCHARS[0]
+
             if word & 0x8000:
                 break
-                
-        return ''.join(text)
-    
+
+        return ''.join(text), addr
+
+    def _load_abbreviations(self):
+        """Expand the 96 abbreviations once; stories never rewrite them"""
+        self.abbreviations = [
+            self._decode_zchars(2 * self.read_word(self.abbrev_table + 2 * i), None)[0]
+            for i in range(96)
+        ]
+
+    def _forget_text(self, start, end):
+        """Drop cached strings overlapping memory[start:end] after a write"""
+        owners = self._text_owners
+        for byte_addr in range(start, end):
+            addr = owners.get(byte_addr)
+            if addr is not None:
+                text_end = self.dynamic_text_cache.pop(addr)[1]
+                for owned in range(addr, text_end):
+                    del owners[owned]
+
+    def predecode_strings(self):
+        """Decode every string in high memory and every object name up front
+
+        High memory mixes routines and strings, so this walks it as one run
+        of back-to-back Z-strings. Once a run ends on a real string boundary
+        every following string is decoded at its true address; the spurious
+        entries that cover code are never looked up. Trades memory for not
+        decoding anything during play.
+        """
+        addr = self.high_mem + (self.high_mem & 1)
+        end = min(self.read_word(0x1A) * 2, len(self.story)) - 1
+        while addr < end:
+            try:
+                addr = self._decode_zstring(addr)[1]
+            except IndexError:
+                break
+        for obj in range(1, self.object_count() + 1):
+            self.object_name(obj)
+        return len(self.text_cache) + len(self.dynamic_text_cache)
+
+    def _zscii_to_text(self, code):
+        if code == 13:
+            return '\n'
+        if 32 <= code <= 126:
+            return chr(code)
+        return '?'
+
+    def _print(self, text):
+        """Send text to the active output stream"""
+        if self.memory_streams:
+            self.memory_streams[-1][1].append(text)
+        elif self.screen_output:
+            self.output_buffer.append(text)
+
     def print_text(self, text):
         print(text, end='', flush=True)
-    
-    def run(self):
-        print("Z-Machine Interpreter v0.1")
-        print("=" * 50)
-        print("This is a basic interpreter. Use 'quit' to exit.")
-        print()
-        
-        # Print initial location description
-        print("ZORK I: The Great Underground Empire")
-        print("Copyright (c) 1981, 1982, 1983 Infocom, Inc.")
-        print("All rights reserved.")
-        print("ZORK is a registered trademark of Infocom, Inc.")
-        print()
-        print("West of House")
-        print("You are standing in an open field west of a white house,")
-        print("with a boarded front door.")
-        print("There is a small mailbox here.")
-        print()
-        
-        while True:
-            try:
-                command = input("> ").strip().lower()
-                
-                if command in ['quit', 'q', 'exit']:
-                    print("Thanks for playing!")
+
+    # ------------------------------------------------------------------
+    # Objects
+    # ------------------------------------------------------------------
+
+    def object_count(self):
+        return self.objects.count
+
+    def object_name(self, obj):
+        """Short name of an object"""
+        addr = self.objects.name_addrs[obj]
+        return self.decode_text(addr) if addr else ''
+
+    def location_of(self, obj):
+        """Parent of obj in the object tree (its room or container), or 0"""
+        return self.objects.parents[obj]
+
+    def contents(self, obj):
+        """Objects directly inside obj, in the order the game lists them"""
+        return self.objects.contents(obj)
+
+    # ------------------------------------------------------------------
+    # Dictionary and input
+    # ------------------------------------------------------------------
+
+    def _parse_dictionary(self):
+        """Index the dictionary by its packed 4-byte key, once per load"""
+        addr = self.dictionary
+        count = self.read_byte(addr)
+        self.separators = set(self.read_byte(addr + 1 + i) for i in range(count))
+        addr += 1 + count
+        self.dict_entry_length = self.read_byte(addr)
+        entries = self.read_word(addr + 1)
+        self.dict_count = entries if entries < 0x8000 else 0x10000 - entries
+        self.dict_start = addr + 3
+
+        self.dictionary_index = {}
+        for i in range(self.dict_count):
+            entry = self.dict_start + i * self.dict_entry_length
+            key = (self.read_word(entry) << 16) | self.read_word(entry + 2)
+            self.dictionary_index[key] = entry
+
+    @staticmethod
+    def _encode_key(data, start, end):
+        """Pack data[start:end] (lowercase ZSCII) into a 32-bit dictionary key"""
+        key = 0
+        count = 0
+        for i in range(start, end):
+            for zchar in ZSCII_TO_ZCHARS[data[i]]:
+                key = (key << 5) | zchar
+                count += 1
+                if count == 6:
                     break
-                elif command == '':
-                    continue
-                elif command in ['n', 'north']:
-                    print("You can't go that way.")
-                elif command in ['s', 'south']:
-                    print("You walk south.")
-                elif command in ['e', 'east']:
-                    print("The door is locked, and there is evidently no key.")
-                elif command in ['w', 'west']:
-                    print("You walk west.")
-                elif command in ['open mailbox', 'open']:
-                    print("Opening the small mailbox reveals a leaflet.")
-                elif command in ['take leaflet', 'get leaflet']:
-                    print("Taken.")
-                elif command in ['read leaflet']:
-                    print("\"WELCOME TO ZORK!\"")
-                    print()
-                    print("ZORK is a game of adventure, danger, and low cunning.")
-                elif command in ['i', 'inventory']:
-                    print("You are empty-handed.")
-                elif command in ['l', 'look']:
-                    print("West of House")
-                    print("You are standing in an open field west of a white house,")
-                    print("with a boarded front door.")
-                    print("There is a small mailbox here.")
-                elif command == 'help':
-                    print("Common commands: n/s/e/w, look, take, open, inventory, quit")
+            if count == 6:
+                break
+        while count < 6:
+            key = (key << 5) | 5
+            count += 1
+        return ((key >> 15) << 16) | (key & 0x7FFF) | 0x8000
+
+    def encode_word(self, word):
+        """Encode a word as the 4-byte dictionary key used by version 3"""
+        data = word.encode('latin-1', 'replace')
+        return self._encode_key(data, 0, len(data)).to_bytes(4, 'big')
+
+    def lookup_word(self, word):
+        """Dictionary address of word, or 0 if the game doesn't know it"""
+        data = word.lower().encode('latin-1', 'replace')
+        return self.dictionary_index.get(self._encode_key(data, 0, len(data)), 0)
+
+    def dictionary_words(self):
+        """Every dictionary word, mapped to its first data byte (part-of-speech flags)"""
+        words = {}
+        for i in range(self.dict_count):
+            entry = self.dict_start + i * self.dict_entry_length
+            words[self._decode_zchars(entry, None)[0]] = self.read_byte(entry + 4)
+        return words
+
+    def tokenize(self, text_buffer, parse_buffer):
+        """Split the text buffer into words and fill in the parse buffer
+
+        Words are read and encoded straight out of memory, so a command
+        costs one dict lookup per word and no string objects.
+        """
+        memory = self.memory
+        separators = self.separators
+        index = self.dictionary_index
+        encode_key = self._encode_key
+
+        pos = text_buffer + 1
+        end = memory.index(0, pos)
+        entry = parse_buffer + 2
+        max_words = memory[parse_buffer]
+        count = 0
+        while pos < end and count < max_words:
+            ch = memory[pos]
+            if ch == 32:
+                pos += 1
+                continue
+            start = pos
+            pos += 1
+            if ch not in separators:
+                while pos < end and memory[pos] != 32 and memory[pos] not in separators:
+                    pos += 1
+            addr = index.get(encode_key(memory, start, pos), 0)
+            memory[entry] = addr >> 8
+            memory[entry + 1] = addr & 0xFF
+            memory[entry + 2] = pos - start
+            memory[entry + 3] = start - text_buffer
+            entry += 4
+            count += 1
+        memory[parse_buffer + 1] = count
+
+    def _complete_read(self, command):
+        """Feed a line of input to the sread the game is waiting on"""
+        text_buffer, parse_buffer = self._pending_read
+        self._pending_read = None
+        self.waiting_for_input = False
+
+        max_length = self.memory[text_buffer] - 1
+        data = command.lower().encode('latin-1', 'replace')[:max_length]
+        self.memory[text_buffer + 1:text_buffer + 1 + len(data)] = data
+        self.memory[text_buffer + 1 + len(data)] = 0
+        self._forget_text(text_buffer + 1, text_buffer + 2 + len(data))
+        if parse_buffer:
+            self.tokenize(text_buffer, parse_buffer)
+            self._forget_text(parse_buffer + 1, parse_buffer + 2 + 4 * self.memory[parse_buffer])
+
+    # ------------------------------------------------------------------
+    # Instruction decoding and execution
+    # ------------------------------------------------------------------
+
+    def _build_dispatch(self):
+        """Build the flat 256-entry opcode table indexed by the opcode byte"""
+        self.opcodes = [None] * 256
+        for byte in range(256):
+            if byte < 0x80:
+                kind, number = '2OP', byte & 0x1F
+                types = (2 if byte & 0x40 else 1, 2 if byte & 0x20 else 1)
+            elif byte < 0xC0:
+                op_type = (byte >> 4) & 0x03
+                kind = '0OP' if op_type == 3 else '1OP'
+                number = byte & 0x0F
+                types = () if op_type == 3 else (op_type,)
+            else:
+                kind = '2OP' if byte < 0xE0 else 'VAR'
+                number = byte & 0x1F
+                types = None  # read from the operand type byte
+            info = OPCODES[kind].get(number)
+            if info is None:
+                continue
+            name, stores, branches, has_text = info
+            self.opcodes[byte] = (getattr(ZMachine, 'op_' + name), types, stores, branches, has_text)
+
+    def _decode(self, pc):
+        """Decode the instruction at pc, caching it if it lives in static memory
+
+        Returns (handler, operands, operand kinds or None, store variable,
+        branch, next pc, inline text). branch is (on_true, target, address
+        of the branch data) where a target of 0 or 1 means return false/true.
+        """
+        memory = self.memory if pc < self.static_mem else self.story
+        entry = self.opcodes[memory[pc]]
+        if entry is None:
+            raise ZMachineError(f"Illegal opcode {memory[pc]:#04x} at {pc:#06x}")
+        handler, types, stores, branches, has_text = entry
+
+        addr = pc + 1
+        if types is None:
+            types = OPERAND_TYPES[memory[addr]]
+            addr += 1
+
+        # Variable operands are resolved here as far as possible: kind 1 is
+        # the stack, kind 2 a local (by index), kind 3 a global (by address)
+        operands = []
+        kinds = []
+        for op_type in types:
+            if op_type == 0:
+                operands.append((memory[addr] << 8) | memory[addr + 1])
+                kinds.append(0)
+                addr += 2
+            elif op_type == 1:
+                operands.append(memory[addr])
+                kinds.append(0)
+                addr += 1
+            else:
+                var = memory[addr]
+                addr += 1
+                if var == 0:
+                    operands.append(0)
+                    kinds.append(1)
+                elif var < 16:
+                    operands.append(var - 1)
+                    kinds.append(2)
                 else:
-                    print("I don't understand that command.")
-                    print("Try: look, n/s/e/w, open mailbox, take, inventory, quit")
-                print()
-                
-            except KeyboardInterrupt:
+                    operands.append(self.globals + 2 * (var - 16))
+                    kinds.append(3)
+
+        store = None
+        if stores:
+            store = memory[addr]
+            addr += 1
+
+        branch = None
+        if branches:
+            branch = self._decode_branch(addr)
+            addr += 1 if memory[addr] & 0x40 else 2
+
+        text = None
+        if has_text:
+            text, addr = self._decode_zstring(addr)
+
+        instruction = (handler, tuple(operands), tuple(kinds) if any(kinds) else None,
+                       store, branch, addr, text)
+        if pc >= self.static_mem:
+            self.decode_cache[pc] = instruction
+        return instruction
+
+    def _decode_branch(self, addr):
+        """Decode branch data at addr into (on_true, target, addr)"""
+        memory = self.memory if addr < self.static_mem else self.story
+        first = memory[addr]
+        if first & 0x40:
+            offset = first & 0x3F
+            after = addr + 1
+        else:
+            offset = ((first & 0x3F) << 8) | memory[addr + 1]
+            after = addr + 2
+            if offset & 0x2000:
+                offset -= 0x4000
+        target = offset if offset in (0, 1) else after + offset - 2
+        return bool(first & 0x80), target, addr
+
+    def _fetch_operands(self, operands, kinds):
+        """Resolve the variable operands of a decoded instruction"""
+        frame = self.frames[-1]
+        memory = self.memory
+        values = []
+        for value, kind in zip(operands, kinds):
+            if kind == 0:
+                values.append(value)
+            elif kind == 1:
+                if not frame.stack:
+                    raise ZMachineError(f"Stack underflow at {self.pc:#06x}")
+                values.append(frame.stack.pop())
+            elif kind == 2:
+                values.append(frame.locals[value])
+            else:
+                values.append((memory[value] << 8) | memory[value + 1])
+        return values
+
+    def execute_instruction(self):
+        """Decode and run the instruction at the program counter"""
+        handler, operands, kinds, self._store_var, self._branch_to, self.pc, self._text = \
+            self.decode_cache.get(self.pc) or self._decode(self.pc)
+        if kinds is not None:
+            operands = self._fetch_operands(operands, kinds)
+        self.instruction_count += 1
+        handler(self, *operands)
+
+    def _store(self, value):
+        var = self._store_var
+        value &= 0xFFFF
+        if var == 0:
+            self.frames[-1].stack.append(value)
+        elif var < 16:
+            self.frames[-1].locals[var - 1] = value
+        else:
+            addr = self.globals + 2 * (var - 16)
+            self.memory[addr] = value >> 8
+            self.memory[addr + 1] = value & 0xFF
+
+    def _branch(self, condition):
+        on_true, target, _ = self._branch_to
+        if bool(condition) == on_true:
+            if target <= 1:
+                self._return(target)
+            else:
+                self.pc = target
+
+    def _call(self, routine, args, store_var):
+        if routine == 0:
+            if store_var is not None:
+                self.write_var(store_var, 0)
+            return
+        addr = 2 * routine
+        num_locals = self.read_byte(addr)
+        local_vars = [self.read_word(addr + 1 + 2 * i) for i in range(num_locals)]
+        for i, value in enumerate(args[:num_locals]):
+            local_vars[i] = value
+        self.frames.append(Frame(self.pc, local_vars, store_var, len(args)))
+        self.pc = addr + 1 + 2 * num_locals
+
+    def _return(self, value):
+        frame = self.frames.pop()
+        if not self.frames:
+            raise ZMachineError("Returned from the main routine")
+        self.pc = frame.return_pc
+        if frame.store_var is not None:
+            self.write_var(frame.store_var, value)
+
+    @staticmethod
+    def _signed(value):
+        return value - 0x10000 if value & 0x8000 else value
+
+    # --- 0OP ----------------------------------------------------------
+
+    def op_rtrue(self):
+        self._return(1)
+
+    def op_rfalse(self):
+        self._return(0)
+
+    def op_print(self):
+        self._print(self._text)
+
+    def op_print_ret(self):
+        self._print(self._text + '\n')
+        self._return(1)
+
+    def op_nop(self):
+        pass
+
+    def op_save(self):
+        if not self.save_file:
+            self._branch(False)
+            return
+        try:
+            with open(self.save_file, 'wb') as f:
+                f.write(self.quetzal_bytes(self._branch_to[2]))
+        except OSError:
+            self._branch(False)
+            return
+        self._branch(True)
+
+    def op_restore(self):
+        try:
+            with open(self.save_file, 'rb') as f:
+                data = f.read()
+        except (OSError, TypeError):
+            self._branch(False)
+            return
+        try:
+            pc, pending_read = self.load_quetzal(data)
+        except ZMachineError:
+            self._branch(False)
+            return
+        self._resume(pc, pending_read)
+
+    def op_restart(self):
+        # The transcript and fixed-pitch bits of Flags 2 survive a restart
+        flags2 = self.memory[0x11] & 0x03
+        self.reset()
+        self.memory[0x11] = (self.memory[0x11] & ~0x03) | flags2
+        self._started = True
+
+    def op_ret_popped(self):
+        self._return(self.read_var(0))
+
+    def op_pop(self):
+        self.read_var(0)
+
+    def op_quit(self):
+        self.finished = True
+
+    def op_new_line(self):
+        self._print('\n')
+
+    def op_show_status(self):
+        self._update_status_line()
+
+    def op_verify(self):
+        length = self.read_word(0x1A) * 2
+        checksum = sum(self.story[0x40:length]) & 0xFFFF
+        self._branch(checksum == self.read_word(0x1C))
+
+    # --- 1OP ----------------------------------------------------------
+
+    def op_jz(self, a):
+        self._branch(a == 0)
+
+    def op_get_sibling(self, obj):
+        sibling = self.objects.siblings[obj]
+        self._store(sibling)
+        self._branch(sibling != 0)
+
+    def op_get_child(self, obj):
+        child = self.objects.children[obj]
+        self._store(child)
+        self._branch(child != 0)
+
+    def op_get_parent(self, obj):
+        self._store(self.objects.parents[obj])
+
+    def op_get_prop_len(self, addr):
+        self._store(((self.memory[addr - 1] >> 5) + 1) if addr else 0)
+
+    def op_inc(self, var):
+        self._write_var_indirect(var, self._read_var_indirect(var) + 1)
+
+    def op_dec(self, var):
+        self._write_var_indirect(var, self._read_var_indirect(var) - 1)
+
+    def op_print_addr(self, addr):
+        self._print(self.decode_text(addr))
+
+    def op_remove_obj(self, obj):
+        if obj:
+            self.objects.remove(obj)
+
+    def op_print_obj(self, obj):
+        self._print(self.object_name(obj))
+
+    def op_ret(self, value):
+        self._return(value)
+
+    def op_jump(self, offset):
+        self.pc += self._signed(offset) - 2
+
+    def op_print_paddr(self, addr):
+        self._print(self.decode_text(2 * addr))
+
+    def op_load(self, var):
+        self._store(self._read_var_indirect(var))
+
+    def op_not(self, a):
+        self._store(~a & 0xFFFF)
+
+    # --- 2OP ----------------------------------------------------------
+
+    def op_je(self, a, *others):
+        self._branch(a in others)
+
+    def op_jl(self, a, b):
+        self._branch(self._signed(a) < self._signed(b))
+
+    def op_jg(self, a, b):
+        self._branch(self._signed(a) > self._signed(b))
+
+    def op_dec_chk(self, var, value):
+        new = (self._read_var_indirect(var) - 1) & 0xFFFF
+        self._write_var_indirect(var, new)
+        self._branch(self._signed(new) < self._signed(value))
+
+    def op_inc_chk(self, var, value):
+        new = (self._read_var_indirect(var) + 1) & 0xFFFF
+        self._write_var_indirect(var, new)
+        self._branch(self._signed(new) > self._signed(value))
+
+    def op_jin(self, a, b):
+        self._branch(self.objects.parents[a] == b)
+
+    def op_test(self, bitmap, flags):
+        self._branch(bitmap & flags == flags)
+
+    def op_or(self, a, b):
+        self._store(a | b)
+
+    def op_and(self, a, b):
+        self._store(a & b)
+
+    def op_test_attr(self, obj, attr):
+        self._branch(obj and self.objects.has_attr(obj, attr))
+
+    def op_set_attr(self, obj, attr):
+        if obj:
+            self.objects.set_attr(obj, attr)
+
+    def op_clear_attr(self, obj, attr):
+        if obj:
+            self.objects.set_attr(obj, attr, False)
+
+    def op_store(self, var, value):
+        self._write_var_indirect(var, value)
+
+    def op_insert_obj(self, obj, dest):
+        if obj:
+            self.objects.insert(obj, dest)
+
+    def op_loadw(self, array, index):
+        self._store(self.read_word((array + 2 * index) & 0xFFFF))
+
+    def op_loadb(self, array, index):
+        self._store(self.read_byte((array + index) & 0xFFFF))
+
+    def op_get_prop(self, obj, prop):
+        self._store(self.objects.get_prop(obj, prop))
+
+    def op_get_prop_addr(self, obj, prop):
+        self._store(self.objects.prop_addr(obj, prop) if obj else 0)
+
+    def op_get_next_prop(self, obj, prop):
+        self._store(self.objects.next_prop(obj, prop))
+
+    def op_add(self, a, b):
+        self._store(a + b)
+
+    def op_sub(self, a, b):
+        self._store(a - b)
+
+    def op_mul(self, a, b):
+        self._store(self._signed(a) * self._signed(b))
+
+    def op_div(self, a, b):
+        a, b = self._signed(a), self._signed(b)
+        if b == 0:
+            raise ZMachineError(f"Division by zero at {self.pc:#06x}")
+        quotient = abs(a) // abs(b)
+        self._store(quotient if (a < 0) == (b < 0) else -quotient)
+
+    def op_mod(self, a, b):
+        a, b = self._signed(a), self._signed(b)
+        if b == 0:
+            raise ZMachineError(f"Division by zero at {self.pc:#06x}")
+        remainder = abs(a) % abs(b)
+        self._store(-remainder if a < 0 else remainder)
+
+    # --- VAR ----------------------------------------------------------
+
+    def op_call(self, routine, *args):
+        self._call(routine, args, self._store_var)
+
+    def op_storew(self, array, index, value):
+        addr = (array + 2 * index) & 0xFFFF
+        if addr + 1 >= self.static_mem:
+            raise ZMachineError(f"Write to static memory at {addr:#06x}")
+        self.write_word(addr, value)
+        if addr in self._text_owners or addr + 1 in self._text_owners:
+            self._forget_text(addr, addr + 2)
+        if addr < self.objects.props_end:
+            self.objects.note_write(addr, addr + 2)
+
+    def op_storeb(self, array, index, value):
+        addr = (array + index) & 0xFFFF
+        if addr >= self.static_mem:
+            raise ZMachineError(f"Write to static memory at {addr:#06x}")
+        self.memory[addr] = value & 0xFF
+        if addr in self._text_owners:
+            self._forget_text(addr, addr + 1)
+        if addr < self.objects.props_end:
+            self.objects.note_write(addr, addr + 1)
+
+    def op_put_prop(self, obj, prop, value):
+        self.objects.put_prop(obj, prop, value)
+
+    def op_sread(self, text_buffer, parse_buffer=0):
+        self._update_status_line()
+        self._pending_read = (text_buffer, parse_buffer)
+        self.waiting_for_input = True
+
+    def op_print_char(self, code):
+        self._print(self._zscii_to_text(code))
+
+    def op_print_num(self, value):
+        self._print(str(self._signed(value)))
+
+    def op_random(self, value):
+        value = self._signed(value)
+        if value > 0:
+            self._store(self.rng.randint(1, value))
+        else:
+            self.rng.seed(-value if value else None)
+            self._store(0)
+
+    def op_push(self, value):
+        self.write_var(0, value)
+
+    def op_pull(self, var):
+        self._write_var_indirect(var, self.read_var(0))
+
+    def op_split_window(self, lines):
+        pass
+
+    def op_set_window(self, window):
+        pass
+
+    def op_output_stream(self, number, table=0):
+        number = self._signed(number)
+        if number == 1:
+            self.screen_output = True
+        elif number == -1:
+            self.screen_output = False
+        elif number == 3:
+            self.memory_streams.append((table, []))
+        elif number == -3 and self.memory_streams:
+            table, chunks = self.memory_streams.pop()
+            data = ''.join(chunks).replace('\n', '\r').encode('latin-1', 'replace')
+            self.write_word(table, len(data))
+            self.memory[table + 2:table + 2 + len(data)] = data
+            self._forget_text(table, table + 2 + len(data))
+            self.objects.note_write(table, table + 2 + len(data))
+
+    def op_input_stream(self, number):
+        pass
+
+    def op_sound_effect(self, *args):
+        pass
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        """Capture dynamic memory, the call stack and PC as a Snapshot
+
+        Pages that haven't changed since the last snapshot or restore are
+        shared with it rather than copied.
+        """
+        base = self._pages
+        pages = []
+        with memoryview(self.memory) as memory:
+            for i, start in enumerate(range(0, self.static_mem, PAGE_SIZE)):
+                end = min(start + PAGE_SIZE, self.static_mem)
+                page = base[i] if base else None
+                if page is None or memory[start:end] != page:
+                    page = bytes(memory[start:end])
+                pages.append(page)
+        self._pages = tuple(pages)
+        return Snapshot(self._pages, self.pc, tuple(frame.copy() for frame in self.frames),
+                        self.rng.getstate(), self.waiting_for_input, self._pending_read,
+                        self.finished, self._started)
+
+    def restore(self, snap):
+        """Return to a Snapshot taken from this machine or one of its forks"""
+        self._replace_dynamic(snap.pages)
+        self._pages = snap.pages
+        self.pc = snap.pc
+        self.frames = [frame.copy() for frame in snap.frames]
+        self.rng.setstate(snap.rng_state)
+        self.waiting_for_input = snap.waiting_for_input
+        self._pending_read = snap.pending_read
+        self.finished = snap.finished
+        self._started = snap.started
+        self.output_buffer = []
+        self.memory_streams = []
+
+    def fork(self, seed=None):
+        """An independent machine in the same state as this one
+
+        The story image, decoded instructions, static strings, dictionary
+        and property layout are shared; only the game state is copied.
+        Pass a seed to give the fork its own random sequence.
+        """
+        child = copy.copy(self)
+        child.memory = bytearray(self.memory)
+        child.frames = [frame.copy() for frame in self.frames]
+        child.rng = random.Random(seed)
+        if seed is None:
+            child.rng.setstate(self.rng.getstate())
+        child.output_buffer = list(self.output_buffer)
+        child.memory_streams = [(table, list(chunks)) for table, chunks in self.memory_streams]
+        child.dynamic_text_cache = dict(self.dynamic_text_cache)
+        child._text_owners = dict(self._text_owners)
+        child.objects = self.objects.copy(child)
+        return child
+
+    def _replace_dynamic(self, pages):
+        """Write dynamic memory page by page, touching only pages that differ"""
+        with memoryview(self.memory) as memory:
+            for i, page in enumerate(pages):
+                start = i * PAGE_SIZE
+                end = start + len(page)
+                if memory[start:end] != page:
+                    memory[start:end] = page
+                    self._memory_changed(start, end)
+
+    def _memory_changed(self, start, end):
+        """Drop anything cached about memory[start:end] after it was replaced"""
+        self._forget_text(start, end)
+        self.objects.note_write(start, end)
+
+    # ------------------------------------------------------------------
+    # Quetzal save files
+    # ------------------------------------------------------------------
+
+    def quetzal_bytes(self, pc, pending_read=None):
+        """Serialize the game as a Quetzal (IFZS) file resuming at pc
+
+        For version 3, pc is the address of the save instruction's branch
+        data. Memory is stored as a CMem chunk: dynamic memory XORed with
+        the original story and run-length encoded, so an unchanged byte
+        costs nothing and a typical save is a few hundred bytes.
+
+        A file taken at the prompt (see checkpoint_bytes) instead resumes
+        at the instruction after the read, and carries the read's text and
+        parse buffers in an extra Read chunk.
+        """
+        ifhd = (self.story[0x02:0x04] + self.story[0x12:0x18] + self.story[0x1C:0x1E]
+                + pc.to_bytes(3, 'big'))
+        chunks = [(b'IFhd', ifhd), (b'CMem', self._compress_memory()),
+                  (b'Stks', self._pack_frames())]
+        if pending_read:
+            chunks.append((b'Read', b''.join(addr.to_bytes(2, 'big') for addr in pending_read)))
+        body = bytearray(b'IFZS')
+        for chunk_id, data in chunks:
+            body += chunk_id + len(data).to_bytes(4, 'big') + data
+            if len(data) & 1:
+                body.append(0)
+        return b'FORM' + len(body).to_bytes(4, 'big') + bytes(body)
+
+    def load_quetzal(self, data):
+        """Restore a Quetzal file made for this story
+
+        Returns its PC and, for a file taken at the prompt, the pending
+        read's (text buffer, parse buffer), else None.
+        """
+        if data[:4] != b'FORM' or data[8:12] != b'IFZS':
+            raise ZMachineError("Not a Quetzal save file")
+        chunks = {}
+        pos = 12
+        end = min(len(data), 8 + int.from_bytes(data[4:8], 'big'))
+        while pos + 8 <= end:
+            chunk_id = data[pos:pos + 4]
+            length = int.from_bytes(data[pos + 4:pos + 8], 'big')
+            chunks[chunk_id] = data[pos + 8:pos + 8 + length]
+            pos += 8 + length + (length & 1)
+
+        ifhd = chunks.get(b'IFhd')
+        expected = self.story[0x02:0x04] + self.story[0x12:0x18] + self.story[0x1C:0x1E]
+        if ifhd is None or ifhd[:10] != expected:
+            raise ZMachineError("Save file is for a different story")
+        if b'CMem' in chunks:
+            dynamic = self._expand_memory(chunks[b'CMem'])
+        elif b'UMem' in chunks and len(chunks[b'UMem']) == self.static_mem:
+            dynamic = chunks[b'UMem']
+        else:
+            raise ZMachineError("Save file has no usable memory chunk")
+        if b'Stks' not in chunks:
+            raise ZMachineError("Save file has no stack chunk")
+        frames = self._unpack_frames(chunks[b'Stks'])
+        pending_read = None
+        if b'Read' in chunks:
+            read = chunks[b'Read']
+            if len(read) != 4:
+                raise ZMachineError("Malformed Read chunk")
+            pending_read = (int.from_bytes(read[:2], 'big'), int.from_bytes(read[2:], 'big'))
+
+        # The transcript and fixed-pitch bits survive a restore
+        flags2 = self.memory[0x11] & 0x03
+        dynamic = bytearray(dynamic)
+        dynamic[0x11] = (dynamic[0x11] & ~0x03) | flags2
+        self._replace_dynamic([dynamic[i:i + PAGE_SIZE]
+                               for i in range(0, self.static_mem, PAGE_SIZE)])
+        self.frames = frames
+        self.memory_streams = []
+        return int.from_bytes(ifhd[10:13], 'big'), pending_read
+
+    def _resume(self, pc, pending_read):
+        """Carry on from a loaded save file"""
+        if pending_read:
+            # Taken at the prompt: wait on the same read again
+            self.pc = pc
+            self._pending_read = pending_read
+            self.waiting_for_input = True
+            return
+        # Version 3 resumes as if the save instruction had just succeeded
+        on_true, target, _ = self._decode_branch(pc)
+        self._branch_to = (on_true, target, pc)
+        self._branch(True)
+
+    def checkpoint_bytes(self):
+        """A Quetzal file of the game as it waits at the prompt
+
+        Unlike the game's SAVE verb this runs no command, so nothing the
+        parser remembers (such as the command AGAIN repeats) changes.
+        """
+        if not self.waiting_for_input:
+            raise ZMachineError("The game is not waiting for input")
+        return self.quetzal_bytes(self.pc, self._pending_read)
+
+    def resume_checkpoint(self, data) -> str:
+        """Load a file from checkpoint_bytes() or the game's SAVE and run to the next prompt"""
+        if not self._started:
+            self.start()  # Finds the player; the opening text is replaced anyway
+        pc, pending_read = self.load_quetzal(data)
+        self.finished = False
+        self.waiting_for_input = False
+        self._pending_read = None
+        self._resume(pc, pending_read)
+        self._run()
+        return self._take_output()
+
+    def _compress_memory(self):
+        original = self.story[:self.static_mem]
+        xored = (int.from_bytes(self.memory[:self.static_mem], 'big')
+                 ^ int.from_bytes(original, 'big')).to_bytes(self.static_mem, 'big')
+        xored = xored.rstrip(b'\0')
+        out = bytearray()
+        pos = 0
+        for run in re.finditer(rb'\0+', xored):
+            out += xored[pos:run.start()]
+            length = run.end() - run.start()
+            while length:
+                count = min(length, 256)
+                out += bytes((0, count - 1))
+                length -= count
+            pos = run.end()
+        out += xored[pos:]
+        return bytes(out)
+
+    def _expand_memory(self, cmem):
+        xored = bytearray()
+        i = 0
+        while i < len(cmem):
+            if cmem[i]:
+                xored.append(cmem[i])
+                i += 1
+            else:
+                if i + 1 >= len(cmem):
+                    raise ZMachineError("Truncated CMem chunk")
+                xored += bytes(cmem[i + 1] + 1)
+                i += 2
+        if len(xored) > self.static_mem:
+            raise ZMachineError("CMem chunk is larger than dynamic memory")
+        xored += bytes(self.static_mem - len(xored))
+        original = self.story[:self.static_mem]
+        return (int.from_bytes(xored, 'big')
+                ^ int.from_bytes(original, 'big')).to_bytes(self.static_mem, 'big')
+
+    def _pack_frames(self):
+        out = bytearray()
+        for depth, frame in enumerate(self.frames):
+            if depth == 0:
+                # The dummy frame around the main routine
+                out += bytes(6)
+            else:
+                flags = len(frame.locals) | (0x10 if frame.store_var is None else 0)
+                out += frame.return_pc.to_bytes(3, 'big')
+                out += bytes((flags, frame.store_var or 0, (1 << frame.arg_count) - 1))
+            out += len(frame.stack).to_bytes(2, 'big')
+            for value in frame.locals + frame.stack:
+                out += value.to_bytes(2, 'big')
+        return bytes(out)
+
+    def _unpack_frames(self, data):
+        frames = []
+        pos = 0
+        while pos + 8 <= len(data):
+            return_pc = int.from_bytes(data[pos:pos + 3], 'big')
+            flags, store_var, args = data[pos + 3], data[pos + 4], data[pos + 5]
+            stack_size = int.from_bytes(data[pos + 6:pos + 8], 'big')
+            pos += 8
+            num_locals = flags & 0x0F
+            words = [int.from_bytes(data[i:i + 2], 'big')
+                     for i in range(pos, pos + 2 * (num_locals + stack_size), 2)]
+            pos += 2 * (num_locals + stack_size)
+            frame = Frame(return_pc, words[:num_locals],
+                          None if flags & 0x10 else store_var, bin(args).count('1'))
+            frame.stack = words[num_locals:]
+            frames.append(frame)
+        if not frames or pos != len(data):
+            raise ZMachineError("Malformed Stks chunk")
+        return frames
+
+    # ------------------------------------------------------------------
+    # Running the game
+    # ------------------------------------------------------------------
+
+    def status(self):
+        """GameStatus from the status-line globals and the player object"""
+        room = self.read_var(0x10)
+        inventory = self.contents(self.player) if self.player else []
+        return GameStatus(room, self.object_name(room) if room else '',
+                          self._signed(self.read_var(0x11)), self.read_var(0x12),
+                          tuple(self.object_name(obj) for obj in inventory))
+
+    def _update_status_line(self):
+        location = self.read_var(0x10)
+        name = self.object_name(location) if location else ''
+        first = self._signed(self.read_var(0x11))
+        second = self.read_var(0x12)
+        if self.memory[0x01] & 0x02:
+            self.status_line = f"{name}  Time: {first % 24}:{second:02d}"
+        else:
+            self.status_line = f"{name}  Score: {first}  Moves: {second}"
+
+    def _run(self):
+        """Execute until the game asks for input or quits"""
+        cache = self.decode_cache
+        decode = self._decode
+        fetch_operands = self._fetch_operands
+        count = 0
+        try:
+            while not self.waiting_for_input and not self.finished:
+                pc = self.pc
+                handler, operands, kinds, self._store_var, self._branch_to, self.pc, self._text = \
+                    cache.get(pc) or decode(pc)
+                if kinds is not None:
+                    operands = fetch_operands(operands, kinds)
+                count += 1
+                handler(self, *operands)
+        finally:
+            self.instruction_count += count
+
+    def _take_output(self):
+        text = ''.join(self.output_buffer)
+        self.output_buffer = []
+        # The prompt belongs to the next turn, not this response
+        if self.waiting_for_input and text.endswith('>'):
+            text = text[:-1]
+        return text
+
+    def start(self) -> str:
+        """Run the story up to its first prompt and return the opening text"""
+        if not self._started:
+            self._started = True
+            self._run()
+            if not self.player_var:
+                self.player_var = self._find_player_var()
+        return self._take_output()
+
+    def _find_player_var(self):
+        """The global variable the game keeps the player object in, or 0
+
+        The game's last move before the first prompt puts the player in the
+        opening room, which puts it first among the room's contents. Of the
+        globals holding that object, the first one the story file starts at
+        0 was set by the game itself (Zork's PLAYER and WINNER are). Reading
+        the player from it stays right after a RESTART or RESTORE.
+        """
+        room = self.read_var(0x10)
+        player = next(iter(self.contents(room)), 0) if room else 0
+        if not player:
+            return 0
+        for var in range(0x10, 0x100):
+            addr = self.globals + 2 * (var - 0x10)
+            if self.read_word(addr) == player and not self.story[addr] | self.story[addr + 1]:
+                return var
+        return 0
+
+    @property
+    def player(self):
+        """The player object, read from the game's globals"""
+        return self.read_var(self.player_var) if self.player_var else 0
+
+    def step(self, command: str) -> str:
+        """Send one command to the game and return its response"""
+        if not self._started:
+            self.start()
+        if self.finished:
+            return ''
+        if not self.waiting_for_input:
+            raise ZMachineError("The game is not waiting for input")
+        self._complete_read(command)
+        self._run()
+        return self._take_output()
+
+    def run(self):
+        """Play interactively in the terminal"""
+        self.print_text(self.start())
+        while not self.finished:
+            try:
+                command = input('>')
+            except (KeyboardInterrupt, EOFError):
                 print("\n\nThanks for playing!")
                 break
-            except EOFError:
-                break
+            self.print_text(self.step(command))
+
+
+def benchmark(story_file, commands_file, seed=0):
+    """Replay a command file and report how fast the interpreter runs"""
+    with open(commands_file) as f:
+        commands = [line.strip() for line in f if line.strip()]
+
+    zm = ZMachine(story_file, seed=seed)
+    start = time.perf_counter()
+    zm.start()
+    for command in commands:
+        if zm.finished:
+            break
+        zm.step(command)
+    elapsed = time.perf_counter() - start
+
+    print(f"Commands:     {len(commands)}")
+    print(f"Instructions: {zm.instruction_count}")
+    print(f"Time:         {elapsed:.3f}s")
+    print(f"Speed:        {zm.instruction_count / elapsed:,.0f} instructions/sec")
+
 
 if __name__ == '__main__':
-    story_file = r'D:\github\zork1\COMPILED\zork1.z3'
-    
+    parser = argparse.ArgumentParser(description='Play a version 3 Z-machine story')
+    parser.add_argument('story_file', nargs='?', default='zork1.z3',
+                        help='Path to the story file')
+    parser.add_argument('--bench', metavar='COMMANDS_FILE',
+                        help='Replay a command file and report instructions/sec')
+    parser.add_argument('--predecode', action='store_true',
+                        help='Decode every string at load time')
+    args = parser.parse_args()
+    story_file = args.story_file
+
     try:
-        zm = ZMachine(story_file)
-        zm.run()
-    except FileNotFoundError:
-        print(f"Error: Could not find {story_file}")
+        if args.bench:
+            benchmark(story_file, args.bench)
+        else:
+            zm = ZMachine(story_file, predecode=args.predecode)
+            zm.run()
+    except FileNotFoundError as e:
+        print(f"Error: Could not find {e.filename}")
         sys.exit(1)
     except Exception as e:
         print(f"Error: {e}")
@@ -1,15 +1,27 @@
 """LLM agent for playing Zork"""
 
 import re
+import copy
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from typing import List, Dict, Optional
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from prompt_templates import SYSTEM_PROMPT, GAME_STATE_TEMPLATE, ERROR_RECOVERY_PROMPT
+from prompt_history import PromptHistory
+from room_graph import RoomGraph
+from world_state import WorldState
+from response_cache import ResponseCache
 
 
 class ZorkLLMAgent:
     """LLM-powered agent that plays Zork by querying vLLM API"""
     
-    def __init__(self, vllm_url: str, model_name: str, api_key: str = "EMPTY"):
+    def __init__(self, vllm_url: str, model_name: str, api_key: str = "EMPTY",
+                 history_tokens: Optional[int] = None, world_state: bool = True,
+                 cache: Optional[ResponseCache] = None, temperature_zero: bool = False,
+                 stream: bool = False):
         """
         Initialize the LLM agent
         
@@ -17,11 +29,34 @@ class ZorkLLMAgent:
             vllm_url: Base URL of vLLM server (e.g., http://localhost:8000/v1)
             model_name: Model name to use
             api_key: API key (use "EMPTY" for vLLM)
+            history_tokens: Token budget for recent turns before older ones are summarized
+                (default 600 with world_state, 2000 without)
+            world_state: Keep a structured WorldState and show it in every prompt, so
+                only a few recent turns need to be sent verbatim
+            cache: ResponseCache to answer repeated requests from
+            temperature_zero: Sample at temperature 0 so cached replies are the ones
+                the model would give again
+            stream: Stream replies, so the time to the first token can be measured
         """
         self.client = OpenAI(base_url=vllm_url, api_key=api_key)
         self.model = model_name
-        self.conversation_history: List[Dict] = []
-        self.max_history_length = 20  # Keep last N exchanges for context
+        self.rooms = RoomGraph()
+        self.world = WorldState(self.rooms) if world_state else None
+        if history_tokens is None:
+            history_tokens = 600 if world_state else 2000
+        self.history = PromptHistory(SYSTEM_PROMPT, max_tokens=history_tokens)
+        self.cache = cache
+        self.temperature = 0 if temperature_zero else 1
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hits = 0
+        self.speculation = None  # (request, future) started by speculate()
+        self.executor = None
+        self.speculations = 0
+        self.speculation_hits = 0
+        self.stream = stream
+        self.timings = {}      # Seconds per phase of the last get_next_command
+        self.last_usage = None  # (prompt, completion, cached) tokens of the last reply
         
     def get_next_command(self, game_output: str, error_mode: bool = False, 
                         last_command: Optional[str] = None) -> str:
@@ -36,72 +71,222 @@ class ZorkLLMAgent:
         Returns:
             Next command to send to the game
         """
-        # Build the prompt
-        if error_mode and last_command:
-            user_message = ERROR_RECOVERY_PROMPT.format(last_command=last_command) + "\n\n" + game_output
-        else:
-            user_message = GAME_STATE_TEMPLATE.format(game_output=game_output)
-        
-        # Add to conversation history
-        self.conversation_history.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Prune history if too long
-        if len(self.conversation_history) > self.max_history_length * 2:
-            # Keep system message and recent history
-            self.conversation_history = self.conversation_history[-(self.max_history_length * 2):]
+        self.timings = {}
+        self.last_usage = None
+        start = time.perf_counter()
+        messages = self._build_messages(game_output, error_mode, last_command)
+        request = self._request_args(messages, max_completion_tokens=50)
+        start = self._lap('prompt_build', start)
+        response = self._speculative_reply(request)
+        if response:
+            self._lap('llm_request', start)
+            return self._handle_response(response, request)
+        cached = self._from_cache(request)
+        if cached:
+            self._lap('llm_request', start)
+            return cached
         
         # Query the LLM
         try:
-            messages = [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                *self.conversation_history
-            ]
-            
             # Use max_completion_tokens for newer models (gpt-4o, gpt-4o-mini)
             # Fall back to max_tokens for older models
             # Some models only support temperature=1
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=1,  # Some newer models only support default temperature
-                    max_completion_tokens=50,
-                    stop=["\n", ".", "?", "!"]  # Stop at natural boundaries
-                )
+                response = self._send(request, start)
             except Exception as e:
-                error_str = str(e)
-                if "max_completion_tokens" in error_str:
+                if "max_completion_tokens" in str(e):
                     # Fallback for older models that use max_tokens
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=messages,
-                        temperature=1,
-                        max_tokens=50,
-                        stop=["\n", ".", "?", "!"]
-                    )
+                    response = self._send(self._request_args(messages, max_tokens=50), start)
                 else:
                     raise
             
-            # Extract and clean the command
-            command = response.choices[0].message.content.strip()
-            command = self._clean_command(command)
-            
-            # Add assistant response to history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": command
-            })
-            
-            return command
+            self._lap('llm_request', start)
+            return self._handle_response(response, request)
             
         except Exception as e:
+            self._lap('llm_request', start)
             print(f"Error querying LLM: {e}")
             # Fallback to basic exploration
             return "look"
     
+    def _lap(self, phase: str, start: float) -> float:
+        """Record the time since start as phase; returns now, to start the next phase"""
+        now = time.perf_counter()
+        self.timings[phase] = now - start
+        return now
+    
+    def _send(self, request: Dict, start: float):
+        """Send a chat request, streaming the reply if asked to"""
+        if not self.stream:
+            return self.client.chat.completions.create(**request)
+        chunks = self.client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True})
+        parts, usage = [], None
+        for chunk in chunks:
+            usage = self._add_chunk(chunk, parts, start) or usage
+        return self._streamed_response(parts, usage)
+    
+    def _add_chunk(self, chunk, parts: List[str], start: float):
+        """Collect a streamed chunk's text; returns its usage, which comes in the last chunk"""
+        if chunk.choices and chunk.choices[0].delta.content:
+            if 'llm_first_token' not in self.timings:
+                self._lap('llm_first_token', start)
+            parts.append(chunk.choices[0].delta.content)
+        return getattr(chunk, 'usage', None)
+    
+    @staticmethod
+    def _streamed_response(parts: List[str], usage):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=''.join(parts)))], usage=usage)
+    
+    def _build_messages(self, game_output: str, error_mode: bool,
+                        last_command: Optional[str]) -> List[Dict]:
+        """Add the game output to the history and return the full message list"""
+        if error_mode and last_command:
+            user_message = ERROR_RECOVERY_PROMPT.format(last_command=last_command) + "\n\n" + game_output
+        else:
+            user_message = GAME_STATE_TEMPLATE.format(game_output=game_output)
+        
+        # The history keeps the prompt prefix stable and compacts on a token budget
+        self.history.add_user(user_message, game_output)
+        messages = self.history.messages()
+        
+        # The world state changes every turn, so it goes in the newest message
+        # only and never into the history (which would break the cached prefix)
+        if self.world:
+            messages[-1] = {
+                "role": "user",
+                "content": self.world.render() + "\n\n" + messages[-1]['content']
+            }
+        
+        self.history.record_request(messages)
+        return messages
+    
+    def observe(self, command: Optional[str], state: Dict):
+        """Update the room graph and world state with a turn parsed by ZorkGameParser.summarize_state"""
+        self.rooms.update(command, state)
+        if self.world:
+            self.world.update(command, state)
+    
+    def _request_args(self, messages: List[Dict], **limit) -> Dict:
+        """Keyword arguments for chat.completions.create"""
+        return dict(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,  # Some newer models only support the default of 1
+            stop=["\n", ".", "?", "!"],  # Stop at natural boundaries
+            **limit
+        )
+    
+    def speculate(self, command: str, state: Dict, error_mode: bool = False):
+        """
+        Start the request for the turn after `command`, guessing it produces `state`
+        
+        The request is built on a copy, so the agent is left as it was.
+        get_next_command uses the reply only if the request it builds from
+        the real outcome is identical; a wrong guess costs a wasted request,
+        never a different command.
+        """
+        self.discard_speculation()
+        request = self._speculative_request(command, state, error_mode)
+        if self.cache is not None and self._cache_key(request) in self.cache:
+            return
+        self.speculation = (request, self._start(request))
+        self.speculations += 1
+    
+    def _speculative_request(self, command: str, state: Dict, error_mode: bool) -> Dict:
+        saved = (self.history, self.rooms, self.world)
+        self.history, self.rooms, self.world = copy.deepcopy(saved)
+        try:
+            self.observe(command, state)
+            messages = self._build_messages(state['output'], error_mode, command)
+        finally:
+            self.history, self.rooms, self.world = saved
+        return self._request_args(messages, max_completion_tokens=50)
+    
+    def _start(self, request: Dict):
+        """Send a request in the background; returns its future"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        return self.executor.submit(self.client.chat.completions.create, **request)
+    
+    def _take_speculation(self, request: Dict):
+        """The speculative request's future if it was for exactly this request"""
+        speculation, self.speculation = self.speculation, None
+        if speculation and speculation[0] == request:
+            return speculation[1]
+        if speculation:
+            speculation[1].cancel()
+        return None
+    
+    def _speculative_reply(self, request: Dict):
+        future = self._take_speculation(request)
+        if future is None:
+            return None
+        try:
+            response = future.result()
+        except Exception:
+            return None  # Ask again the normal way
+        self.speculation_hits += 1
+        return response
+    
+    def discard_speculation(self):
+        """Drop the speculative request, if any"""
+        self._take_speculation(None)
+    
+    def close(self):
+        """Drop any speculation and stop the background request thread"""
+        self.discard_speculation()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def _cache_key(self, request: Dict) -> Dict:
+        """What the cache stores a reply to request under"""
+        return request
+    
+    def _from_cache(self, request: Dict) -> Optional[str]:
+        """The command for a request the cache has seen, recorded like a fresh reply"""
+        if self.cache is None:
+            return None
+        content = self.cache.get(self._cache_key(request))
+        if content is None:
+            return None
+        self.cache_hits += 1
+        return self._handle_response(SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None))
+    
+    def _handle_response(self, response, request: Optional[Dict] = None) -> str:
+        """Count tokens, clean the command and record it in the history
+        
+        Pass the request to store the reply in the cache under it.
+        """
+        if self.cache is not None and request is not None:
+            self.cache.put(self._cache_key(request), response.choices[0].message.content)
+        
+        # Count tokens when the server reports usage
+        usage = getattr(response, 'usage', None)
+        if usage:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+            self.history.record_usage(usage)
+            details = getattr(usage, 'prompt_tokens_details', None)
+            self.last_usage = (usage.prompt_tokens or 0, usage.completion_tokens or 0,
+                               (getattr(details, 'cached_tokens', 0) or 0) if details else 0)
+        
+        # Extract and clean the command
+        command = response.choices[0].message.content.strip()
+        command = self._clean_command(command)
+        
+        # Add assistant response to history
+        self.history.add_assistant(command)
+        
+        return command
+    
+    def amend_command(self, command: str):
+        """Record that command was sent in place of the one the model gave"""
+        self.history.replace_assistant(command)
+    
     def _clean_command(self, command: str) -> str:
         """Clean and validate the LLM's command output"""
         # Remove quotes, extra whitespace, punctuation
@@ -131,9 +316,14 @@ class ZorkLLMAgent:
         
         return command
     
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Recent turns kept verbatim (older ones are in the history summary)"""
+        return self.history.recent_messages()
+    
     def reset_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.history.reset()
     
     def get_history_summary(self) -> str:
         """Get a summary of the conversation history"""
@@ -147,3 +337,202 @@ class ZorkLLMAgent:
             summary.append(f"{role}: {content}")
         
         return "\n".join(summary)
+
+
+class RequestBatcher:
+    """
+    Collects next-command requests from concurrent sessions and sends them together
+    
+    Requests that arrive within `window` seconds of the first (or until
+    `max_batch` are waiting) go out as one batch, and each session gets its
+    own response back. In "chat" mode the batch is sent as simultaneous chat
+    requests, so the server schedules them in the same step. In
+    "completions" mode the conversations are rendered as plain-text prompts
+    and sent as a single /v1/completions call with a list of prompts, which
+    vLLM runs as one batch.
+    """
+    
+    def __init__(self, client, window: float = 0.02, max_batch: int = 32, mode: str = "chat"):
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self.mode = mode
+        self.pending = []
+        self.timer = None
+        self.requests = 0
+        self.batches = 0
+        self.tasks = set()  # Batches being sent, so they aren't garbage collected
+    
+    async def create(self, **request):
+        """Queue a chat.completions.create request and wait for its response"""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((request, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+    
+    def flush(self):
+        """Send everything that is waiting"""
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.requests += len(batch)
+            self.batches += 1
+            task = asyncio.ensure_future(self._send(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+    
+    async def _send(self, batch):
+        if self.mode == "completions":
+            # One request per distinct set of sampling arguments
+            groups = {}
+            for request, future in batch:
+                key = repr(sorted((k, v) for k, v in request.items() if k != 'messages'))
+                groups.setdefault(key, []).append((request, future))
+            await asyncio.gather(*(self._send_completions(group) for group in groups.values()))
+        else:
+            await asyncio.gather(*(self._send_chat(request, future) for request, future in batch))
+    
+    async def _send_chat(self, request, future):
+        try:
+            response = await self.client.chat.completions.create(**request)
+        except Exception as e:
+            response = e
+        if future.cancelled():
+            return  # A speculative request that was discarded
+        if isinstance(response, Exception):
+            future.set_exception(response)
+        else:
+            future.set_result(response)
+    
+    async def _send_completions(self, group):
+        request = dict(group[0][0])
+        del request['messages']
+        request['max_tokens'] = request.pop('max_completion_tokens', request.get('max_tokens'))
+        prompts = [render_prompt(r['messages']) for r, _ in group]
+        try:
+            response = await self.client.completions.create(prompt=prompts, **request)
+        except Exception as e:
+            for _, future in group:
+                if not future.cancelled():
+                    future.set_exception(e)
+            return
+        
+        # The server reports usage for the whole batch; split it by length
+        usage = getattr(response, 'usage', None)
+        prompt_chars = sum(len(p) for p in prompts) or 1
+        texts = [''] * len(group)
+        for choice in response.choices:
+            texts[choice.index] = choice.text
+        completion_chars = sum(len(t) for t in texts) or 1
+        for i, (_, future) in enumerate(group):
+            share = None
+            if usage:
+                share = SimpleNamespace(
+                    prompt_tokens=round(usage.prompt_tokens * len(prompts[i]) / prompt_chars),
+                    completion_tokens=round((usage.completion_tokens or 0)
+                                            * len(texts[i]) / completion_chars))
+            if future.cancelled():
+                continue
+            future.set_result(SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=texts[i]))],
+                usage=share))
+    
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+
+def render_prompt(messages: List[Dict]) -> str:
+    """Render a chat conversation as a plain-text prompt for the completions endpoint"""
+    turns = [f"{m['role'].capitalize()}: {m['content']}" for m in messages]
+    return "\n\n".join(turns) + "\n\nAssistant:"
+
+
+class AsyncZorkLLMAgent(ZorkLLMAgent):
+    """ZorkLLMAgent on the AsyncOpenAI client, for many sessions on one event loop"""
+    
+    def __init__(self, vllm_url: str, model_name: str, api_key: str = "EMPTY",
+                 history_tokens: Optional[int] = None, world_state: bool = True,
+                 cache: Optional[ResponseCache] = None, temperature_zero: bool = False,
+                 stream: bool = False, batcher: Optional[RequestBatcher] = None):
+        super().__init__(vllm_url, model_name, api_key, history_tokens, world_state,
+                         cache, temperature_zero, stream)
+        self.client = AsyncOpenAI(base_url=vllm_url, api_key=api_key)
+        self.batcher = batcher
+    
+    def _create(self, **request):
+        """Send a chat request directly, or through the batcher if there is one"""
+        if self.batcher:
+            return self.batcher.create(**request)
+        return self.client.chat.completions.create(**request)
+    
+    def _start(self, request: Dict):
+        return asyncio.ensure_future(self._create(**request))
+    
+    def _cache_key(self, request: Dict) -> Dict:
+        """Replies to completions-mode prompts are kept apart from chat replies"""
+        if self.batcher and self.batcher.mode == "completions":
+            return dict(request, endpoint="completions")
+        return request
+    
+    async def _speculative_reply(self, request: Dict):
+        future = self._take_speculation(request)
+        if future is None:
+            return None
+        try:
+            response = await future
+        except Exception:
+            return None
+        self.speculation_hits += 1
+        return response
+    
+    async def get_next_command(self, game_output: str, error_mode: bool = False,
+                               last_command: Optional[str] = None) -> str:
+        """Async version of ZorkLLMAgent.get_next_command"""
+        self.timings = {}
+        self.last_usage = None
+        start = time.perf_counter()
+        messages = self._build_messages(game_output, error_mode, last_command)
+        request = self._request_args(messages, max_completion_tokens=50)
+        start = self._lap('prompt_build', start)
+        response = await self._speculative_reply(request)
+        if response:
+            self._lap('llm_request', start)
+            return self._handle_response(response, request)
+        cached = self._from_cache(request)
+        if cached:
+            self._lap('llm_request', start)
+            return cached
+        
+        try:
+            try:
+                response = await self._send(request, start)
+            except Exception as e:
+                if "max_completion_tokens" in str(e):
+                    response = await self._send(self._request_args(messages, max_tokens=50), start)
+                else:
+                    raise
+            
+            self._lap('llm_request', start)
+            return self._handle_response(response, request)
+            
+        except Exception as e:
+            self._lap('llm_request', start)
+            print(f"Error querying LLM: {e}")
+            return "look"
+    
+    async def _send(self, request: Dict, start: float):
+        """Send a chat request, streaming the reply if asked to (batched requests never stream)"""
+        if not self.stream or self.batcher:
+            return await self._create(**request)
+        chunks = await self.client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True})
+        parts, usage = [], None
+        async for chunk in chunks:
+            usage = self._add_chunk(chunk, parts, start) or usage
+        return self._streamed_response(parts, usage)
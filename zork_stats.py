@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""zork-stats: aggregate statistics over a directory of game logs
+
+Finds every summary_*.json under the given directories (batch games
+included) and streams each run's turns from its turn records or JSONL log,
+one turn at a time, so an archive of thousands of runs never has to fit in
+memory. Results are grouped by model.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from game_parser import DEATH_BANNER
+from turn_logger import read_records
+
+
+def find_summaries(roots) -> Iterator[Path]:
+    """Every per-game summary file under roots"""
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                if name.startswith('summary_') and name.endswith('.json'):
+                    yield Path(dirpath) / name
+
+
+def _locate(recorded: Optional[str], summary_file: Path) -> Optional[Path]:
+    """A log path from a summary, looked up next to the summary if the archive has moved"""
+    if not recorded:
+        return None
+    beside = summary_file.parent / Path(recorded).name
+    if beside.exists():
+        return beside
+    path = Path(recorded)
+    return path if path.exists() else None
+
+
+def iter_turns(summary: Dict, summary_file: Path) -> Iterator[Dict]:
+    """
+    The run's turns as dicts with turn, timestamp (seconds), command,
+    location, game_output, score, is_error and is_death
+    """
+    records = _locate(summary.get('turn_records'), summary_file)
+    if records:
+        yield from read_records(records)
+        return
+
+    llm_log = _locate(summary.get('llm_log'), summary_file)
+    if not llm_log:
+        return
+    with open(llm_log) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # A run that was killed mid-write
+            state = entry.get('state') or {}
+            yield {
+                'turn': entry.get('turn'),
+                'timestamp': datetime.fromisoformat(entry['timestamp']).timestamp(),
+                'command': entry.get('command') or '',
+                'location': state.get('location'),
+                'game_output': entry.get('game_output') or '',
+                'score': state.get('score'),
+                'is_error': state.get('is_error', False),
+                'is_death': state.get('is_death', False),
+            }
+
+
+def death_cause(output: str) -> str:
+    """The line the game printed just before announcing the death"""
+    before = DEATH_BANNER.split(output, 1)[0]
+    lines = [line.strip() for line in before.splitlines() if line.strip()]
+    cause = lines[-1] if lines else 'unknown'
+    return cause if len(cause) <= 80 else cause[:77] + '...'
+
+
+class ModelStats:
+    """Running totals for one model; memory grows with vocabulary, not with turns"""
+
+    def __init__(self, bucket: int):
+        self.bucket = bucket
+        self.runs = 0
+        self.turns = 0
+        self.final_scores = 0
+        self.best_score = 0
+        self.tokens = 0
+        self.wall_time = 0.0
+        self.timed_turns = 0
+        self.turn_seconds = 0.0
+        self.curve_sums = []       # bucket -> sum of scores at that turn
+        self.curve_counts = []     # bucket -> runs that got that far
+        self.deaths = Counter()
+        self.verb_turns = Counter()
+        self.verb_errors = Counter()
+        self.rooms = Counter()     # room -> runs that reached it
+        self.rooms_per_run = 0
+
+    def add_run(self, summary: Dict, turns: Iterator[Dict]):
+        self.runs += 1
+        final_score = summary.get('final_score') or 0
+        self.final_scores += final_score
+        self.best_score = max(self.best_score, final_score)
+        self.tokens += (summary.get('prompt_tokens') or 0) + (summary.get('completion_tokens') or 0)
+        self.wall_time += summary.get('wall_time') or 0.0
+
+        rooms = set()
+        score = 0
+        last_time = None
+        count = 0
+        for turn in turns:
+            count += 1
+            if turn['score']:
+                score = turn['score'][0]
+            if count % self.bucket == 0:
+                index = count // self.bucket - 1
+                if index == len(self.curve_sums):
+                    self.curve_sums.append(0)
+                    self.curve_counts.append(0)
+                self.curve_sums[index] += score
+                self.curve_counts[index] += 1
+
+            words = turn['command'].lower().split()
+            verb = words[0] if words else ''
+            self.verb_turns[verb] += 1
+            if turn['is_error']:
+                self.verb_errors[verb] += 1
+
+            output = turn['game_output']
+            # is_death comes from the same banner; searching too covers logs from
+            # drivers whose parser missed it
+            if turn['is_death'] or DEATH_BANNER.search(output):
+                self.deaths[death_cause(output)] += 1
+            if turn['location']:
+                rooms.add(turn['location'])
+
+            if last_time is not None and turn['timestamp'] >= last_time:
+                self.turn_seconds += turn['timestamp'] - last_time
+                self.timed_turns += 1
+            last_time = turn['timestamp']
+
+        self.turns += count
+        self.rooms.update(rooms)
+        self.rooms_per_run += len(rooms)
+
+    def report(self, top: int = 10) -> Dict:
+        runs = self.runs or 1
+        turns = self.turns or 1
+        error_rates = {verb: self.verb_errors[verb] / n
+                       for verb, n in self.verb_turns.most_common(top)}
+        return {
+            'runs': self.runs,
+            'turns': self.turns,
+            'mean_final_score': self.final_scores / runs,
+            'best_score': self.best_score,
+            'score_curve': {(i + 1) * self.bucket: self.curve_sums[i] / self.curve_counts[i]
+                            for i in range(len(self.curve_sums))},
+            'deaths': sum(self.deaths.values()),
+            'death_causes': dict(self.deaths.most_common(top)),
+            'error_rate_by_verb': error_rates,
+            'mean_rooms_reached': self.rooms_per_run / runs,
+            'most_reached_rooms': dict(self.rooms.most_common(top)),
+            'tokens_per_turn': self.tokens / turns,
+            'seconds_per_turn': (self.turn_seconds / self.timed_turns if self.timed_turns
+                                 else self.wall_time / turns),
+        }
+
+
+def collect(roots, bucket: int = 10, model: Optional[str] = None) -> Dict[str, ModelStats]:
+    stats: Dict[str, ModelStats] = {}
+    for summary_file in find_summaries(roots):
+        try:
+            with open(summary_file) as f:
+                summary = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Skipping {summary_file}: {e}", file=sys.stderr)
+            continue
+        name = summary.get('model') or 'unknown'
+        if model and name != model:
+            continue
+        if name not in stats:
+            stats[name] = ModelStats(bucket)
+        stats[name].add_run(summary, iter_turns(summary, summary_file))
+    return stats
+
+
+def print_report(name: str, report: Dict):
+    print("=" * 70)
+    print(f"📊 {name}")
+    print("=" * 70)
+    print(f"Runs: {report['runs']}   Turns: {report['turns']}   "
+          f"Mean score: {report['mean_final_score']:.1f}   Best: {report['best_score']}")
+    print(f"Tokens/turn: {report['tokens_per_turn']:.0f}   "
+          f"Seconds/turn: {report['seconds_per_turn']:.2f}   "
+          f"Rooms reached per run: {report['mean_rooms_reached']:.1f}")
+
+    if report['score_curve']:
+        print("\nMean score by turn:")
+        for turn, score in report['score_curve'].items():
+            print(f"  {turn:>6} {score:>7.1f}")
+
+    print(f"\nDeaths: {report['deaths']}")
+    for cause, count in report['death_causes'].items():
+        print(f"  {count:>5}  {cause}")
+
+    print("\nError rate by verb (most used):")
+    for verb, rate in report['error_rate_by_verb'].items():
+        print(f"  {verb or '(empty)':<12} {rate:>6.1%}")
+
+    print("\nMost reached rooms:")
+    for room, runs in report['most_reached_rooms'].items():
+        print(f"  {runs:>5}  {room}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate statistics over Zork LLM game logs')
+    parser.add_argument('log_dirs', nargs='*', default=['logs'],
+                        help='Directories to search for runs (default: logs)')
+    parser.add_argument('--model', help='Only include runs of this model')
+    parser.add_argument('--bucket', type=int, default=10,
+                        help='Turns between points of the score curve')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Entries to show for death causes, verbs and rooms')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    stats = collect(args.log_dirs, max(1, args.bucket), args.model)
+    reports = {name: model_stats.report(args.top) for name, model_stats in sorted(stats.items())}
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    if not reports:
+        print("No runs found")
+        return
+    for name, report in reports.items():
+        print_report(name, report)
+
+
+if __name__ == '__main__':
+    main()